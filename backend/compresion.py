@@ -0,0 +1,117 @@
+# backend/compresion.py
+"""
+Compresión de respuestas con brotli o gzip según Accept-Encoding.
+
+Brotli se usa si el módulo brotli está instalado y el cliente lo acepta; si
+no, gzip. Solo se comprimen respuestas a GET/HEAD (las que llevan tokens o
+datos del usuario en el cuerpo, como el login, son POST) de tipos de texto y
+de al menos COMPRESION_TAMANO_MINIMO bytes. Las respuestas en streaming se
+comprimen con gzip a medida que se generan.
+
+Un ETag fuerte identifica una representación exacta, así que al comprimir se
+le agrega la codificación ("-gzip" o "-br"); productos.catalogo la quita al
+comparar If-None-Match.
+"""
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.regex_helper import _lazy_re_compile
+from django.utils.text import compress_sequence, compress_string
+
+try:
+    import brotli
+except ImportError:  # brotli es opcional; sin él se usa solo gzip
+    brotli = None
+
+TIPOS_COMPRIMIBLES = (
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "text/",
+)
+CALIDAD_BROTLI = 5
+# Bytes aleatorios en el encabezado gzip contra ataques tipo BREACH (como
+# GZipMiddleware de Django)
+MAXIMO_BYTES_ALEATORIOS = 100
+
+_re_codificacion = _lazy_re_compile(r"^\s*([\w*-]+)\s*(?:;\s*q\s*=\s*([\d.]+))?\s*$")
+
+
+def codificaciones_aceptadas(accept_encoding):
+    """{codificación: q} a partir del encabezado Accept-Encoding"""
+    aceptadas = {}
+    for parte in accept_encoding.split(","):
+        coincidencia = _re_codificacion.match(parte)
+        if not coincidencia:
+            continue
+        try:
+            q = float(coincidencia[2]) if coincidencia[2] else 1.0
+        except ValueError:
+            continue
+        aceptadas[coincidencia[1].lower()] = q
+    return aceptadas
+
+
+def elegir_codificacion(accept_encoding, streaming=False):
+    aceptadas = codificaciones_aceptadas(accept_encoding)
+    comodin = aceptadas.get("*", 0)
+    candidatas = ["gzip"] if streaming or brotli is None else ["br", "gzip"]
+    mejor, mejor_q = None, 0
+    for codificacion in candidatas:
+        q = aceptadas.get(codificacion, comodin)
+        if q > mejor_q:
+            mejor, mejor_q = codificacion, q
+    return mejor
+
+
+class CompresionMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (
+            request.method not in ("GET", "HEAD")
+            or response.has_header("Content-Encoding")
+            or getattr(response, "is_async", False)
+        ):
+            return response
+
+        tipo = response.get("Content-Type", "")
+        if not tipo.startswith(TIPOS_COMPRIMIBLES):
+            return response
+        patch_vary_headers(response, ("Accept-Encoding",))
+
+        if not response.streaming and len(response.content) < getattr(
+            settings, "COMPRESION_TAMANO_MINIMO", 512
+        ):
+            return response
+
+        codificacion = elegir_codificacion(
+            request.headers.get("Accept-Encoding", ""), response.streaming
+        )
+        if codificacion is None:
+            return response
+
+        if response.streaming:
+            response.streaming_content = compress_sequence(
+                response.streaming_content, max_random_bytes=MAXIMO_BYTES_ALEATORIOS
+            )
+            del response["Content-Length"]
+        else:
+            if codificacion == "br":
+                comprimido = brotli.compress(response.content, quality=CALIDAD_BROTLI)
+            else:
+                comprimido = compress_string(
+                    response.content, max_random_bytes=MAXIMO_BYTES_ALEATORIOS
+                )
+            if len(comprimido) >= len(response.content):
+                return response
+            response.content = comprimido
+            response["Content-Length"] = str(len(comprimido))
+
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response["ETag"] = f'{etag[:-1]}-{codificacion}"'
+        response["Content-Encoding"] = codificacion
+        return response
@@ -0,0 +1,43 @@
+# backend/indices.py
+from django.db import models
+
+
+class IndicePrefijo(models.Index):
+    """
+    Índice funcional para búsquedas por prefijo (LIKE 'texto%').
+
+    En PostgreSQL, con una collation distinta de "C", un btree normal no sirve
+    para LIKE; por eso ahí cada expresión se indexa con text_pattern_ops, que
+    también resuelve comparaciones de igualdad. En otros motores se crea un
+    índice normal.
+    """
+
+    clase_operadores = "text_pattern_ops"
+
+    def create_sql(self, model, schema_editor, using="", **kwargs):
+        if schema_editor.connection.vendor == "postgresql":
+            from django.contrib.postgres.indexes import OpClass
+
+            indice = models.Index(
+                *[OpClass(e, name=self.clase_operadores) for e in self.expressions],
+                name=self.name,
+            )
+            return indice.create_sql(model, schema_editor, using=using, **kwargs)
+        return super().create_sql(model, schema_editor, using=using, **kwargs)
+
+
+class IndiceBusqueda(models.Index):
+    """
+    Índice GIN para columnas tsvector (búsqueda de texto completo).
+
+    GIN solo existe en PostgreSQL; en otros motores (SQLite en los tests) se
+    crea un índice normal para que las migraciones sean las mismas.
+    """
+
+    def create_sql(self, model, schema_editor, using="", **kwargs):
+        if schema_editor.connection.vendor == "postgresql":
+            from django.contrib.postgres.indexes import GinIndex
+
+            indice = GinIndex(fields=self.fields, name=self.name)
+            return indice.create_sql(model, schema_editor, using=using, **kwargs)
+        return super().create_sql(model, schema_editor, using=using, **kwargs)
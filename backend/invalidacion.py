@@ -0,0 +1,310 @@
+"""
+Bus de invalidación de caches locales entre procesos.
+
+Cada escritura publica las entidades afectadas ("producto", "permisos", ...).
+Publicar incrementa su versión en VersionInvalidacion dentro de la misma
+transacción que la escritura, así que la versión nueva se ve exactamente
+cuando se ven los datos nuevos. Cada entidad tiene INVALIDACION_FRAGMENTOS
+filas y cada hilo incrementa siempre la misma, así que dos transacciones que
+publican la misma entidad a la vez no esperan el bloqueo de una única fila;
+la versión es la suma de las filas.
+
+Una publicación puede indicar además qué ids cambiaron (publicar(..., ids=)).
+Se guardan en CambioInvalidacion y los suscriptores reciben, para cada
+entidad, los ids cambiados o None si no se sabe cuáles (hay que descartar
+todo). Las versiones y los cambios se leen en una sola consulta, así que son
+de la misma foto de la base: si desde la última lectura la versión avanzó lo
+mismo que la cantidad de cambios nuevos, esos cambios son todos los que
+hubo. Si no (una publicación sin ids, un cambio confirmado con un id menor
+que uno ya leído o ya borrado, la primera lectura del proceso), se avisa
+None.
+
+Cada proceso guarda las últimas versiones que leyó y las compara en
+sincronizar(). Para cada entidad que cambió llama a los suscriptores
+(suscribir()), que descartan sus caches locales. La lectura es una consulta
+chica, se hace fuera del lock del módulo (las peticiones que solo comparan la
+hora no la esperan), de a una por proceso, y se hace:
+
+- en PostgreSQL, apenas llega un NOTIFY (un hilo por proceso escucha el canal
+  con LISTEN), y además cada INVALIDACION_INTERVALO_RESPALDO segundos;
+- en otras bases (SQLite), como mucho cada INVALIDACION_INTERVALO_SONDEO
+  segundos, desde la petición que llama a sincronizar().
+
+Hay cambios que no pasan por una escritura (por ejemplo, que empiece una
+oferta). Las funciones registradas con agregar_verificacion() se llaman en
+cada sincronizar() y devuelven las entidades que cambiaron por su cuenta.
+"""
+
+import json
+import logging
+import os
+import select
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+CANAL = "invalidacion"
+# Cada cuántos cambios publicados se borran los vencidos
+PURGA_CADA = 500
+
+_lock = threading.Lock()
+# Lo tiene el hilo que está leyendo versiones y cambios; así las lecturas se
+# aplican en el orden en que se hicieron
+_lock_lectura = threading.Lock()
+_suscriptores = []
+_verificaciones = []
+_versiones = {}
+# Id del último CambioInvalidacion leído (None: todavía no se leyó)
+_ultimo_cambio = None
+_ultimo_sondeo = 0.0
+_escucha = {"pid": None, "activa": threading.Event()}
+
+
+def suscribir(callback, entidades):
+    """
+    Registra callback(cambios) para las entidades indicadas. cambios es un
+    dict de entidad -> frozenset de ids cambiados, o None si cambió todo.
+    """
+    _suscriptores.append((frozenset(entidades), callback))
+
+
+def agregar_verificacion(funcion):
+    """Registra funcion() -> entidades que cambiaron sin una escritura"""
+    _verificaciones.append(funcion)
+
+
+def notificar(cambios):
+    """
+    Avisa a los suscriptores de los cambios, en este proceso. cambios es un
+    dict como el que reciben los suscriptores o un iterable de entidades (que
+    cambiaron enteras).
+    """
+    if not isinstance(cambios, dict):
+        cambios = dict.fromkeys(cambios)
+    for entidades, callback in _suscriptores:
+        afectados = {
+            entidad: ids for entidad, ids in cambios.items() if entidad in entidades
+        }
+        if afectados:
+            try:
+                callback(afectados)
+            except Exception:
+                logger.exception("Error al invalidar la cache %r", callback)
+
+
+def _fragmento():
+    """Fila de cada entidad que incrementa el hilo actual"""
+    fragmentos = max(1, getattr(settings, "INVALIDACION_FRAGMENTOS", 8))
+    return hash((os.getpid(), threading.get_ident())) % fragmentos
+
+
+def publicar(*entidades, ids=None):
+    """
+    Incrementa la versión de las entidades en la transacción en curso. Los
+    demás procesos se enteran al hacerse el commit. Con ids, los suscriptores
+    reciben esos ids como los únicos cambiados de cada entidad.
+    """
+    from .models import CambioInvalidacion, VersionInvalidacion
+
+    entidades = sorted(set(entidades))
+    fragmento = _fragmento()
+    filas = VersionInvalidacion.objects.filter(
+        entidad__in=entidades, fragmento=fragmento
+    )
+    if filas.update(version=F("version") + 1) < len(entidades):
+        # Primera vez que se publica alguna de estas entidades en este
+        # fragmento. Se vuelve a incrementar todo: repetir el incremento de
+        # una entidad no molesta (los suscriptores reciben None), perderlo sí
+        VersionInvalidacion.objects.bulk_create(
+            [
+                VersionInvalidacion(entidad=entidad, fragmento=fragmento)
+                for entidad in entidades
+            ],
+            ignore_conflicts=True,
+        )
+        filas.update(version=F("version") + 1)
+
+    if ids is not None:
+        ids = sorted(set(ids))
+        for entidad in entidades:
+            cambio = CambioInvalidacion.objects.create(entidad=entidad, ids=ids)
+        if cambio.pk % PURGA_CADA == 0:
+            retencion = getattr(settings, "INVALIDACION_RETENCION_CAMBIOS", 3600)
+            CambioInvalidacion.objects.filter(
+                creado__lt=timezone.now() - timedelta(seconds=retencion)
+            ).delete()
+
+    if connection.vendor == "postgresql":
+        # NOTIFY es transaccional: se entrega solo si la escritura se confirma
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_notify(%s, %s)", [CANAL, ",".join(entidades)])
+
+    # Este proceso no espera al próximo sondeo
+    transaction.on_commit(lambda: sincronizar(forzar=True))
+
+
+def _leer(desde):
+    """
+    Versiones, cambios posteriores al id `desde` (ninguno si es None) y el
+    último id de cambio, en una sola consulta: (versiones, [(entidad, ids),
+    ...], último id)
+    """
+    from .models import CambioInvalidacion, VersionInvalidacion
+
+    versiones_tabla = connection.ops.quote_name(VersionInvalidacion._meta.db_table)
+    cambios_tabla = connection.ops.quote_name(CambioInvalidacion._meta.db_table)
+    consulta = (
+        f"SELECT 'v', entidad, SUM(version), NULL FROM {versiones_tabla} "
+        f"GROUP BY entidad UNION ALL "
+        f"SELECT 'u', NULL, MAX(id), NULL FROM {cambios_tabla}"
+    )
+    parametros = []
+    if desde is not None:
+        consulta += (
+            f" UNION ALL SELECT 'c', entidad, id, ids FROM {cambios_tabla} "
+            "WHERE id > %s"
+        )
+        parametros.append(desde)
+
+    with connection.cursor() as cursor:
+        cursor.execute(consulta, parametros)
+        filas = cursor.fetchall()
+
+    versiones, cambios, ultimo = {}, [], 0
+    for tipo, entidad, numero, ids in filas:
+        if tipo == "v":
+            versiones[entidad] = int(numero)
+        elif tipo == "u":
+            ultimo = int(numero or 0)
+        else:
+            cambios.append((entidad, json.loads(ids) if isinstance(ids, str) else ids))
+    return versiones, cambios, ultimo
+
+
+def _aplicar_lectura(versiones, cambios, ultimo):
+    """Actualiza el estado con una lectura y devuelve los cambios a avisar"""
+    global _ultimo_cambio
+
+    ids_por_entidad = {}
+    for entidad, ids in cambios:
+        ids_por_entidad.setdefault(entidad, []).append(ids)
+
+    with _lock:
+        # Sin una lectura anterior (o si se borraron cambios ya leídos, como
+        # al revertir una transacción en los tests) no se sabe qué cambió
+        desconocido = _ultimo_cambio is None or ultimo < _ultimo_cambio
+        resultado = {}
+        for entidad in set(versiones) | set(_versiones):
+            avance = versiones.get(entidad, 0) - _versiones.get(entidad, 0)
+            if not avance:
+                continue
+            listas = ids_por_entidad.get(entidad, [])
+            if desconocido or avance != len(listas):
+                resultado[entidad] = None
+            else:
+                resultado[entidad] = frozenset(pk for lista in listas for pk in lista)
+        _versiones.clear()
+        _versiones.update(versiones)
+        _ultimo_cambio = ultimo
+    return resultado
+
+
+def sincronizar(forzar=False):
+    """
+    Lee las versiones si toca y avisa a los suscriptores de lo que cambió.
+    Es barato llamarla en cada petición: casi siempre solo compara la hora.
+    Las consultas se hacen fuera de _lock; bajo el lock solo se decide si
+    leer y se actualiza el estado. Si otro hilo ya está leyendo, una llamada
+    sin forzar no espera: ese hilo avisa lo que haya cambiado.
+    """
+    global _ultimo_sondeo
+
+    _iniciar_escucha()
+    ahora = time.monotonic()
+    if _escucha["activa"].is_set():
+        intervalo = getattr(settings, "INVALIDACION_INTERVALO_RESPALDO", 30)
+    else:
+        intervalo = getattr(settings, "INVALIDACION_INTERVALO_SONDEO", 1)
+
+    with _lock:
+        leer = forzar or ahora - _ultimo_sondeo >= intervalo
+        if leer:
+            _ultimo_sondeo = ahora
+
+    cambios = {}
+    # Una lectura a la vez: así una lectura más vieja nunca pisa a una nueva
+    if leer and _lock_lectura.acquire(blocking=forzar):
+        try:
+            cambios = _aplicar_lectura(*_leer(_ultimo_cambio))
+        finally:
+            _lock_lectura.release()
+
+    for verificacion in _verificaciones:
+        for entidad in verificacion():
+            cambios[entidad] = None
+
+    if cambios:
+        notificar(cambios)
+
+
+def version(*entidades):
+    """Suma de las versiones locales de las entidades (crece con cada cambio)"""
+    sincronizar()
+    return sum(_versiones.get(entidad, 0) for entidad in entidades)
+
+
+def _iniciar_escucha():
+    """Arranca el hilo LISTEN de este proceso (solo PostgreSQL con psycopg2)"""
+    if (
+        connection.vendor != "postgresql"
+        or not getattr(settings, "INVALIDACION_ESCUCHAR", True)
+        or _escucha["pid"] == os.getpid()
+    ):
+        return
+    with _lock:
+        if _escucha["pid"] == os.getpid():
+            return
+        # Tras un fork el hilo del proceso padre no existe en el hijo
+        _escucha["pid"] = os.getpid()
+        _escucha["activa"] = threading.Event()
+        threading.Thread(target=_escuchar, name="invalidacion", daemon=True).start()
+
+
+def _escuchar():
+    activa = _escucha["activa"]
+    while True:
+        conexion = connections.create_connection("default")
+        try:
+            conexion.ensure_connection()
+            conexion.set_autocommit(True)
+            crudo = conexion.connection
+            if not hasattr(crudo, "poll"):
+                logger.info("El driver no soporta LISTEN; se usa solo el sondeo")
+                return
+            with crudo.cursor() as cursor:
+                cursor.execute(f"LISTEN {CANAL}")
+            activa.set()
+            # Lo que haya cambiado mientras no se escuchaba
+            sincronizar(forzar=True)
+
+            while True:
+                if select.select([crudo], [], [], 60) == ([], [], []):
+                    continue
+                crudo.poll()
+                if crudo.notifies:
+                    crudo.notifies.clear()
+                    sincronizar(forzar=True)
+        except Exception:
+            logger.exception("Se perdió la escucha de invalidaciones; se reintenta")
+        finally:
+            activa.clear()
+            conexion.close()
+            connections.close_all()
+        time.sleep(5)
@@ -0,0 +1,294 @@
+# backend/metricas.py
+"""
+Métricas en formato de texto de Prometheus.
+
+Cada proceso lleva sus contadores e histogramas en memoria (seguros entre
+hilos). Con METRICAS_DIRECTORIO configurado, cada proceso vuelca su estado a
+un archivo <pid>-<arranque>.json en ese directorio cada
+METRICAS_INTERVALO_VOLCADO segundos, y /metrics suma los archivos de todos los
+procesos (p. ej. los workers de gunicorn). Sin directorio, /metrics muestra
+solo el proceso que atiende la petición.
+
+El instante de arranque en el nombre evita que un proceso nuevo que reutiliza
+el pid de otro pise sus totales. Cada proceso borra su archivo al terminar, y
+/metrics borra los que no se actualizan hace más de METRICAS_VENCIMIENTO
+segundos (procesos que murieron sin terminar bien).
+
+/metrics responde 403 si METRICAS_TOKEN no está configurado o si la petición
+no trae "Authorization: Bearer <token>".
+"""
+
+import atexit
+import hmac
+import json
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+LIMITES_DURACION = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+LIMITES_CONSULTAS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+class Contador:
+    tipo = "counter"
+
+    def __init__(self, nombre, ayuda, etiquetas):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = etiquetas
+        self._lock = threading.Lock()
+        self._valores = {}
+
+    def incrementar(self, *valores_etiquetas, cantidad=1):
+        with self._lock:
+            self._valores[valores_etiquetas] = (
+                self._valores.get(valores_etiquetas, 0) + cantidad
+            )
+
+    def exportar(self):
+        with self._lock:
+            return [[list(clave), valor] for clave, valor in self._valores.items()]
+
+    @staticmethod
+    def combinar(acumulado, valor):
+        return (acumulado or 0) + valor
+
+    def lineas(self, valores):
+        for clave, valor in valores.items():
+            yield f"{self.nombre}{_etiquetas(self.etiquetas, clave)} {valor}"
+
+
+class Histograma:
+    tipo = "histogram"
+
+    def __init__(self, nombre, ayuda, etiquetas, limites):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = etiquetas
+        self.limites = limites
+        self._lock = threading.Lock()
+        self._valores = {}
+
+    def observar(self, valor, *valores_etiquetas):
+        with self._lock:
+            serie = self._valores.get(valores_etiquetas)
+            if serie is None:
+                serie = self._valores[valores_etiquetas] = {
+                    "buckets": [0] * len(self.limites),
+                    "suma": 0.0,
+                    "conteo": 0,
+                }
+            for i, limite in enumerate(self.limites):
+                if valor <= limite:
+                    serie["buckets"][i] += 1
+                    break
+            serie["suma"] += valor
+            serie["conteo"] += 1
+
+    def exportar(self):
+        with self._lock:
+            return [
+                [list(clave), {**serie, "buckets": list(serie["buckets"])}]
+                for clave, serie in self._valores.items()
+            ]
+
+    @staticmethod
+    def combinar(acumulado, valor):
+        if acumulado is None:
+            return {**valor, "buckets": list(valor["buckets"])}
+        acumulado["buckets"] = [
+            a + b for a, b in zip(acumulado["buckets"], valor["buckets"])
+        ]
+        acumulado["suma"] += valor["suma"]
+        acumulado["conteo"] += valor["conteo"]
+        return acumulado
+
+    def lineas(self, valores):
+        for clave, serie in valores.items():
+            acumulado = 0
+            for limite, cantidad in zip(self.limites, serie["buckets"]):
+                acumulado += cantidad
+                etiquetas = _etiquetas(self.etiquetas + ("le",), clave + (str(limite),))
+                yield f"{self.nombre}_bucket{etiquetas} {acumulado}"
+            etiquetas = _etiquetas(self.etiquetas + ("le",), clave + ("+Inf",))
+            yield f"{self.nombre}_bucket{etiquetas} {serie['conteo']}"
+            yield f"{self.nombre}_sum{_etiquetas(self.etiquetas, clave)} {serie['suma']}"
+            yield f"{self.nombre}_count{_etiquetas(self.etiquetas, clave)} {serie['conteo']}"
+
+
+def _escapar(valor):
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _etiquetas(nombres, valores):
+    if not nombres:
+        return ""
+    pares = ",".join(f'{n}="{_escapar(v)}"' for n, v in zip(nombres, valores))
+    return "{" + pares + "}"
+
+
+class Registro:
+    def __init__(self):
+        self._metricas = {}
+        self._lock = threading.Lock()
+        self._ultimo_volcado = 0.0
+        self._pid = None
+        self._archivo = None
+
+    def registrar(self, metrica):
+        self._metricas[metrica.nombre] = metrica
+        return metrica
+
+    def exportar(self):
+        return {nombre: m.exportar() for nombre, m in self._metricas.items()}
+
+    # Volcado y agregación entre procesos
+
+    def _directorio(self):
+        return getattr(settings, "METRICAS_DIRECTORIO", None)
+
+    def _nombre_archivo(self):
+        # Se recalcula en un proceso hijo creado con fork
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._archivo = f"{self._pid}-{time.time_ns():x}.json"
+        return self._archivo
+
+    def borrar_archivo(self):
+        """Borra el archivo de este proceso (al terminar)"""
+        directorio = self._directorio()
+        if not directorio or self._pid != os.getpid():
+            return
+        try:
+            os.remove(os.path.join(directorio, self._archivo))
+        except OSError:
+            pass
+
+    def volcar(self, forzar=False):
+        """Escribe el estado de este proceso en el directorio compartido"""
+        directorio = self._directorio()
+        if not directorio:
+            return
+        ahora = time.monotonic()
+        intervalo = getattr(settings, "METRICAS_INTERVALO_VOLCADO", 5)
+        if not forzar and ahora - self._ultimo_volcado < intervalo:
+            return
+        with self._lock:
+            self._ultimo_volcado = ahora
+            os.makedirs(directorio, exist_ok=True)
+            destino = os.path.join(directorio, self._nombre_archivo())
+            temporal = f"{destino}.tmp"
+            with open(temporal, "w") as archivo:
+                json.dump(self.exportar(), archivo)
+            os.replace(temporal, destino)
+
+    def _estados(self):
+        directorio = self._directorio()
+        if not directorio:
+            yield self.exportar()
+            return
+        self.volcar(forzar=True)
+        vencimiento = time.time() - getattr(settings, "METRICAS_VENCIMIENTO", 3600)
+        for nombre in os.listdir(directorio):
+            if not nombre.endswith(".json"):
+                continue
+            ruta = os.path.join(directorio, nombre)
+            try:
+                if os.path.getmtime(ruta) < vencimiento:
+                    os.remove(ruta)
+                    continue
+                with open(ruta) as archivo:
+                    yield json.load(archivo)
+            except (OSError, ValueError):
+                continue  # archivo de un proceso que se está escribiendo o ya no existe
+
+    def texto(self):
+        """Todas las métricas agregadas, en formato de texto de Prometheus"""
+        agregados = {nombre: {} for nombre in self._metricas}
+        for estado in self._estados():
+            for nombre, series in estado.items():
+                metrica = self._metricas.get(nombre)
+                if metrica is None:
+                    continue
+                for clave, valor in series:
+                    clave = tuple(clave)
+                    agregados[nombre][clave] = metrica.combinar(
+                        agregados[nombre].get(clave), valor
+                    )
+
+        lineas = []
+        for nombre, metrica in self._metricas.items():
+            lineas.append(f"# HELP {nombre} {metrica.ayuda}")
+            lineas.append(f"# TYPE {nombre} {metrica.tipo}")
+            lineas.extend(metrica.lineas(agregados[nombre]))
+        return "\n".join(lineas) + "\n"
+
+
+registro = Registro()
+atexit.register(registro.borrar_archivo)
+
+solicitudes = registro.registrar(
+    Contador(
+        "http_solicitudes_total",
+        "Solicitudes atendidas por ruta, método y código de estado",
+        ("ruta", "metodo", "estado"),
+    )
+)
+errores = registro.registrar(
+    Contador(
+        "http_errores_total",
+        "Solicitudes que terminaron con un error de servidor (5xx)",
+        ("ruta", "metodo"),
+    )
+)
+duracion = registro.registrar(
+    Histograma(
+        "http_duracion_segundos",
+        "Latencia de las solicitudes por ruta y método",
+        ("ruta", "metodo"),
+        LIMITES_DURACION,
+    )
+)
+consultas = registro.registrar(
+    Histograma(
+        "db_consultas_por_solicitud",
+        "Consultas SQL ejecutadas por solicitud",
+        ("ruta", "metodo"),
+        LIMITES_CONSULTAS,
+    )
+)
+cache = registro.registrar(
+    Contador(
+        "cache_consultas_total",
+        "Búsquedas en las caches de la aplicación, por resultado (acierto/fallo)",
+        ("cache", "resultado"),
+    )
+)
+
+
+def observar_solicitud(ruta, metodo, estado, segundos, cantidad_consultas):
+    ruta = ruta or "sin_ruta"
+    solicitudes.incrementar(ruta, metodo, str(estado))
+    if estado >= 500:
+        errores.incrementar(ruta, metodo)
+    duracion.observar(segundos, ruta, metodo)
+    consultas.observar(cantidad_consultas, ruta, metodo)
+    registro.volcar()
+
+
+def contar_cache(nombre, acierto, cantidad=1):
+    if cantidad:
+        cache.incrementar(nombre, "acierto" if acierto else "fallo", cantidad=cantidad)
+
+
+def vista_metricas(request):
+    token = getattr(settings, "METRICAS_TOKEN", "")
+    recibido = request.headers.get("Authorization", "")
+    if not token or not hmac.compare_digest(recibido, f"Bearer {token}"):
+        return HttpResponseForbidden()
+    return HttpResponse(
+        registro.texto(), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
@@ -0,0 +1,149 @@
+# backend/middleware.py
+"""
+Instrumentación por petición: cantidad de consultas SQL, tiempo en base de
+datos, tiempo de serialización (DRF) y tiempo total.
+
+Los valores se devuelven en el encabezado Server-Timing (visible en las
+herramientas de desarrollo del navegador) y se registran como una línea JSON
+con nivel INFO en el logger "backend.instrumentacion" (por defecto solo se
+muestran las advertencias; ver INSTRUMENTACION_NIVEL_LOG).
+
+Solo se cuentan las consultas que hacen las conexiones del hilo de la
+petición mientras corre la vista. No se cuentan las de los hilos del pool de
+reporte_rapido (reportes/paralelo.py), que abren sus propias conexiones, ni
+las de los cuerpos en streaming, que se consumen después de que el
+middleware devolvió la respuesta.
+
+PRESUPUESTO_CONSULTAS asigna a cada ruta (nombre de la url, p. ej.
+"producto-list") un máximo de consultas. Al excederlo se registra una
+advertencia; con PRESUPUESTO_CONSULTAS_ESTRICTO se lanza una excepción, lo
+que hace fallar los tests que pasan por esa ruta.
+
+Las mismas mediciones alimentan los histogramas de backend.metricas.
+"""
+
+import contextvars
+import json
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from rest_framework.serializers import BaseSerializer
+
+from . import metricas
+
+logger = logging.getLogger("backend.instrumentacion")
+
+_medicion_actual = contextvars.ContextVar("medicion_actual", default=None)
+
+
+class PresupuestoConsultasExcedido(Exception):
+    pass
+
+
+class Medicion:
+    def __init__(self):
+        self.consultas = 0
+        self.tiempo_db = 0.0
+        self.tiempo_serializacion = 0.0
+        self.profundidad_serializacion = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        # execute_wrapper: se invoca en cada consulta de las conexiones del hilo
+        # de la petición (connections.all() solo devuelve las de este hilo)
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.tiempo_db += time.perf_counter() - inicio
+            self.consultas += 1
+
+
+def _instrumentar_serializadores():
+    """Envuelve BaseSerializer.data para medir el tiempo de serialización"""
+    data_original = BaseSerializer.data
+    if getattr(data_original.fget, "instrumentado", False):
+        return
+
+    def data(self):
+        medicion = _medicion_actual.get()
+        if medicion is None:
+            return data_original.fget(self)
+
+        # Solo se mide el serializer exterior (los anidados ya están incluidos)
+        medicion.profundidad_serializacion += 1
+        inicio = time.perf_counter()
+        try:
+            return data_original.fget(self)
+        finally:
+            medicion.profundidad_serializacion -= 1
+            if medicion.profundidad_serializacion == 0:
+                medicion.tiempo_serializacion += time.perf_counter() - inicio
+
+    data.instrumentado = True
+    BaseSerializer.data = property(data)
+
+
+class InstrumentacionMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        _instrumentar_serializadores()
+
+    def __call__(self, request):
+        medicion = Medicion()
+        token = _medicion_actual.set(medicion)
+        inicio = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for conexion in connections.all():
+                    stack.enter_context(conexion.execute_wrapper(medicion))
+                response = self.get_response(request)
+        finally:
+            _medicion_actual.reset(token)
+        total = time.perf_counter() - inicio
+
+        response["Server-Timing"] = ", ".join(
+            [
+                f"db;dur={medicion.tiempo_db * 1000:.1f}",
+                f'consultas;desc="{medicion.consultas}"',
+                f"serializacion;dur={medicion.tiempo_serializacion * 1000:.1f}",
+                f"total;dur={total * 1000:.1f}",
+            ]
+        )
+
+        ruta = getattr(request.resolver_match, "view_name", None)
+        logger.info(
+            json.dumps(
+                {
+                    "metodo": request.method,
+                    "ruta": ruta,
+                    "path": request.path,
+                    "estado": response.status_code,
+                    "consultas": medicion.consultas,
+                    "db_ms": round(medicion.tiempo_db * 1000, 1),
+                    "serializacion_ms": round(medicion.tiempo_serializacion * 1000, 1),
+                    "total_ms": round(total * 1000, 1),
+                }
+            )
+        )
+
+        metricas.observar_solicitud(
+            ruta, request.method, response.status_code, total, medicion.consultas
+        )
+        self.verificar_presupuesto(ruta, medicion.consultas)
+        return response
+
+    def verificar_presupuesto(self, ruta, consultas):
+        presupuesto = getattr(settings, "PRESUPUESTO_CONSULTAS", {}).get(ruta)
+        if presupuesto is None or consultas <= presupuesto:
+            return
+
+        mensaje = (
+            f"La ruta {ruta} ejecutó {consultas} consultas "
+            f"(presupuesto: {presupuesto})"
+        )
+        if getattr(settings, "PRESUPUESTO_CONSULTAS_ESTRICTO", False):
+            raise PresupuestoConsultasExcedido(mensaje)
+        logger.warning(mensaje)
@@ -0,0 +1,26 @@
+# Generated by Django 5.2 on 2026-10-19 08:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VersionInvalidacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entidad', models.CharField(max_length=30)),
+                ('fragmento', models.PositiveSmallIntegerField(default=0)),
+                ('version', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('entidad', 'fragmento'), name='invalidacion_entidad_fragmento_unica')],
+            },
+        ),
+    ]
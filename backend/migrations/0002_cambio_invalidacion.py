@@ -0,0 +1,22 @@
+# Generated by Django 5.2 on 2026-10-19 08:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CambioInvalidacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entidad', models.CharField(max_length=30)),
+                ('ids', models.JSONField()),
+                ('creado', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+        ),
+    ]
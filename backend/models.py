@@ -0,0 +1,45 @@
+from django.db import models
+
+
+class VersionInvalidacion(models.Model):
+    """
+    Versión por entidad del bus de invalidación ("producto", "permisos", ...).
+    Cada escritura incrementa la de su entidad en la misma transacción; los
+    procesos comparan estas versiones para descartar sus caches locales (ver
+    backend/invalidacion.py).
+
+    Cada entidad se reparte en varias filas (fragmento) para que escrituras
+    concurrentes no esperen todas el bloqueo de la misma fila; la versión de
+    la entidad es la suma de sus fragmentos.
+    """
+
+    entidad = models.CharField(max_length=30)
+    fragmento = models.PositiveSmallIntegerField(default=0)
+    version = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["entidad", "fragmento"],
+                name="invalidacion_entidad_fragmento_unica",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.entidad}[{self.fragmento}] v{self.version}"
+
+
+class CambioInvalidacion(models.Model):
+    """
+    Ids afectados por una publicación del bus que los indicó (por ejemplo,
+    los productos que cambiaron). Con ellos cada proceso descarta solo esas
+    entradas de sus caches en lugar de todo (ver backend/invalidacion.py). Se
+    borran pasados INVALIDACION_RETENCION_CAMBIOS segundos.
+    """
+
+    entidad = models.CharField(max_length=30)
+    ids = models.JSONField()
+    creado = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.entidad} {self.ids}"
@@ -0,0 +1,30 @@
+# backend/parsers.py
+"""
+Parser JSON basado en orjson, con el JSONParser de DRF como respaldo cuando
+orjson no está instalado o el cuerpo no viene en UTF-8.
+"""
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+
+from .renderers import ORJSONRenderer, orjson
+
+
+class ORJSONParser(JSONParser):
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get("encoding", settings.DEFAULT_CHARSET)
+        if orjson is None or encoding.lower().replace("_", "-") not in (
+            "utf-8",
+            "utf8",
+        ):
+            return super().parse(stream, media_type, parser_context)
+
+        try:
+            # orjson rechaza NaN e Infinity, igual que DRF con STRICT_JSON
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError("JSON parse error - %s" % str(exc))
@@ -0,0 +1,268 @@
+# backend/perfilado.py
+"""
+Perfilado de peticiones individuales con cProfile.
+
+Una petición se perfila si:
+
+- trae el encabezado X-Perfilar con una firma válida (la entrega
+  PerfilFirmaView a un staff), pensado para reproducir un caso lento desde
+  un cliente que no es staff;
+- trae ?perfilar=1 y la hace un usuario staff;
+- cae en el muestreo de 1 de cada PERFILADO_MUESTREO peticiones.
+
+Cada captura guarda en PERFILADO_DIRECTORIO el perfil (<id>.prof, legible con
+pstats o snakeviz) y un <id>.json con los datos de la petición, las funciones
+más costosas y las consultas SQL con su duración. Se conservan las
+PERFILADO_MAXIMO capturas más recientes. La respuesta perfilada lleva el id en
+el encabezado X-Perfil-Id.
+"""
+
+import cProfile
+import io
+import json
+import os
+import pstats
+import random
+import time
+import uuid
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core import signing
+from django.db import connections
+from django.http import FileResponse, Http404
+from django.utils import timezone
+from rest_framework.exceptions import APIException
+from rest_framework.permissions import IsAdminUser
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.views import APIView
+
+SALT_FIRMA = "backend.perfilado"
+VALOR_FIRMADO = "perfilar"
+ENCABEZADO = "X-Perfilar"
+FUNCIONES_EN_RESUMEN = 40
+
+
+def generar_firma():
+    """Valor para el encabezado X-Perfilar (vence según PERFILADO_FIRMA_DURACION)"""
+    return signing.TimestampSigner(salt=SALT_FIRMA).sign(VALOR_FIRMADO)
+
+
+def _firma_valida(valor):
+    duracion = getattr(settings, "PERFILADO_FIRMA_DURACION", 3600)
+    try:
+        signing.TimestampSigner(salt=SALT_FIRMA).unsign(valor, max_age=duracion)
+    except signing.BadSignature:
+        return False
+    return True
+
+
+def _es_staff(request):
+    """Autentica la petición como lo haría DRF para saber si es staff"""
+    usuario = getattr(request, "user", None)
+    if usuario is not None and usuario.is_authenticated:
+        return usuario.is_staff
+
+    drf_request = Request(request)
+    for clase in api_settings.DEFAULT_AUTHENTICATION_CLASSES:
+        try:
+            resultado = clase().authenticate(drf_request)
+        except APIException:
+            return False
+        if resultado is not None:
+            return bool(resultado[0].is_staff)
+    return False
+
+
+def _directorio():
+    return getattr(settings, "PERFILADO_DIRECTORIO", "perfiles")
+
+
+class RegistroConsultas:
+    """execute_wrapper que guarda cada consulta con su duración"""
+
+    def __init__(self, maximo):
+        self.maximo = maximo
+        self.consultas = []
+        self.omitidas = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            if len(self.consultas) < self.maximo:
+                self.consultas.append(
+                    {
+                        "sql": sql,
+                        "ms": round((time.perf_counter() - inicio) * 1000, 3),
+                        "many": many,
+                    }
+                )
+            else:
+                self.omitidas += 1
+
+
+class PerfiladoMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def motivo(self, request):
+        """Por qué se perfila la petición, o None si no se perfila"""
+        firma = request.headers.get(ENCABEZADO)
+        if firma and _firma_valida(firma):
+            return "encabezado"
+        if request.GET.get("perfilar") and _es_staff(request):
+            return "parametro"
+        muestreo = getattr(settings, "PERFILADO_MUESTREO", 0)
+        if muestreo and random.random() < 1 / muestreo:
+            return "muestreo"
+        return None
+
+    def __call__(self, request):
+        motivo = self.motivo(request)
+        if motivo is None:
+            return self.get_response(request)
+
+        perfil = cProfile.Profile()
+        consultas = RegistroConsultas(
+            getattr(settings, "PERFILADO_MAXIMO_CONSULTAS", 1000)
+        )
+        inicio = time.perf_counter()
+        with ExitStack() as stack:
+            for conexion in connections.all():
+                stack.enter_context(conexion.execute_wrapper(consultas))
+            try:
+                perfil.enable()
+            except ValueError:
+                # Otro perfilador activo en este proceso: se atiende sin perfilar
+                return self.get_response(request)
+            try:
+                response = self.get_response(request)
+            finally:
+                perfil.disable()
+        duracion = time.perf_counter() - inicio
+
+        identificador = self.guardar(
+            request, response, motivo, perfil, consultas, duracion
+        )
+        response["X-Perfil-Id"] = identificador
+        return response
+
+    def guardar(self, request, response, motivo, perfil, consultas, duracion):
+        directorio = _directorio()
+        os.makedirs(directorio, exist_ok=True)
+        identificador = f"{int(time.time() * 1000)}-{uuid.uuid4().hex[:8]}"
+
+        perfil.dump_stats(os.path.join(directorio, f"{identificador}.prof"))
+        resumen = io.StringIO()
+        pstats.Stats(perfil, stream=resumen).sort_stats("cumulative").print_stats(
+            FUNCIONES_EN_RESUMEN
+        )
+
+        datos = {
+            "id": identificador,
+            "fecha": timezone.now().isoformat(),
+            "motivo": motivo,
+            "metodo": request.method,
+            "path": request.get_full_path(),
+            "ruta": getattr(request.resolver_match, "view_name", None),
+            "estado": response.status_code,
+            "duracion_ms": round(duracion * 1000, 1),
+            "cantidad_consultas": len(consultas.consultas) + consultas.omitidas,
+            "tiempo_db_ms": round(sum(c["ms"] for c in consultas.consultas), 1),
+            "consultas": consultas.consultas,
+            "resumen": resumen.getvalue(),
+        }
+        with open(os.path.join(directorio, f"{identificador}.json"), "w") as archivo:
+            json.dump(datos, archivo, ensure_ascii=False)
+
+        self.purgar(directorio)
+        return identificador
+
+    def purgar(self, directorio):
+        """Conserva solo las PERFILADO_MAXIMO capturas más recientes"""
+        maximo = getattr(settings, "PERFILADO_MAXIMO", 200)
+        # Los ids empiezan con el timestamp: el orden alfabético es cronológico
+        capturas = sorted(
+            nombre[:-5] for nombre in os.listdir(directorio) if nombre.endswith(".json")
+        )
+        for identificador in capturas[:-maximo]:
+            for extension in (".json", ".prof"):
+                try:
+                    os.remove(os.path.join(directorio, identificador + extension))
+                except FileNotFoundError:
+                    pass
+
+
+def _leer_captura(identificador):
+    ruta = os.path.join(_directorio(), f"{os.path.basename(identificador)}.json")
+    try:
+        with open(ruta) as archivo:
+            return json.load(archivo)
+    except (OSError, ValueError):
+        return None
+
+
+class PerfilesView(APIView):
+    """Capturas de perfilado, de la más lenta a la más rápida"""
+
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        try:
+            limite = int(request.query_params.get("limite", 50))
+        except ValueError:
+            limite = 50
+
+        directorio = _directorio()
+        nombres = os.listdir(directorio) if os.path.isdir(directorio) else []
+        capturas = []
+        for nombre in nombres:
+            if not nombre.endswith(".json"):
+                continue
+            datos = _leer_captura(nombre[:-5])
+            if datos is None:
+                continue
+            # El listado no incluye el detalle (consultas y funciones)
+            datos.pop("consultas", None)
+            datos.pop("resumen", None)
+            capturas.append(datos)
+
+        capturas.sort(key=lambda datos: datos["duracion_ms"], reverse=True)
+        return Response(capturas[:limite])
+
+
+class PerfilFirmaView(APIView):
+    """Genera el valor del encabezado X-Perfilar"""
+
+    permission_classes = [IsAdminUser]
+
+    def post(self, request):
+        return Response(
+            {
+                "encabezado": ENCABEZADO,
+                "valor": generar_firma(),
+                "expira_en": getattr(settings, "PERFILADO_FIRMA_DURACION", 3600),
+            }
+        )
+
+
+class PerfilDetalleView(APIView):
+    """Detalle de una captura; con ?descargar=1 devuelve el archivo .prof"""
+
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, identificador):
+        datos = _leer_captura(identificador)
+        if datos is None:
+            raise Http404
+
+        if request.query_params.get("descargar"):
+            ruta = os.path.join(_directorio(), f"{datos['id']}.prof")
+            return FileResponse(
+                open(ruta, "rb"), as_attachment=True, filename=f"{datos['id']}.prof"
+            )
+        return Response(datos)
@@ -0,0 +1,51 @@
+# backend/renderers.py
+"""
+Renderer JSON basado en orjson.
+
+Produce la misma salida que el JSONRenderer de DRF (separadores compactos,
+UTF-8, Decimal como número, fechas en ISO 8601 con "Z" para UTC y
+milisegundos) porque todo lo que orjson no serializa igual, incluidas las
+fechas, se delega en el JSONEncoder de DRF. Si orjson no está instalado, o la
+respuesta pide indentación distinta de 2, se usa el renderer de DRF.
+"""
+
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # orjson es opcional; sin él se usa json de la stdlib
+    orjson = None
+
+OPCIONES_ORJSON = (
+    (orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS) if orjson else 0
+)
+
+
+class ORJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        if orjson is None or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if indent not in (None, 2):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        opciones = OPCIONES_ORJSON
+        if indent == 2:
+            opciones |= orjson.OPT_INDENT_2
+        try:
+            ret = orjson.dumps(
+                data, default=self.encoder_class().default, option=opciones
+            )
+        except orjson.JSONEncodeError:
+            # Enteros de más de 64 bits y otros casos que orjson no admite
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Igual que DRF: U+2028 y U+2029 escapados para que sea JavaScript válido
+        if b"\xe2\x80\xa8" in ret or b"\xe2\x80\xa9" in ret:
+            ret = ret.replace(b"\xe2\x80\xa8", b"\\u2028").replace(
+                b"\xe2\x80\xa9", b"\\u2029"
+            )
+        return ret
@@ -33,6 +33,48 @@ ALLOWED_HOSTS = ['*']  # Permitir cualquier host
 # URL del microservicio de recomendaciones
 RECOMMENDATION_SERVICE_URL = config('RECOMMENDATION_SERVICE_URL', default='http://localhost:8001/api/recommendations/')
 
+# Número máximo de hilos para ejecutar sub-reportes en paralelo (reporte-rapido)
+REPORTES_MAX_HILOS = config('REPORTES_MAX_HILOS', default=5, cast=int)
+
+# Motor columnar en memoria para reportes (requiere numpy instalado).
+# REFRESCO: segundos entre cargas incrementales; RECARGA: segundos entre cargas completas
+REPORTES_MOTOR_COLUMNAR = config('REPORTES_MOTOR_COLUMNAR', default=False, cast=bool)
+REPORTES_COLUMNAR_REFRESCO = config('REPORTES_COLUMNAR_REFRESCO', default=5, cast=int)
+REPORTES_COLUMNAR_RECARGA = config('REPORTES_COLUMNAR_RECARGA', default=3600, cast=int)
+
+# Top de productos en tiempo real: tamaño del resumen Space-Saving por día y
+# segundos entre sincronizaciones con la base de datos (ventas de otros procesos)
+TOPK_CAPACIDAD = config('TOPK_CAPACIDAD', default=200, cast=int)
+TOPK_RESINCRONIZACION = config('TOPK_RESINCRONIZACION', default=300, cast=int)
+
+# Tokens de sesión: segundos de vida desde el login (0 = no expiran) y cache
+# token -> usuario por proceso (entradas máximas y segundos de validez)
+TOKEN_EXPIRACION = config('TOKEN_EXPIRACION', default=7 * 24 * 3600, cast=int)
+TOKEN_CACHE_MAXIMO = config('TOKEN_CACHE_MAXIMO', default=10000, cast=int)
+TOKEN_CACHE_TTL = config('TOKEN_CACHE_TTL', default=60, cast=int)
+
+# Tokens de acceso firmados (Bearer): segundos de validez. Un cambio de rol se
+# refleja, como mucho, al vencer el token
+TOKEN_ACCESO_DURACION = config('TOKEN_ACCESO_DURACION', default=300, cast=int)
+
+# Importación masiva de usuarios: filas por lote (una inserción por lote) y
+# procesos para el hash de contraseñas (0 = uno por CPU)
+IMPORTACION_TAMANO_LOTE = config('IMPORTACION_TAMANO_LOTE', default=1000, cast=int)
+IMPORTACION_PROCESOS = config('IMPORTACION_PROCESOS', default=0, cast=int)
+
+# Throttling con token bucket (backend/throttling.py). ALMACEN: 'local' (por
+# proceso) o 'cache' (compartido entre procesos vía la cache de Django).
+# BUCKETS: alcance -> {'ip' | 'usuario' | 'endpoint': (capacidad, tokens por minuto)}
+THROTTLE_ALMACEN = config('THROTTLE_ALMACEN', default='local')
+# Sin un bucket 'endpoint' en login: un solo cliente podría agotarlo y dejar
+# sin login a todos
+THROTTLE_BUCKETS = {
+    'login': {'ip': (10, 5)},
+    'registro': {'ip': (5, 2)},
+    'usuarios_publico': {'ip': (60, 60)},
+    'exportacion_ml': {'ip': (30, 10), 'endpoint': (100, 50)},
+}
+
 
 # Application definition
 
@@ -43,8 +85,10 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework.authtoken',
+    'backend',
     'usuarios',
     'productos',
     'pedidos',
@@ -57,12 +101,29 @@ AUTH_USER_MODEL = 'usuarios.Usuario'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'usuarios.authentication.AccesoFirmadoAuthentication',
+        'usuarios.authentication.TokenCacheadoAuthentication',
+    ],
+    # JSON con orjson (misma salida que el renderer de DRF, ver backend/renderers.py)
+    'DEFAULT_RENDERER_CLASSES': [
+        'backend.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'backend.parsers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
     ],
+    # Proxies de confianza delante de la aplicación. La IP del cliente (para
+    # el throttling) es la que agregó el más externo de ellos en
+    # X-Forwarded-For; con 0 se usa REMOTE_ADDR y el encabezado se ignora,
+    # así que un cliente no puede cambiar de IP falsificándolo
+    'NUM_PROXIES': config('NUM_PROXIES', default=0, cast=int),
 }
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'backend.compresion.CompresionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -71,8 +132,86 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'corsheaders.middleware.CorsMiddleware',  # Habilitar CORS
     'django.middleware.common.CommonMiddleware',
+    'backend.middleware.InstrumentacionMiddleware',
+    'backend.perfilado.PerfiladoMiddleware',
 ]
 
+# Máximo de consultas SQL por ruta (nombre de la url). Al excederlo
+# InstrumentacionMiddleware registra una advertencia, o lanza una excepción si
+# PRESUPUESTO_CONSULTAS_ESTRICTO está activo (pensado para los tests). No se
+# cuentan las consultas de hilos del pool ni las de respuestas en streaming
+# (ver backend/middleware.py)
+PRESUPUESTO_CONSULTAS = {
+    'usuario-list': 3,
+    'categoria-list': 3,
+    'autor-list': 3,
+    'genero-list': 3,
+    'editorial-list': 3,
+    'producto-detail': 5,
+    'reporte-dashboard': 20,
+}
+PRESUPUESTO_CONSULTAS_ESTRICTO = config('PRESUPUESTO_CONSULTAS_ESTRICTO', default=False, cast=bool)
+
+# Métricas de Prometheus en /metrics. Con varios procesos (workers) cada uno
+# vuelca sus métricas a METRICAS_DIRECTORIO y /metrics las suma; vacío = solo
+# el proceso que atiende el scrape. Los archivos sin actualizar hace más de
+# METRICAS_VENCIMIENTO segundos se descartan. METRICAS_TOKEN exige
+# "Bearer <token>"; sin token /metrics responde 403.
+METRICAS_DIRECTORIO = config('METRICAS_DIRECTORIO', default='')
+METRICAS_INTERVALO_VOLCADO = config('METRICAS_INTERVALO_VOLCADO', default=5, cast=int)
+METRICAS_VENCIMIENTO = config('METRICAS_VENCIMIENTO', default=3600, cast=int)
+METRICAS_TOKEN = config('METRICAS_TOKEN', default='')
+
+# Bus de invalidación de las caches de cada proceso (catálogo, permisos por
+# rol; ver backend/invalidacion.py): cada cuántos segundos un proceso relee las
+# versiones sin LISTEN/NOTIFY (SQLite) y con él (PostgreSQL, como respaldo)
+INVALIDACION_INTERVALO_SONDEO = config('INVALIDACION_INTERVALO_SONDEO', default=1, cast=float)
+INVALIDACION_INTERVALO_RESPALDO = 30
+INVALIDACION_ESCUCHAR = config('INVALIDACION_ESCUCHAR', default=True, cast=bool)
+# Filas de VersionInvalidacion por entidad, para repartir los bloqueos de escritura
+INVALIDACION_FRAGMENTOS = config('INVALIDACION_FRAGMENTOS', default=8, cast=int)
+# Segundos que se guardan los ids publicados con cada cambio (CambioInvalidacion)
+INVALIDACION_RETENCION_CAMBIOS = 3600
+
+# Tope en bytes de la cache de productos serializados de cada proceso
+# (productos/documentos.py); 0 la desactiva
+PRODUCTOS_DOCUMENTOS_MAXIMO_BYTES = config('PRODUCTOS_DOCUMENTOS_MAXIMO_BYTES', default=32 * 1024 * 1024, cast=int)
+
+# Configuración de texto de PostgreSQL para la búsqueda de productos
+# (productos/busqueda.py); la migración 0006 usa "spanish"
+BUSQUEDA_CONFIGURACION = 'spanish'
+# Cada cuántos segundos el autocompletado recalcula la popularidad
+AUTOCOMPLETAR_REFRESCO = 300
+
+# Respuestas más chicas que esto (en bytes) no se comprimen
+COMPRESION_TAMANO_MINIMO = 512
+
+# Perfilado de peticiones con cProfile (ver backend/perfilado.py).
+# PERFILADO_MUESTREO = N perfila 1 de cada N peticiones; 0 = solo a pedido
+PERFILADO_DIRECTORIO = config('PERFILADO_DIRECTORIO', default=str(BASE_DIR / 'perfiles'))
+PERFILADO_MUESTREO = config('PERFILADO_MUESTREO', default=0, cast=int)
+PERFILADO_MAXIMO = config('PERFILADO_MAXIMO', default=200, cast=int)
+PERFILADO_MAXIMO_CONSULTAS = 1000
+PERFILADO_FIRMA_DURACION = 3600
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        # Una línea JSON por petición con consultas y tiempos (nivel INFO,
+        # se activa con INSTRUMENTACION_NIVEL_LOG=INFO); por defecto solo las
+        # advertencias de presupuesto excedido
+        'backend.instrumentacion': {
+            'handlers': ['console'],
+            'level': config('INSTRUMENTACION_NIVEL_LOG', default='WARNING'),
+            'propagate': False,
+        },
+    },
+}
+
 SWAGGER_SETTINGS = {
     'SECURITY_DEFINITIONS': {
         'Token': {
@@ -80,7 +219,13 @@ SWAGGER_SETTINGS = {
             'in': 'header',
             'name': 'Authorization',
             'description': "Formato: Token <tu_token>",
-        }
+        },
+        'Bearer': {
+            'type': 'apiKey',
+            'in': 'header',
+            'name': 'Authorization',
+            'description': "Formato: Bearer <token_de_acceso>",
+        },
     },
     'USE_SESSION_AUTH': False,  # Oculta el login por username/password
 }
@@ -0,0 +1,441 @@
+import gzip
+import io
+import json
+import os
+import tempfile
+import time
+import uuid
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock, skipIf
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from productos.tests import crear_catalogo
+from usuarios.authentication import generar_token_acceso
+from usuarios.models import Usuario
+
+from . import invalidacion
+from .compresion import elegir_codificacion
+from .metricas import registro
+from .middleware import PresupuestoConsultasExcedido
+from .models import CambioInvalidacion, VersionInvalidacion
+from .parsers import ORJSONParser
+from .perfilado import generar_firma
+from .renderers import ORJSONRenderer, orjson
+
+
+@override_settings(INVALIDACION_INTERVALO_SONDEO=3600)
+class BusInvalidacionTests(TestCase):
+    def setUp(self):
+        invalidacion.sincronizar(forzar=True)
+        self.avisos = []
+        invalidacion.suscribir(self.avisos.append, ["producto", "oferta"])
+        self.addCleanup(invalidacion._suscriptores.pop)
+
+    def test_publicar_avisa_al_confirmar(self):
+        antes = invalidacion.version("producto")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidacion.publicar("producto", "categoria")
+            self.assertEqual(self.avisos, [])
+
+        self.assertEqual(self.avisos, [{"producto": None}])
+        self.assertEqual(invalidacion.version("producto"), antes + 1)
+
+    def test_ids_publicados(self):
+        # El primer incremento de cada fragmento cuenta doble
+        invalidacion.publicar("producto", "oferta")
+        invalidacion.sincronizar(forzar=True)
+        self.avisos.clear()
+
+        invalidacion.publicar("producto", ids=[2, 1])
+        invalidacion.publicar("producto", ids=[3])
+        invalidacion.publicar("oferta", ids=[7])
+        invalidacion.sincronizar(forzar=True)
+        self.assertEqual(
+            self.avisos, [{"producto": frozenset({1, 2, 3}), "oferta": frozenset({7})}]
+        )
+
+        # Una publicación sin ids vale por todo
+        self.avisos.clear()
+        invalidacion.publicar("producto", ids=[4])
+        invalidacion.publicar("producto")
+        invalidacion.sincronizar(forzar=True)
+        self.assertEqual(self.avisos, [{"producto": None}])
+
+        # Igual que un cambio que no se llegó a leer (por ejemplo, uno que se
+        # confirmó con un id menor que otro ya leído)
+        self.avisos.clear()
+        invalidacion.publicar("producto", ids=[5])
+        CambioInvalidacion.objects.latest("pk").delete()
+        invalidacion.sincronizar(forzar=True)
+        self.assertEqual(self.avisos, [{"producto": None}])
+
+    def test_purga_los_cambios_vencidos(self):
+        invalidacion.publicar("producto", ids=[1])
+        CambioInvalidacion.objects.update(creado=timezone.now() - timedelta(days=1))
+
+        with mock.patch.object(invalidacion, "PURGA_CADA", 1):
+            invalidacion.publicar("producto", ids=[2])
+
+        self.assertEqual(
+            list(CambioInvalidacion.objects.values_list("ids", flat=True)), [[2]]
+        )
+
+    def test_la_version_suma_los_fragmentos(self):
+        antes = invalidacion._leer(None)[0].get("autor", 0)
+        for fragmento in (0, 3, 3):
+            with mock.patch.object(invalidacion, "_fragmento", return_value=fragmento):
+                invalidacion.publicar("autor")
+
+        self.assertEqual(VersionInvalidacion.objects.filter(entidad="autor").count(), 2)
+        self.assertEqual(invalidacion._leer(None)[0]["autor"], antes + 3)
+
+    def test_sin_consultas_entre_sondeos(self):
+        with self.assertNumQueries(0):
+            invalidacion.sincronizar()
+            invalidacion.version("producto")
+
+    def test_consulta_fuera_del_lock(self):
+        leer = invalidacion._leer
+
+        def leer_sin_lock(desde):
+            self.assertFalse(invalidacion._lock.locked())
+            return leer(desde)
+
+        with mock.patch.object(invalidacion, "_leer", leer_sin_lock):
+            invalidacion.sincronizar(forzar=True)
+
+    def test_una_lectura_a_la_vez(self):
+        # Mientras otro hilo lee, sincronizar() sin forzar no vuelve a leer
+        with invalidacion._lock_lectura, self.settings(
+            INVALIDACION_INTERVALO_SONDEO=0
+        ), self.assertNumQueries(0):
+            invalidacion.sincronizar()
+
+    def test_verificaciones(self):
+        pendientes = {"oferta"}
+
+        def verificacion():
+            cambiadas = set(pendientes)
+            pendientes.clear()
+            return cambiadas
+
+        invalidacion.agregar_verificacion(verificacion)
+        self.addCleanup(invalidacion._verificaciones.remove, verificacion)
+
+        invalidacion.sincronizar()
+        invalidacion.sincronizar()
+        self.assertEqual(self.avisos, [{"oferta": None}])
+
+
+@override_settings(PRESUPUESTO_CONSULTAS_ESTRICTO=True)
+class PresupuestoConsultasTests(TestCase):
+    def test_endpoints_principales_dentro_del_presupuesto(self):
+        cliente, productos = crear_catalogo()
+        urls = [
+            "/Libreria/productos/",
+            f"/Libreria/productos/{productos[0].id}/",
+            "/Libreria/productos/en-oferta/",
+            "/Libreria/categorias/",
+            "/Libreria/autores/",
+            "/Libreria/generos/",
+            "/Libreria/editoriales/",
+            "/Libreria/ofertas/",
+            "/Libreria/usuarios/",
+            "/Libreria/reportes/dashboard/",
+        ]
+        # La primera petición (producto-list, sin presupuesto) carga lo que
+        # el proceso comparte entre rutas: versiones del bus y máscara del rol.
+        # La segunda pasada sale de las caches de cada ruta
+        for _ in range(2):
+            for url in urls:
+                with self.subTest(url=url):
+                    respuesta = cliente.get(url)
+                    self.assertEqual(respuesta.status_code, 200)
+                    self.assertIn("consultas;desc=", respuesta["Server-Timing"])
+
+    @override_settings(PRESUPUESTO_CONSULTAS={"producto-list": 0})
+    def test_exceder_el_presupuesto_falla(self):
+        cliente, _ = crear_catalogo()
+        with self.assertRaisesMessage(PresupuestoConsultasExcedido, "producto-list"):
+            cliente.get("/Libreria/productos/")
+
+    @override_settings(
+        PRESUPUESTO_CONSULTAS={"producto-list": 0}, PRESUPUESTO_CONSULTAS_ESTRICTO=False
+    )
+    def test_sin_modo_estricto_solo_advierte(self):
+        cliente, _ = crear_catalogo()
+        with self.assertLogs("backend.instrumentacion", "WARNING") as registros:
+            self.assertEqual(cliente.get("/Libreria/productos/").status_code, 200)
+        self.assertIn("presupuesto: 0", registros.output[-1])
+
+
+@override_settings(METRICAS_TOKEN="secreto")
+class MetricasTests(TestCase):
+    def setUp(self):
+        self.cliente, _ = crear_catalogo()
+
+    def metricas(self, **extra):
+        return self.cliente.get(
+            "/metrics", HTTP_AUTHORIZATION="Bearer secreto", **extra
+        )
+
+    def test_exporta_solicitudes_y_latencias(self):
+        for _ in range(3):
+            self.cliente.get("/Libreria/categorias/")
+
+        respuesta = self.metricas()
+        self.assertEqual(respuesta.status_code, 200)
+        texto = respuesta.content.decode()
+        self.assertIn(
+            'http_solicitudes_total{ruta="categoria-list",metodo="GET",estado="200"}',
+            texto,
+        )
+        self.assertIn(
+            'http_duracion_segundos_bucket{ruta="categoria-list",metodo="GET",le="+Inf"}',
+            texto,
+        )
+
+    def test_requiere_token(self):
+        self.assertEqual(self.cliente.get("/metrics").status_code, 403)
+        respuesta = self.cliente.get("/metrics", HTTP_AUTHORIZATION="Bearer otro")
+        self.assertEqual(respuesta.status_code, 403)
+
+        # Sin token configurado no se expone
+        with self.settings(METRICAS_TOKEN=""):
+            self.assertEqual(self.cliente.get("/metrics").status_code, 403)
+            self.assertEqual(self.metricas().status_code, 403)
+
+    def test_suma_los_procesos_y_descarta_los_vencidos(self):
+        with tempfile.TemporaryDirectory() as directorio:
+            vivo = os.path.join(directorio, "99998-1.json")
+            muerto = os.path.join(directorio, "99999-1.json")
+            for ruta, cantidad in ((vivo, 4), (muerto, 7)):
+                with open(ruta, "w") as archivo:
+                    json.dump(
+                        {"http_errores_total": [[["x", "GET"], cantidad]]}, archivo
+                    )
+            hace_dos_horas = time.time() - 7200
+            os.utime(muerto, (hace_dos_horas, hace_dos_horas))
+
+            with self.settings(
+                METRICAS_DIRECTORIO=directorio, METRICAS_VENCIMIENTO=3600
+            ):
+                texto = self.metricas().content.decode()
+
+                self.assertIn('http_errores_total{ruta="x",metodo="GET"} 4', texto)
+                self.assertFalse(os.path.exists(muerto))
+                propio = os.path.join(directorio, registro._nombre_archivo())
+                self.assertTrue(os.path.exists(propio))
+                self.assertTrue(os.path.basename(propio).startswith(f"{os.getpid()}-"))
+
+                registro.borrar_archivo()
+                self.assertFalse(os.path.exists(propio))
+
+
+class PerfiladoTests(TestCase):
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        ajustes = self.settings(
+            PERFILADO_DIRECTORIO=directorio.name, PERFILADO_MAXIMO=2
+        )
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+        crear_catalogo()
+        self.admin = Usuario.objects.get(email="admin@example.com")
+        self.staff = APIClient()
+        acceso, _ = generar_token_acceso(self.admin)
+        self.staff.credentials(HTTP_AUTHORIZATION=f"Bearer {acceso}")
+        self.anonimo = APIClient()
+
+    def test_staff_perfila_con_el_parametro(self):
+        self.assertNotIn("X-Perfil-Id", self.staff.get("/Libreria/categorias/"))
+
+        respuesta = self.staff.get("/Libreria/categorias/?perfilar=1")
+        self.assertEqual(respuesta.status_code, 200)
+        identificador = respuesta["X-Perfil-Id"]
+
+        detalle = self.staff.get(f"/Libreria/perfiles/{identificador}/").json()
+        self.assertEqual(detalle["ruta"], "categoria-list")
+        self.assertEqual(detalle["motivo"], "parametro")
+        self.assertEqual(detalle["cantidad_consultas"], len(detalle["consultas"]))
+        self.assertIn("cumulative", detalle["resumen"])
+
+        archivo = self.staff.get(f"/Libreria/perfiles/{identificador}/?descargar=1")
+        self.assertEqual(archivo.status_code, 200)
+        self.assertTrue(archivo.has_header("Content-Disposition"))
+
+    def test_no_staff_no_perfila_ni_pide_firma(self):
+        self.admin.is_staff = False
+        self.admin.save()
+        cliente = APIClient()
+        acceso, _ = generar_token_acceso(self.admin)
+        cliente.credentials(HTTP_AUTHORIZATION=f"Bearer {acceso}")
+
+        self.assertNotIn("X-Perfil-Id", cliente.get("/Libreria/categorias/?perfilar=1"))
+        self.assertEqual(cliente.post("/Libreria/perfiles/firma/").status_code, 403)
+        self.assertEqual(cliente.get("/Libreria/perfiles/").status_code, 403)
+
+    def test_encabezado_firmado(self):
+        firma = self.staff.post("/Libreria/perfiles/firma/").data["valor"]
+
+        respuesta = self.anonimo.get("/Libreria/productos/", HTTP_X_PERFILAR=firma)
+        self.assertIn("X-Perfil-Id", respuesta)
+
+        alterada = self.anonimo.get("/Libreria/productos/", HTTP_X_PERFILAR=firma + "x")
+        self.assertNotIn("X-Perfil-Id", alterada)
+
+        with self.settings(PERFILADO_FIRMA_DURACION=-1):
+            vencida = self.anonimo.get(
+                "/Libreria/productos/", HTTP_X_PERFILAR=generar_firma()
+            )
+        self.assertNotIn("X-Perfil-Id", vencida)
+
+    def test_muestreo_y_limite_de_capturas(self):
+        with self.settings(PERFILADO_MUESTREO=1):
+            for url in (
+                "/Libreria/productos/",
+                "/Libreria/generos/",
+                "/Libreria/autores/",
+            ):
+                self.assertIn("X-Perfil-Id", self.staff.get(url))
+
+        capturas = self.staff.get("/Libreria/perfiles/").json()
+        self.assertEqual(len(capturas), 2)
+        self.assertEqual(
+            {captura["ruta"] for captura in capturas}, {"genero-list", "autor-list"}
+        )
+        duraciones = [captura["duracion_ms"] for captura in capturas]
+        self.assertEqual(duraciones, sorted(duraciones, reverse=True))
+        self.assertNotIn("consultas", capturas[0])
+
+    def test_captura_inexistente(self):
+        self.assertEqual(
+            self.staff.get("/Libreria/perfiles/no-existe/").status_code, 404
+        )
+
+
+@skipIf(orjson is None, "orjson no está instalado")
+class ORJSONTests(TestCase):
+    def assertMismaSalida(self, datos, **contexto):
+        esperado = JSONRenderer().render(datos, renderer_context=contexto)
+        self.assertEqual(
+            ORJSONRenderer().render(datos, renderer_context=contexto), esperado
+        )
+
+    def test_misma_salida_que_drf(self):
+        self.assertMismaSalida(
+            {
+                "texto": "Cien años de soledad",
+                "precio": Decimal("12.50"),
+                "fecha": datetime(
+                    2024, 5, 1, 12, 30, 15, 123456, tzinfo=dt_timezone.utc
+                ),
+                "sin_microsegundos": datetime(2024, 5, 1, 12, 30),
+                "dia": date(2024, 5, 1),
+                "id": uuid.UUID("12345678-1234-5678-1234-567812345678"),
+                "lista": [1, 2.5, None, True],
+                7: "clave entera",
+                "separadores": "linea\u2028parrafo\u2029",
+                "grande": 2**70,
+            }
+        )
+
+    def test_indentacion(self):
+        datos = {"a": [1, {"b": 2}]}
+        self.assertMismaSalida(datos, indent=2)
+        self.assertMismaSalida(datos, indent=4)
+        self.assertEqual(ORJSONRenderer().render(None), b"")
+
+    def test_respuesta_de_la_api(self):
+        cliente, productos = crear_catalogo()
+        respuesta = cliente.get(f"/Libreria/productos/{productos[1].id}/")
+
+        self.assertEqual(respuesta["Content-Type"], "application/json")
+        self.assertEqual(respuesta.json()["id"], productos[1].id)
+        # Separadores compactos, como el renderer de DRF
+        self.assertNotIn(b'": ', respuesta.content)
+
+    def test_parser(self):
+        parser = ORJSONParser()
+        cuerpo = '{"nombre": "Ficción", "precio": 1.5}'.encode()
+        self.assertEqual(
+            parser.parse(io.BytesIO(cuerpo)), {"nombre": "Ficción", "precio": 1.5}
+        )
+
+        for invalido in (b'{"a": NaN}', b'{"a": Infinity}', b"{malo"):
+            with self.subTest(cuerpo=invalido), self.assertRaises(ParseError):
+                parser.parse(io.BytesIO(invalido))
+
+        latin1 = '{"nombre": "Ficción"}'.encode("latin-1")
+        self.assertEqual(
+            parser.parse(io.BytesIO(latin1), parser_context={"encoding": "latin-1"}),
+            {"nombre": "Ficción"},
+        )
+
+    def test_cuerpo_invalido_en_la_api(self):
+        cliente, _ = crear_catalogo()
+        respuesta = cliente.post(
+            "/Libreria/categorias/", b"{malo", content_type="application/json"
+        )
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertIn("JSON parse error", respuesta.data["detail"])
+
+
+class CompresionTests(TestCase):
+    def setUp(self):
+        self.cliente, _ = crear_catalogo(cantidad=20)
+
+    def test_gzip_y_etag_con_sufijo(self):
+        plano = self.cliente.get("/Libreria/productos/")
+        respuesta = self.cliente.get(
+            "/Libreria/productos/", HTTP_ACCEPT_ENCODING="gzip, br;q=0.5"
+        )
+
+        self.assertEqual(respuesta["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", respuesta["Vary"])
+        self.assertEqual(gzip.decompress(respuesta.content), plano.content)
+        self.assertEqual(respuesta["ETag"], plano["ETag"][:-1] + '-gzip"')
+
+        # El ETag con sufijo también valida la versión sin comprimir
+        revalidada = self.cliente.get(
+            "/Libreria/productos/", HTTP_IF_NONE_MATCH=respuesta["ETag"]
+        )
+        self.assertEqual(revalidada.status_code, 304)
+
+    def test_sin_compresion(self):
+        # El cliente no la acepta
+        respuesta = self.cliente.get(
+            "/Libreria/productos/", HTTP_ACCEPT_ENCODING="gzip;q=0, identity"
+        )
+        self.assertFalse(respuesta.has_header("Content-Encoding"))
+
+        # Respuesta chica
+        respuesta = self.cliente.get("/Libreria/generos/", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertFalse(respuesta.has_header("Content-Encoding"))
+
+        # Los POST (login y otros con tokens en el cuerpo) no se comprimen
+        respuesta = APIClient().post(
+            "/Libreria/login/",
+            {"username": "admin@example.com", "password": "clave-segura"},
+            format="json",
+            HTTP_ACCEPT_ENCODING="gzip",
+        )
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertFalse(respuesta.has_header("Content-Encoding"))
+
+    def test_negociacion(self):
+        self.assertEqual(elegir_codificacion("gzip"), "gzip")
+        self.assertEqual(elegir_codificacion("*"), "gzip")
+        self.assertIsNone(elegir_codificacion(""))
+        self.assertIsNone(elegir_codificacion("gzip;q=0"))
+        self.assertIsNone(elegir_codificacion("deflate, identity"))
+        self.assertEqual(elegir_codificacion("br, gzip", streaming=True), "gzip")
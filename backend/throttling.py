@@ -0,0 +1,175 @@
+# backend/throttling.py
+"""
+Throttling con token bucket para DRF.
+
+Cada alcance de throttle (THROTTLE_BUCKETS en settings) define uno o más
+buckets según a quién se cobra la petición:
+
+- "ip": un bucket por dirección IP del cliente (REMOTE_ADDR, o la que indica
+  X-Forwarded-For según NUM_PROXIES en REST_FRAMEWORK)
+- "usuario": un bucket por usuario autenticado (o por IP si es anónimo)
+- "endpoint": un único bucket compartido por todos los clientes
+
+Cada bucket tiene una capacidad (ráfaga máxima) y se recarga a ritmo
+constante. Las acciones pesadas pueden costar más de un token mediante
+costo_por_accion en la vista. Una petición se cobra solo si todos sus buckets
+tienen tokens; si alguno la rechaza no se descuenta de ninguno.
+
+Los buckets viven en memoria del proceso (THROTTLE_ALMACEN = "local") o en la
+cache de Django ("cache") para compartir los límites entre procesos; esto
+último requiere un backend de CACHES compartido (Redis, Memcached), no el
+LocMemCache por defecto.
+"""
+
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.throttling import BaseThrottle
+
+
+def _recargar(estado, capacidad, recarga, ahora):
+    tokens, ultimo = estado or (capacidad, ahora)
+    return min(capacidad, tokens + (ahora - ultimo) * recarga)
+
+
+def _evaluar(disponibles, buckets, costo):
+    """Segundos hasta que todos los buckets tengan el costo; 0 si ya lo tienen"""
+    espera = 0
+    for tokens, (_, capacidad, recarga) in zip(disponibles, buckets):
+        faltan = min(costo, capacidad) - tokens
+        if faltan > 0:
+            espera = max(espera, faltan / recarga)
+    return espera
+
+
+class AlmacenLocal:
+    """Buckets en memoria del proceso"""
+
+    # A partir de este tamaño se descartan los buckets que ya están llenos
+    MAXIMO_BUCKETS = 100_000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}
+
+    def consumir(self, buckets, costo):
+        """
+        buckets: [(clave, capacidad, recarga por segundo)]. Descuenta el costo
+        de todos o de ninguno; devuelve los segundos de espera (0 = permitido).
+        """
+        ahora = time.monotonic()
+        with self._lock:
+            disponibles = [
+                _recargar(self._buckets.get(clave), capacidad, recarga, ahora)
+                for clave, capacidad, recarga in buckets
+            ]
+            espera = _evaluar(disponibles, buckets, costo)
+            if espera:
+                return espera
+
+            for tokens, (clave, capacidad, _) in zip(disponibles, buckets):
+                self._buckets[clave] = (tokens - min(costo, capacidad), ahora)
+            if len(self._buckets) > self.MAXIMO_BUCKETS:
+                self._purgar(ahora, buckets)
+        return 0
+
+    def _purgar(self, ahora, buckets):
+        # Con la capacidad y recarga de los buckets recién usados como referencia
+        capacidad = max(capacidad for _, capacidad, _ in buckets)
+        recarga = min(recarga for _, _, recarga in buckets)
+        llenos = [
+            clave
+            for clave, (tokens, ultimo) in self._buckets.items()
+            if tokens + (ahora - ultimo) * recarga >= capacidad
+        ]
+        for clave in llenos:
+            del self._buckets[clave]
+
+
+class AlmacenCache:
+    """
+    Buckets en la cache compartida de Django. La lectura y escritura no son
+    atómicas, así que con mucha concurrencia el límite es aproximado.
+    """
+
+    def consumir(self, buckets, costo):
+        ahora = time.time()
+        estados = cache.get_many([clave for clave, _, _ in buckets])
+        disponibles = [
+            _recargar(estados.get(clave), capacidad, recarga, ahora)
+            for clave, capacidad, recarga in buckets
+        ]
+        espera = _evaluar(disponibles, buckets, costo)
+        if espera:
+            return espera
+
+        for tokens, (clave, capacidad, recarga) in zip(disponibles, buckets):
+            tokens -= min(costo, capacidad)
+            # Un bucket sin uso expira cuando ya se habría llenado de nuevo
+            cache.set(clave, (tokens, ahora), int((capacidad - tokens) / recarga) + 1)
+        return 0
+
+
+_almacenes = {"local": AlmacenLocal(), "cache": AlmacenCache()}
+
+
+def obtener_almacen():
+    nombre = getattr(settings, "THROTTLE_ALMACEN", "local")
+    try:
+        return _almacenes[nombre]
+    except KeyError:
+        raise ImproperlyConfigured(
+            f"THROTTLE_ALMACEN={nombre!r} no es válido; use "
+            f"{' o '.join(repr(n) for n in _almacenes)}."
+        ) from None
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Throttle configurado por alcance. La vista indica su alcance con
+    throttle_scope o, por acción, con throttle_scope_por_accion; si la acción
+    no tiene alcance no se limita. El costo de la acción sale de
+    costo_por_accion (1 por defecto).
+    """
+
+    def get_scope(self, view):
+        accion = getattr(view, "action", None)
+        por_accion = getattr(view, "throttle_scope_por_accion", {})
+        return por_accion.get(accion, getattr(view, "throttle_scope", None))
+
+    def get_cost(self, view):
+        accion = getattr(view, "action", None)
+        return getattr(view, "costo_por_accion", {}).get(accion, 1)
+
+    def get_identificador(self, request, alcance, scope):
+        if alcance == "endpoint":
+            return scope
+        if alcance == "usuario" and request.user and request.user.is_authenticated:
+            return f"u{request.user.pk}"
+        return self.get_ident(request)
+
+    def allow_request(self, request, view):
+        self.espera = None
+        scope = self.get_scope(view)
+        buckets = getattr(settings, "THROTTLE_BUCKETS", {}).get(scope)
+        if not buckets:
+            return True
+
+        costo = self.get_cost(view)
+        pedidos = []
+        for alcance, (capacidad, por_minuto) in buckets.items():
+            identificador = self.get_identificador(request, alcance, scope)
+            clave = f"throttle:{scope}:{alcance}:{identificador}"
+            pedidos.append((clave, capacidad, por_minuto / 60))
+
+        espera = obtener_almacen().consumir(pedidos, costo)
+        if espera:
+            self.espera = espera
+            return False
+        return True
+
+    def wait(self):
+        return self.espera
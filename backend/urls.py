@@ -1,14 +1,27 @@
 from django.contrib import admin
 from django.urls import path, include, re_path
 from rest_framework.routers import DefaultRouter
-from usuarios.views import UsuarioViewSet, LoginView, RolViewSet, PermisoViewSet
+from usuarios.views import (
+    UsuarioViewSet,
+    LoginView,
+    LogoutView,
+    RefrescarTokenView,
+    RolViewSet,
+    PermisoViewSet,
+)
 
 # Swagger
-from rest_framework.authentication import TokenAuthentication
+from usuarios.authentication import (
+    AccesoFirmadoAuthentication,
+    TokenCacheadoAuthentication,
+)
 from rest_framework import permissions
 from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
 
+from backend.metricas import vista_metricas
+from backend.perfilado import PerfilDetalleView, PerfilesView, PerfilFirmaView
+
 # Configuración de rutas automáticas
 router = DefaultRouter()
 router.register(r"usuarios", UsuarioViewSet, basename="usuario")
@@ -61,18 +74,37 @@ schema_view = get_schema_view(
     ),
     public=True,
     permission_classes=(permissions.AllowAny,),
-    authentication_classes=[TokenAuthentication],
+    authentication_classes=[
+        AccesoFirmadoAuthentication,
+        TokenCacheadoAuthentication,
+    ],
 )
 
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("Libreria/", include(router.urls)),
     path("Libreria/login/", LoginView.as_view(), name="login"),
+    path("Libreria/logout/", LogoutView.as_view(), name="logout"),
+    path(
+        "Libreria/token/refrescar/",
+        RefrescarTokenView.as_view(),
+        name="token-refrescar",
+    ),
     path(
         "Libreria/ml-csv/",
         PedidoViewSet.as_view({"get": "descargar_ml_csv"}),
         name="ml-csv-download",
     ),
+    # Capturas de perfilado (solo staff)
+    path("Libreria/perfiles/", PerfilesView.as_view(), name="perfiles"),
+    path(
+        "Libreria/perfiles/firma/", PerfilFirmaView.as_view(), name="perfil-firma"
+    ),
+    path(
+        "Libreria/perfiles/<str:identificador>/",
+        PerfilDetalleView.as_view(),
+        name="perfil-detalle",
+    ),
     # Ruta adicional para aplicar oferta con ID en URL
     # Permite usar /productos/{id}/aplicar-oferta/{oferta_id}/
     re_path(
@@ -87,4 +119,6 @@ urlpatterns = [
         name="schema-swagger-ui",
     ),
     path("redoc/", schema_view.with_ui("redoc", cache_timeout=0), name="schema-redoc"),
+    # Métricas en formato Prometheus
+    path("metrics", vista_metricas, name="metricas"),
 ]
@@ -0,0 +1,91 @@
+# backend/validators.py
+from django.db import IntegrityError, transaction
+from django.db.models import UniqueConstraint
+from django.db.models.functions import Lower
+from rest_framework import serializers
+
+
+class NombreUnicoValidator:
+    """
+    Valida que no exista otro registro con el mismo valor sin distinguir
+    mayúsculas. Compara LOWER(campo) = valor, que resuelve el índice único
+    funcional UniqueConstraint(Lower(campo)) del modelo en lugar de recorrer
+    la tabla como nombre__iexact.
+    """
+
+    requires_context = True
+
+    def __init__(self, mensaje, campo="nombre"):
+        self.mensaje = mensaje
+        self.campo = campo
+
+    def __call__(self, valor, serializer_field):
+        serializer = serializer_field.parent
+        modelo = serializer.Meta.model
+        instancia = serializer.instance
+
+        existentes = modelo._default_manager.alias(
+            _valor_lower=Lower(self.campo)
+        ).filter(_valor_lower=valor.lower())
+        if instancia is not None:
+            existentes = existentes.exclude(pk=instancia.pk)
+
+        if existentes.exists():
+            raise serializers.ValidationError(self.mensaje, code="unique")
+
+
+class NombreUnicoSerializerMixin:
+    """
+    Convierte en error de validación la violación de cualquier restricción
+    única del campo (la de Lower() o el unique=True de la columna) cuando dos
+    escrituras concurrentes pasan la validación a la vez.
+    """
+
+    campo_unico = "nombre"
+
+    def _mensaje_unico(self):
+        for validador in self.fields[self.campo_unico].validators:
+            if isinstance(validador, NombreUnicoValidator):
+                return validador.mensaje
+        return "Ya existe un registro con ese nombre."
+
+    def _restricciones_del_campo(self):
+        """Nombres de las UniqueConstraint sobre el campo o su Lower()"""
+        return [
+            restriccion.name
+            for restriccion in self.Meta.model._meta.constraints
+            if isinstance(restriccion, UniqueConstraint)
+            and (
+                restriccion.expressions == (Lower(self.campo_unico),)
+                or tuple(restriccion.fields) == (self.campo_unico,)
+            )
+        ]
+
+    def _viola_unicidad_del_campo(self, error):
+        mensaje = str(error)
+        if "unique" not in mensaje.lower() and "duplicate" not in mensaje.lower():
+            return False
+        if any(nombre in mensaje for nombre in self._restricciones_del_campo()):
+            return True
+        # El unique=True de la columna: SQLite y MySQL nombran tabla.columna;
+        # PostgreSQL, la columna en el detalle "Key (columna)=(valor)"
+        opciones = self.Meta.model._meta
+        columna = opciones.get_field(self.campo_unico).column
+        return f"{opciones.db_table}.{columna}" in mensaje or f"({columna})=" in mensaje
+
+    def _guardar(self, guardar, *args):
+        try:
+            with transaction.atomic():
+                return guardar(*args)
+        except IntegrityError as error:
+            if not self._viola_unicidad_del_campo(error):
+                raise
+            raise serializers.ValidationError(
+                {self.campo_unico: [self._mensaje_unico()]}, code="unique"
+            )
+
+    def create(self, validated_data):
+        return self._guardar(super().create, validated_data)
+
+    def update(self, instance, validated_data):
+        return self._guardar(super().update, instance, validated_data)
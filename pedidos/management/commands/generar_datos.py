@@ -0,0 +1,319 @@
+import itertools
+import random
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from pedidos.models import Carrito, DetalleCarrito, DetallePedido, Pedido
+from productos.busqueda import actualizar_vectores
+from productos.catalogo import invalidar_catalogo
+from productos.models import Autor, Categoria, Editorial, Genero, Oferta, Producto
+from usuarios.models import Rol, Usuario
+
+# Cantidades para --escala 1; cada una se multiplica por la escala
+CANTIDADES_BASE = {
+    "categorias": 20,
+    "generos": 30,
+    "autores": 300,
+    "editoriales": 50,
+    "ofertas": 40,
+    "productos": 1000,
+    "usuarios": 500,
+    "pedidos": 5000,
+    "carritos": 200,
+}
+
+TAMANO_LOTE = 1000
+# Palabras para las descripciones, así la búsqueda de texto tiene algo que
+# distinguir entre productos
+VOCABULARIO = (
+    "aventura amor guerra historia ciencia misterio viaje familia ciudad mar "
+    "montaña noche secreto memoria futuro pasado poder imperio revolución "
+    "infancia muerte destino sombra fuego tierra río bosque desierto isla "
+    "invierno verano ciudadano detective dragón espacio robot música arte "
+    "cocina jardín política economía filosofía matemática medicina viajero"
+).split()
+CENTAVO = Decimal("0.01")
+
+
+def muestreador_zipf(elementos, exponente, rnd):
+    """
+    Devuelve una función que elige k elementos con probabilidad proporcional
+    a 1 / rango^exponente (el orden de `elementos` define el rango).
+    """
+    acumulados = list(
+        itertools.accumulate(
+            1 / rango**exponente for rango in range(1, len(elementos) + 1)
+        )
+    )
+
+    def elegir(k=1):
+        return rnd.choices(elementos, cum_weights=acumulados, k=k)
+
+    return elegir
+
+
+def descuento_por_monto(total):
+    """Mismos tramos que Pedido.calcular_total"""
+    if total > 600:
+        return Decimal("25.00")
+    if total > 400:
+        return Decimal("15.00")
+    if total > 200:
+        return Decimal("10.00")
+    return Decimal("0.00")
+
+
+class Command(BaseCommand):
+    help = (
+        "Genera un conjunto de datos sintético y reproducible (catálogo, ofertas, "
+        "usuarios, pedidos a lo largo de varios años y carritos activos) para "
+        "medir el rendimiento de la API"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--escala",
+            type=float,
+            default=1,
+            help="Multiplicador de las cantidades base (1 = 1000 productos, 5000 pedidos)",
+        )
+        parser.add_argument("--semilla", type=int, default=42)
+        parser.add_argument(
+            "--anios", type=int, default=3, help="Años de historial de pedidos"
+        )
+        parser.add_argument(
+            "--zipf",
+            type=float,
+            default=1.1,
+            help="Exponente de la distribución de popularidad de productos y clientes",
+        )
+
+    def handle(self, *args, **options):
+        self.rnd = random.Random(options["semilla"])
+        self.prefijo = f"S{options['semilla']}"
+        self.cantidades = {
+            clave: max(1, int(valor * options["escala"]))
+            for clave, valor in CANTIDADES_BASE.items()
+        }
+        self.ahora = timezone.now()
+        self.desde = self.ahora - timedelta(days=365 * options["anios"])
+
+        if Producto.objects.filter(
+            nombre__startswith=f"Libro {self.prefijo}-"
+        ).exists():
+            raise CommandError(
+                f"Ya existen datos generados con la semilla {options['semilla']}; "
+                "use otra semilla."
+            )
+
+        with transaction.atomic():
+            catalogo = self.crear_catalogo()
+            ofertas = self.crear_ofertas()
+            productos = self.crear_productos(catalogo, ofertas)
+            usuarios = self.crear_usuarios()
+
+            # Popularidad: el orden aleatorio decide qué productos y clientes
+            # concentran las compras
+            self.rnd.shuffle(productos)
+            self.rnd.shuffle(usuarios)
+            elegir_productos = muestreador_zipf(productos, options["zipf"], self.rnd)
+            elegir_usuario = muestreador_zipf(usuarios, options["zipf"], self.rnd)
+
+            pedidos, detalles = self.crear_pedidos(elegir_productos, elegir_usuario)
+            carritos, detalles_carrito = self.crear_carritos(elegir_productos, usuarios)
+            # bulk_create no dispara señales
+            invalidar_catalogo()
+            actualizar_vectores(
+                Producto.objects.filter(nombre__startswith=f"Libro {self.prefijo}-")
+            )
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Generados {len(productos)} productos, {len(ofertas)} ofertas, "
+                f"{len(usuarios)} usuarios, {pedidos} pedidos ({detalles} detalles) "
+                f"y {carritos} carritos activos ({detalles_carrito} detalles)"
+            )
+        )
+
+    def crear_catalogo(self):
+        catalogo = {}
+        for clave, modelo, nombre in (
+            ("categorias", Categoria, "Categoría"),
+            ("generos", Genero, "Género"),
+            ("autores", Autor, "Autor"),
+            ("editoriales", Editorial, "Editorial"),
+        ):
+            catalogo[clave] = modelo.objects.bulk_create(
+                [
+                    modelo(nombre=f"{nombre} {self.prefijo}-{i}")
+                    for i in range(self.cantidades[clave])
+                ],
+                batch_size=TAMANO_LOTE,
+            )
+        return catalogo
+
+    def crear_ofertas(self):
+        dias_totales = (self.ahora - self.desde).days
+        ofertas = []
+        for i in range(self.cantidades["ofertas"]):
+            # Una de cada cuatro ofertas está vigente hoy
+            if i % 4 == 0:
+                inicio = self.ahora - timedelta(days=self.rnd.randint(1, 20))
+            else:
+                inicio = self.desde + timedelta(days=self.rnd.randint(0, dias_totales))
+            ofertas.append(
+                Oferta(
+                    nombre=f"Oferta {self.prefijo}-{i}",
+                    descripcion="Oferta generada para pruebas de rendimiento",
+                    descuento=Decimal(self.rnd.randint(1, 15)),
+                    fecha_inicio=inicio,
+                    fecha_fin=inicio + timedelta(days=self.rnd.randint(7, 45)),
+                )
+            )
+        return Oferta.objects.bulk_create(ofertas, batch_size=TAMANO_LOTE)
+
+    def crear_productos(self, catalogo, ofertas):
+        productos = []
+        for i in range(self.cantidades["productos"]):
+            productos.append(
+                Producto(
+                    nombre=f"Libro {self.prefijo}-{i}",
+                    descripcion=f"Descripción del libro {i}: "
+                    + " ".join(self.rnd.sample(VOCABULARIO, 6)),
+                    stock=self.rnd.randint(1000, 100000),
+                    imagen=f"https://ejemplo.com/libros/{self.prefijo}-{i}.jpg",
+                    precio=Decimal(self.rnd.randint(500, 15000)) * CENTAVO,
+                    categoria=self.rnd.choice(catalogo["categorias"]),
+                    genero=self.rnd.choice(catalogo["generos"]),
+                    autor=self.rnd.choice(catalogo["autores"]),
+                    editorial=self.rnd.choice(catalogo["editoriales"]),
+                    oferta=(
+                        self.rnd.choice(ofertas) if self.rnd.random() < 0.2 else None
+                    ),
+                )
+            )
+        return Producto.objects.bulk_create(productos, batch_size=TAMANO_LOTE)
+
+    def crear_usuarios(self):
+        rol_cliente, _ = Rol.objects.get_or_create(nombre="cliente")
+        otros_roles = list(Rol.objects.exclude(pk=rol_cliente.pk))
+        # Un solo hash para todos: el costo del hash no es lo que se mide
+        password = make_password("benchmark")
+
+        usuarios = []
+        for i in range(self.cantidades["usuarios"]):
+            rol = rol_cliente
+            if otros_roles and self.rnd.random() < 0.05:
+                rol = self.rnd.choice(otros_roles)
+            usuarios.append(
+                Usuario(
+                    email=f"usuario{i}.{self.prefijo.lower()}@ejemplo.com",
+                    nombre_completo=f"Usuario {self.prefijo}-{i}",
+                    telefono=f"7{self.rnd.randint(0, 9999999):07d}",
+                    password=password,
+                    rol=rol,
+                )
+            )
+        return Usuario.objects.bulk_create(usuarios, batch_size=TAMANO_LOTE)
+
+    def _lineas(self, elegir_productos):
+        """Productos distintos de un pedido o carrito, con su cantidad"""
+        cantidad_productos = min(1 + int(self.rnd.expovariate(0.5)), 10)
+        productos = dict.fromkeys(elegir_productos(cantidad_productos))
+        return [(producto, self.rnd.randint(1, 3)) for producto in productos]
+
+    def _precio(self, producto, fecha):
+        """Precio unitario y descuento de oferta en la fecha indicada"""
+        oferta = producto.oferta
+        if oferta and oferta.fecha_inicio <= fecha <= oferta.fecha_fin:
+            descuento = min(oferta.descuento, producto.precio)
+            return producto.precio - descuento, descuento, oferta
+        return producto.precio, Decimal("0.00"), None
+
+    def crear_pedidos(self, elegir_productos, elegir_usuario):
+        segundos_totales = int((self.ahora - self.desde).total_seconds())
+        pedidos, lineas_por_pedido = [], []
+        for _ in range(self.cantidades["pedidos"]):
+            fecha = self.desde + timedelta(
+                seconds=self.rnd.randint(0, segundos_totales)
+            )
+            lineas = []
+            total_sin_descuento = Decimal("0.00")
+            for producto, cantidad in self._lineas(elegir_productos):
+                precio, descuento, oferta = self._precio(producto, fecha)
+                lineas.append((producto, cantidad, precio, descuento, oferta))
+                total_sin_descuento += precio * cantidad
+
+            descuento = descuento_por_monto(total_sin_descuento)
+            total = total_sin_descuento - total_sin_descuento * descuento / 100
+            pedidos.append(
+                Pedido(
+                    usuario=elegir_usuario()[0],
+                    calificacion=(
+                        self.rnd.randint(1, 5) if self.rnd.random() < 0.6 else None
+                    ),
+                    fecha_pedido=fecha,
+                    descuento=descuento,
+                    total=total.quantize(CENTAVO),
+                )
+            )
+            lineas_por_pedido.append(lineas)
+
+        fechas = [pedido.fecha_pedido for pedido in pedidos]
+        pedidos = Pedido.objects.bulk_create(pedidos, batch_size=TAMANO_LOTE)
+        # auto_now_add pisa la fecha al insertar: se restaura la histórica
+        for pedido, fecha in zip(pedidos, fechas):
+            pedido.fecha_pedido = fecha
+        Pedido.objects.bulk_update(pedidos, ["fecha_pedido"], batch_size=TAMANO_LOTE)
+
+        detalles = [
+            DetallePedido(
+                pedido=pedido,
+                producto=producto,
+                cantidad=cantidad,
+                precio_unitario=precio,
+                precio_original=producto.precio,
+                descuento_oferta=descuento,
+                nombre_oferta=oferta.nombre if oferta else None,
+                fecha_oferta_aplicada=pedido.fecha_pedido if oferta else None,
+                subtotal=precio * cantidad,
+            )
+            for pedido, lineas in zip(pedidos, lineas_por_pedido)
+            for producto, cantidad, precio, descuento, oferta in lineas
+        ]
+        DetallePedido.objects.bulk_create(detalles, batch_size=TAMANO_LOTE)
+        return len(pedidos), len(detalles)
+
+    def crear_carritos(self, elegir_productos, usuarios):
+        con_carrito = self.rnd.sample(
+            usuarios, min(self.cantidades["carritos"], len(usuarios))
+        )
+        carritos = Carrito.objects.bulk_create(
+            [Carrito(usuario=usuario) for usuario in con_carrito],
+            batch_size=TAMANO_LOTE,
+        )
+
+        detalles = []
+        for carrito in carritos:
+            for producto, cantidad in self._lineas(elegir_productos):
+                precio, descuento, oferta = self._precio(producto, self.ahora)
+                detalles.append(
+                    DetalleCarrito(
+                        carrito=carrito,
+                        producto=producto,
+                        cantidad=cantidad,
+                        precio_unitario=precio,
+                        precio_original=producto.precio,
+                        descuento_oferta=descuento,
+                        nombre_oferta=oferta.nombre if oferta else None,
+                        fecha_oferta_aplicada=self.ahora if oferta else None,
+                        subtotal=precio * cantidad,
+                    )
+                )
+        DetalleCarrito.objects.bulk_create(detalles, batch_size=TAMANO_LOTE)
+        return len(carritos), len(detalles)
@@ -16,6 +16,7 @@ from .serializers import (
     DetalleCarritoSerializer,
 )
 from drf_yasg.utils import swagger_auto_schema
+from backend.throttling import TokenBucketThrottle
 from .schemas import (
     carrito_response,
     carrito_request,
@@ -44,6 +45,17 @@ class PedidoViewSet(viewsets.ModelViewSet):
     queryset = Pedido.objects.all()
     serializer_class = PedidoSerializer
 
+    # Las exportaciones para ML recorren todos los pedidos y son públicas
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope_por_accion = {
+        "combinaciones_ml": "exportacion_ml",
+        "descargar_ml_csv": "exportacion_ml",
+    }
+    costo_por_accion = {
+        "combinaciones_ml": 10,
+        "descargar_ml_csv": 10,
+    }
+
     def perform_create(self, serializer):
         pedido = serializer.save()
         pedido.calcular_total()
@@ -0,0 +1,269 @@
+"""
+Sugerencias para el buscador de la tienda (typeahead).
+
+Cada sección (productos, autores, editoriales) mantiene en memoria un arreglo
+ordenado con el nombre normalizado (minúsculas, sin tildes) a partir de cada
+una de sus palabras, así "marq" encuentra "Gabriel García Márquez". Un
+prefijo se resuelve con dos búsquedas binarias y se devuelven los nombres
+más populares del rango (unidades vendidas en pedidos activos; para autores
+y editoriales, las de sus productos).
+
+Los prefijos de hasta LARGO_PRECALCULADO letras abarcan rangos enormes, así
+que su top se calcula al armar el índice; el resto se memoriza la primera vez
+que se pide.
+
+Cuando el bus de invalidación avisa un cambio en una sección, se compara la
+lista de nombres actual con la del índice: los nombres nuevos o renombrados
+van a un índice chico que se consulta junto al principal y los quitados se
+filtran. El índice principal se rearma cada AUTOCOMPLETAR_REFRESCO segundos,
+para seguir la popularidad, o cuando los cambios acumulados son muchos.
+Tanto la comparación como el rearmado corren en un hilo aparte y mientras
+tanto se responde con el estado anterior; solo se espera el primer armado de
+cada sección, cuando todavía no hay nada que responder.
+"""
+
+import heapq
+import logging
+import re
+import threading
+import time
+import unicodedata
+from bisect import bisect_left
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Sum
+
+from backend import invalidacion
+
+from .models import Autor, Editorial, Producto
+
+logger = logging.getLogger(__name__)
+
+MAXIMO_SUGERENCIAS = 20
+LARGO_PRECALCULADO = 3
+MAXIMO_MEMORIZADOS = 10000
+# Con más cambios que esto (o que el 5% de la base) se rearma la base
+MAXIMO_CAMBIOS = 1000
+
+_re_palabra = re.compile(r"\w+")
+# Marcas diacríticas que NFKD separa de la letra (tildes, diéresis, la de la ñ)
+_re_diacriticos = re.compile("[\u0300-\u036f]")
+
+
+def normalizar(texto):
+    normalizado = unicodedata.normalize("NFKD", texto or "").lower()
+    return " ".join(_re_palabra.findall(_re_diacriticos.sub("", normalizado)))
+
+
+def _orden(fila):
+    return -fila[2], fila[1]
+
+
+class IndicePrefijos:
+    def __init__(self, filas):
+        # filas: (id, nombre, popularidad). Ordenadas de más a menos popular,
+        # la posición de cada fila es su ranking
+        self.filas = sorted(filas, key=_orden)
+        entradas = []
+        for posicion, (_, nombre, _) in enumerate(self.filas):
+            palabras = normalizar(nombre).split()
+            for i in range(len(palabras)):
+                entradas.append((" ".join(palabras[i:]), posicion))
+        # Todavía en orden de popularidad
+        self._memorizados = self._precalcular(entradas)
+        entradas.sort()
+        self.claves = [clave for clave, _ in entradas]
+        self.posiciones = [posicion for _, posicion in entradas]
+
+    def _precalcular(self, entradas):
+        """Top de cada prefijo corto, en una pasada de más a menos popular"""
+        tops = {}
+        for clave, posicion in entradas:
+            for largo in range(1, min(LARGO_PRECALCULADO, len(clave)) + 1):
+                top = tops.get(clave[:largo])
+                if top is None:
+                    tops[clave[:largo]] = [posicion]
+                # Las entradas de un mismo nombre vienen seguidas
+                elif len(top) < MAXIMO_SUGERENCIAS and top[-1] != posicion:
+                    top.append(posicion)
+        return tops
+
+    def _posiciones_de(self, prefijo):
+        desde = bisect_left(self.claves, prefijo)
+        hasta = bisect_left(self.claves, prefijo + "\uffff", desde)
+        return set(self.posiciones[desde:hasta])
+
+    def sugerir(self, prefijo, limite, excluir=frozenset()):
+        """Las `limite` filas más populares con el prefijo, salvo los ids excluidos"""
+        top = self._memorizados.get(prefijo)
+        if top is None:
+            top = heapq.nsmallest(MAXIMO_SUGERENCIAS, self._posiciones_de(prefijo))
+            if len(self._memorizados) >= MAXIMO_MEMORIZADOS:
+                self._podar()
+            self._memorizados[prefijo] = top
+
+        filas = [self.filas[p] for p in top if self.filas[p][0] not in excluir]
+        if len(filas) < limite and len(top) == MAXIMO_SUGERENCIAS and excluir:
+            # Lo excluido dejó lugar a filas que no entraron en el top guardado
+            candidatas = (
+                p
+                for p in self._posiciones_de(prefijo)
+                if self.filas[p][0] not in excluir
+            )
+            filas = [self.filas[p] for p in heapq.nsmallest(limite, candidatas)]
+        return filas[:limite]
+
+    def _podar(self):
+        """Olvida los prefijos memorizados salvo los precalculados"""
+        self._memorizados = {
+            prefijo: top
+            for prefijo, top in self._memorizados.items()
+            if len(prefijo) <= LARGO_PRECALCULADO
+        }
+
+
+def _vendidos_por(campo):
+    from pedidos.models import DetallePedido
+
+    return dict(
+        DetallePedido.objects.filter(pedido__activo=True)
+        .values_list(campo)
+        .annotate(vendidos=Sum("cantidad"))
+        .order_by()
+    )
+
+
+def _cargar(modelo, campo_venta):
+    vendidos = _vendidos_por(campo_venta)
+    return [
+        (pk, nombre, vendidos.get(pk) or 0)
+        for pk, nombre in modelo.objects.filter(is_active=True).values_list(
+            "pk", "nombre"
+        )
+    ]
+
+
+class Seccion:
+    """
+    Índice de una tabla: una base armada con la popularidad y, encima, los
+    cambios de nombres posteriores (un índice chico con los nuevos o
+    renombrados y los ids a quitar de la base)
+    """
+
+    def __init__(self, entidad, modelo, campo_venta):
+        self.modelo = modelo
+        self.campo_venta = campo_venta
+        self.sucia = True
+        self._estado = None  # (base, cambios o None, ids quitados de la base)
+        self._armada = 0.0
+        # Lo tiene quien esté rearmando la sección
+        self._lock = threading.Lock()
+        invalidacion.suscribir(self.ensuciar, [entidad])
+
+    def ensuciar(self, entidades=None):
+        self.sucia = True
+
+    def vencida(self):
+        return time.monotonic() - self._armada >= getattr(
+            settings, "AUTOCOMPLETAR_REFRESCO", 300
+        )
+
+    def _rearmar(self):
+        """Arma la base de nuevo, con la popularidad actual"""
+        base = IndicePrefijos(_cargar(self.modelo, self.campo_venta))
+        self._estado = (base, None, frozenset())
+        self._armada = time.monotonic()
+
+    def _aplicar_cambios(self):
+        """Compara los nombres actuales con los de la base, sin tocar la base"""
+        base = self._estado[0]
+        actuales = dict(
+            self.modelo.objects.filter(is_active=True).values_list("pk", "nombre")
+        )
+        quitados = set()
+        cambios = []
+        for pk, nombre, popularidad in base.filas:
+            nombre_actual = actuales.pop(pk, None)
+            if nombre_actual != nombre:
+                quitados.add(pk)
+                if nombre_actual is not None:
+                    cambios.append((pk, nombre_actual, popularidad))
+        # Lo que quedó en actuales no estaba en la base
+        cambios.extend((pk, nombre, 0) for pk, nombre in actuales.items())
+
+        if len(quitados) + len(cambios) > max(MAXIMO_CAMBIOS, len(base.filas) // 20):
+            self._rearmar()
+        else:
+            self._estado = (
+                base,
+                IndicePrefijos(cambios) if cambios else None,
+                frozenset(quitados),
+            )
+
+    def _renovar(self):
+        # Un cambio durante la renovación la vuelve a ensuciar
+        self.sucia = False
+        try:
+            if self._estado is None or self.vencida():
+                self._rearmar()
+            else:
+                self._aplicar_cambios()
+        except Exception:
+            self.sucia = True
+            raise
+
+    def _renovar_en_segundo_plano(self):
+        try:
+            self._renovar()
+        except Exception:
+            logger.exception("No se pudo renovar el autocompletado")
+        finally:
+            connection.close()
+            self._lock.release()
+
+    def estado(self):
+        if not (self.sucia or self.vencida()):
+            return self._estado
+        if self._estado is None:
+            with self._lock:
+                # Otro hilo pudo haberla armado mientras se esperaba
+                if self._estado is None:
+                    self._renovar()
+        elif self._lock.acquire(blocking=False):
+            threading.Thread(
+                target=self._renovar_en_segundo_plano,
+                name="autocompletar",
+                daemon=True,
+            ).start()
+        return self._estado
+
+    def sugerir(self, prefijo, limite):
+        base, cambios, quitados = self.estado()
+        filas = base.sugerir(prefijo, limite, excluir=quitados)
+        if cambios is not None:
+            filas = heapq.nsmallest(
+                limite, filas + cambios.sugerir(prefijo, limite), key=_orden
+            )
+        return filas
+
+
+SECCIONES = {
+    "productos": Seccion("producto", Producto, "producto"),
+    "autores": Seccion("autor", Autor, "producto__autor"),
+    "editoriales": Seccion("editorial", Editorial, "producto__editorial"),
+}
+
+
+def sugerencias(texto, limite=10, secciones=SECCIONES):
+    """{sección: [{"id", "nombre"}, ...]} de los nombres que empiezan con texto"""
+    prefijo = normalizar(texto)
+    if not prefijo:
+        return {nombre: [] for nombre in secciones}
+    invalidacion.sincronizar()
+    limite = max(1, min(limite, MAXIMO_SUGERENCIAS))
+    resultado = {}
+    for nombre in secciones:
+        filas = SECCIONES[nombre].sugerir(prefijo, limite)
+        resultado[nombre] = [{"id": fila[0], "nombre": fila[1]} for fila in filas]
+    return resultado
@@ -0,0 +1,162 @@
+"""
+Búsqueda de productos por texto, ordenada por relevancia.
+
+En PostgreSQL cada producto guarda en Producto.busqueda un tsvector con su
+nombre (peso A), autor y editorial (B), género (C) y descripción (D), con un
+índice GIN. Se recalcula con un UPDATE después de cada save() del producto
+que cambie alguno de esos campos (CAMPOS_VECTOR) y cuando cambia el nombre de
+su autor, editorial o género (ver signals.py). Un bulk_create o update() que
+toque esos datos debe llamar a actualizar_vectores().
+
+En otros motores (SQLite en los tests) se usa un índice invertido en memoria
+con los mismos pesos. Se arma en el primer uso y se descarta cuando el bus de
+invalidación avisa un cambio en productos o en sus tablas de referencia. No
+hace stemming como la configuración de PostgreSQL, pero ignora tildes y
+mayúsculas.
+"""
+
+import re
+import threading
+import unicodedata
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connection
+from django.db.models import F, OuterRef, Subquery
+
+from backend import invalidacion
+
+from .models import Autor, Editorial, Genero, Producto
+
+# Los mismos pesos por defecto de ts_rank
+PESOS = {"A": 1.0, "B": 0.4, "C": 0.2, "D": 0.1}
+CAMPOS = (
+    ("nombre", "A"),
+    ("autor__nombre", "B"),
+    ("editorial__nombre", "B"),
+    ("genero__nombre", "C"),
+    ("descripcion", "D"),
+)
+# Campos de Producto (attname) de los que depende el vector
+CAMPOS_VECTOR = frozenset(
+    {"nombre", "descripcion", "autor_id", "editorial_id", "genero_id"}
+)
+# Palabras que la configuración "spanish" de PostgreSQL tampoco indexa
+PALABRAS_VACIAS = frozenset(
+    "a al con de del el en la las lo los o para por que se su un una y".split()
+)
+
+_re_palabra = re.compile(r"\w+")
+
+
+def usa_postgresql():
+    return connection.vendor == "postgresql"
+
+
+def configuracion():
+    return getattr(settings, "BUSQUEDA_CONFIGURACION", "spanish")
+
+
+def _nombre_de(modelo, campo):
+    # update() no admite joins; el nombre relacionado va como subconsulta
+    return Subquery(modelo.objects.filter(pk=OuterRef(campo)).values("nombre"))
+
+
+def vector_busqueda():
+    config = configuracion()
+    return (
+        SearchVector("nombre", weight="A", config=config)
+        + SearchVector(
+            _nombre_de(Autor, "autor_id"),
+            _nombre_de(Editorial, "editorial_id"),
+            weight="B",
+            config=config,
+        )
+        + SearchVector(_nombre_de(Genero, "genero_id"), weight="C", config=config)
+        + SearchVector("descripcion", weight="D", config=config)
+    )
+
+
+def actualizar_vectores(queryset):
+    """Recalcula el vector de búsqueda de los productos del queryset"""
+    if usa_postgresql():
+        queryset.update(busqueda=vector_busqueda())
+
+
+def palabras(texto):
+    """Palabras de texto en minúsculas y sin tildes, sin palabras vacías"""
+    normalizado = unicodedata.normalize("NFKD", texto or "").lower()
+    sin_tildes = "".join(c for c in normalizado if not unicodedata.combining(c))
+    return [p for p in _re_palabra.findall(sin_tildes) if p not in PALABRAS_VACIAS]
+
+
+class IndiceInvertido:
+    """palabra -> {id de producto: puntaje} de los productos activos"""
+
+    def __init__(self):
+        self.generacion = 0
+        self._lock = threading.Lock()
+        self._terminos = None
+
+    def limpiar(self, entidades=None):
+        with self._lock:
+            self._terminos = None
+            self.generacion += 1
+
+    def _construir(self):
+        indice = defaultdict(dict)
+        filas = Producto.objects.filter(is_active=True).values_list(
+            "pk", *(campo for campo, _ in CAMPOS)
+        )
+        for pk, *textos in filas:
+            for texto, (_, peso) in zip(textos, CAMPOS):
+                for palabra in palabras(texto):
+                    puntajes = indice[palabra]
+                    puntajes[pk] = puntajes.get(pk, 0) + PESOS[peso]
+        return dict(indice)
+
+    def terminos(self):
+        invalidacion.sincronizar()
+        indice = self._terminos
+        if indice is None:
+            generacion = self.generacion
+            indice = self._construir()
+            with self._lock:
+                if generacion == self.generacion:
+                    self._terminos = indice
+        return indice
+
+    def buscar(self, texto):
+        """ids que contienen todas las palabras de texto, por puntaje"""
+        consulta = set(palabras(texto))
+        if not consulta:
+            return []
+        indice = self.terminos()
+        listas = sorted((indice.get(p, {}) for p in consulta), key=len)
+        coincidencias = set(listas[0]).intersection(*listas[1:])
+        return sorted(
+            coincidencias, key=lambda pk: (-sum(lista[pk] for lista in listas), pk)
+        )
+
+
+indice_invertido = IndiceInvertido()
+invalidacion.suscribir(
+    indice_invertido.limpiar, ["producto", "autor", "editorial", "genero"]
+)
+
+
+def buscar_ids(texto):
+    """
+    ids de los productos activos que coinciden con texto, del más relevante
+    al menos. En PostgreSQL es un queryset (se pagina en la base).
+    """
+    if usa_postgresql():
+        consulta = SearchQuery(texto, config=configuracion(), search_type="websearch")
+        return (
+            Producto.objects.filter(is_active=True, busqueda=consulta)
+            .annotate(relevancia=SearchRank(F("busqueda"), consulta))
+            .order_by("-relevancia", "pk")
+            .values_list("pk", flat=True)
+        )
+    return indice_invertido.buscar(texto)
@@ -0,0 +1,181 @@
+"""
+Versión del catálogo y GET condicional.
+
+Cualquier escritura de productos, ofertas o tablas de referencia (categorías,
+géneros, autores, editoriales) incrementa la versión de su entidad en el bus
+de invalidación (ver backend/invalidacion.py, signals.py y los update()
+masivos de las vistas). Las respuestas de lectura del catálogo llevan un ETag
+fuerte derivado de las versiones de las entidades que sirve cada vista
+(entidades_etag), de la URL pedida y del formato; si el cliente lo reenvía
+en If-None-Match y nada cambió, se responde 304 sin ejecutar el queryset ni
+el serializer. Así, escribir un producto no cambia el ETag de /categorias/.
+
+Parte de las respuestas de productos y ofertas depende de la hora (ofertas
+vigentes, precio con descuento), así que su ETag incluye también cuántos
+inicios y fines de oferta ya pasaron: al cruzar uno cambia el ETag aunque no
+haya habido escrituras.
+
+El vencimiento o inicio de una oferta tampoco escribe nada en la base: con
+los mismos límites, cada proceso detecta que se cruzó uno y avisa a los
+suscriptores de "oferta" del bus como si hubiera cambiado.
+"""
+
+import bisect
+import hashlib
+import threading
+
+from django.utils import timezone
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.response import Response
+
+from backend import invalidacion
+
+from .models import Oferta
+
+# Entidades del catálogo en el bus de invalidación. Un cambio solo del stock
+# de productos se publica aparte, como "stock" (ver signals.py)
+ENTIDADES = ("producto", "oferta", "categoria", "genero", "autor", "editorial")
+# Sufijos que agrega backend.compresion al ETag según la codificación
+SUFIJOS_CODIFICACION = ("-gzip", "-br")
+
+_lock = threading.Lock()
+# Inicios y fines de las ofertas activas, ordenados (None: sin calcular). Cada
+# invalidación incrementa _generacion_limites
+_limites = None
+_generacion_limites = 0
+# Tramo (cuántos límites ya pasaron) que vio la última verificación del bus
+_ultimo_tramo = None
+
+
+def invalidar_catalogo(*entidades, ids=None):
+    """
+    Publica el cambio de las entidades indicadas (todas si no se indica
+    ninguna), opcionalmente con los ids que cambiaron. Sirve para los
+    update() y bulk_create que no disparan señales.
+    """
+    invalidacion.publicar(*(entidades or ENTIDADES), ids=ids)
+
+
+def _limites_de_ofertas():
+    """Inicios y fines de las ofertas activas, ordenados"""
+    global _limites
+
+    with _lock:
+        limites, generacion = _limites, _generacion_limites
+    if limites is None:
+        fechas = Oferta.objects.filter(is_active=True).values_list(
+            "fecha_inicio", "fecha_fin"
+        )
+        limites = sorted(fecha for par in fechas for fecha in par)
+        with _lock:
+            # Si se invalidó mientras se consultaba, lo recalcula otro llamado
+            if generacion == _generacion_limites:
+                _limites = limites
+    return limites
+
+
+def _tramo_de_ofertas(momento):
+    """Cuántos inicios y fines de oferta ya pasaron en el momento indicado"""
+    return bisect.bisect_right(_limites_de_ofertas(), momento)
+
+
+def _olvidar_limites(entidades=None):
+    global _limites, _generacion_limites, _ultimo_tramo
+
+    with _lock:
+        _limites = None
+        _generacion_limites += 1
+        _ultimo_tramo = None
+
+
+def _ofertas_que_empiezan_o_terminan():
+    """Verificación del bus: "oferta" si se pasó un inicio o fin de oferta"""
+    global _ultimo_tramo
+
+    tramo = _tramo_de_ofertas(timezone.now())
+    with _lock:
+        anterior, _ultimo_tramo = _ultimo_tramo, tramo
+    if anterior is not None and tramo != anterior:
+        return {"oferta"}
+    return set()
+
+
+invalidacion.suscribir(_olvidar_limites, ["oferta"])
+invalidacion.agregar_verificacion(_ofertas_que_empiezan_o_terminan)
+
+
+def etag_catalogo(request, entidades=ENTIDADES):
+    """
+    ETag de la respuesta: versiones de las entidades que sirve la vista y, si
+    entre ellas están las ofertas, el tramo de inicios y fines de oferta
+    """
+    version = invalidacion.version(*entidades)
+    tramo = _tramo_de_ofertas(timezone.now()) if "oferta" in entidades else 0
+    formato = getattr(request.accepted_renderer, "format", "")
+    huella = hashlib.sha1(
+        f"{request.get_full_path()}|{formato}".encode(), usedforsecurity=False
+    ).hexdigest()[:16]
+    return f'"c{version}.{tramo}-{huella}"'
+
+
+def _etags_de_if_none_match(valor):
+    for etag in valor.split(","):
+        etag = etag.strip()
+        if etag.startswith("W/"):
+            etag = etag[2:]
+        for sufijo in SUFIJOS_CODIFICACION:
+            if etag.endswith(sufijo + '"'):
+                etag = etag[: -len(sufijo) - 1] + '"'
+        yield etag
+
+
+class NoModificado(APIException):
+    status_code = status.HTTP_304_NOT_MODIFIED
+
+
+class CatalogoCondicionalMixin:
+    """
+    GET condicional para las acciones de lectura del catálogo. Las acciones
+    cubiertas son list, retrieve y las que agregue cada vista en
+    acciones_condicionales_extra. El 304 se decide después de autenticar y
+    verificar permisos.
+    """
+
+    acciones_condicionales = ("list", "retrieve")
+    acciones_condicionales_extra = ()
+    # Entidades del bus de las que dependen las respuestas de la vista
+    entidades_etag = ENTIDADES
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.etag_respuesta = None
+        accion = getattr(self, "action", None)
+        if request.method not in ("GET", "HEAD") or accion not in (
+            self.acciones_condicionales + self.acciones_condicionales_extra
+        ):
+            return
+
+        self.etag_respuesta = etag_catalogo(request, self.entidades_etag)
+        if_none_match = request.headers.get("If-None-Match")
+        if if_none_match and (
+            if_none_match.strip() == "*"
+            or self.etag_respuesta in _etags_de_if_none_match(if_none_match)
+        ):
+            raise NoModificado()
+
+    def handle_exception(self, exc):
+        if isinstance(exc, NoModificado):
+            return Response(status=status.HTTP_304_NOT_MODIFIED)
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        etag = getattr(self, "etag_respuesta", None)
+        if etag and response.status_code in (200, 304):
+            response["ETag"] = etag
+            # El cliente puede guardar la respuesta pero debe revalidarla
+            patch_cache_control(response, private=True, no_cache=True)
+            patch_vary_headers(response, ["Accept", "Authorization"])
+        return response
@@ -0,0 +1,165 @@
+"""
+Documentos JSON de productos ya serializados.
+
+Serializar un producto (cinco relaciones anidadas y tres campos calculados)
+es el camino más caro de la API. Cada proceso guarda el JSON de cada producto
+en un LRU acotado por bytes (PRODUCTOS_DOCUMENTOS_MAXIMO_BYTES). El listado y
+el detalle se arman concatenando esos fragmentos, sin pasar por el
+serializer ni el renderer.
+
+Un documento incluye campos que dependen de la hora (precio con descuento,
+oferta vigente), pero solo cambian cuando empieza o termina una oferta. El
+bus de invalidación avisa ese momento como un cambio de "oferta".
+
+Los cambios de productos ("producto" y "stock") llegan por el bus con los
+ids afectados y se descartan solo esos documentos. El número de productos de
+una oferta aparece en el documento de cada producto de esa oferta, así que
+signals.py publica además la oferta cuando un producto entra, sale o deja de
+estar activo en ella; un cambio de "oferta" con ids descarta los documentos
+de los productos de esas ofertas. Cualquier otro cambio (tablas de
+referencia, o uno sin ids) descarta todo.
+
+La cache se llena a medida que se piden productos; el primer listado de cada
+proceso la llena entera. precalentar() sirve para hacerlo al arrancar el
+worker.
+"""
+
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+from backend import invalidacion
+from backend.metricas import contar_cache
+from backend.renderers import ORJSONRenderer
+
+from .catalogo import ENTIDADES
+from .models import Producto
+from .serializers import ProductoSerializer
+
+# Categoría, género, autor y editorial salen de la cache de lookups.py
+RELACIONES = ("oferta",)
+
+
+class CacheDocumentos:
+    """LRU de id de producto -> JSON (bytes), acotado por tamaño total"""
+
+    def __init__(self, maximo_bytes):
+        self.maximo_bytes = maximo_bytes
+        self.bytes = 0
+        # Cambia en cada invalidación; evita guardar documentos calculados con
+        # datos anteriores a ella
+        self.generacion = 0
+        self._lock = threading.Lock()
+        self._documentos = OrderedDict()
+        # id de producto -> id de su oferta, de los documentos guardados
+        self._ofertas = {}
+
+    def obtener_varios(self, ids):
+        encontrados = {}
+        with self._lock:
+            for pk in ids:
+                documento = self._documentos.get(pk)
+                if documento is not None:
+                    self._documentos.move_to_end(pk)
+                    encontrados[pk] = documento
+        return encontrados
+
+    def guardar_varios(self, documentos, generacion, ofertas=None):
+        """Guarda id -> documento; ofertas es id -> id de la oferta del producto"""
+        ofertas = ofertas or {}
+        with self._lock:
+            if generacion != self.generacion:
+                return
+            for pk, documento in documentos.items():
+                self._descartar(pk)
+                self._documentos[pk] = documento
+                self._ofertas[pk] = ofertas.get(pk)
+                self.bytes += len(documento)
+            while self.bytes > self.maximo_bytes and self._documentos:
+                self._descartar(next(iter(self._documentos)))
+
+    def _descartar(self, pk):
+        documento = self._documentos.pop(pk, None)
+        if documento is not None:
+            self.bytes -= len(documento)
+            del self._ofertas[pk]
+
+    def limpiar(self, cambios=None):
+        with self._lock:
+            self._documentos.clear()
+            self._ofertas.clear()
+            self.bytes = 0
+            self.generacion += 1
+
+    def invalidar(self, cambios):
+        """
+        Suscriptor del bus: descarta los productos con ids de "producto" y
+        "stock" y los productos de las ofertas con ids de "oferta"; ante
+        cualquier otro cambio, todo
+        """
+        productos, ofertas = set(), set()
+        for entidad, ids in cambios.items():
+            if ids is None or entidad not in ("producto", "stock", "oferta"):
+                self.limpiar()
+                return
+            (ofertas if entidad == "oferta" else productos).update(ids)
+
+        with self._lock:
+            self.generacion += 1
+            if ofertas:
+                productos.update(
+                    pk for pk, oferta in self._ofertas.items() if oferta in ofertas
+                )
+            for pk in productos:
+                self._descartar(pk)
+
+
+cache_documentos = CacheDocumentos(
+    getattr(settings, "PRODUCTOS_DOCUMENTOS_MAXIMO_BYTES", 32 * 1024 * 1024)
+)
+invalidacion.suscribir(cache_documentos.invalidar, ENTIDADES + ("stock",))
+
+
+def documentos_de_productos(ids):
+    """JSON de cada producto activo de `ids`, en el mismo orden"""
+    invalidacion.sincronizar()
+    generacion = cache_documentos.generacion
+    encontrados = cache_documentos.obtener_varios(ids)
+    faltantes = [pk for pk in ids if pk not in encontrados]
+    contar_cache("documentos_productos", True, len(encontrados))
+
+    if faltantes:
+        contar_cache("documentos_productos", False, len(faltantes))
+        renderer = ORJSONRenderer()
+        productos = Producto.objects.filter(
+            pk__in=faltantes, is_active=True
+        ).select_related(*RELACIONES)
+        nuevos = {
+            producto.pk: renderer.render(ProductoSerializer(producto).data)
+            for producto in productos
+        }
+        ofertas = {producto.pk: producto.oferta_id for producto in productos}
+        cache_documentos.guardar_varios(nuevos, generacion, ofertas)
+        encontrados.update(nuevos)
+
+    return [encontrados[pk] for pk in ids if pk in encontrados]
+
+
+def lista_json(documentos):
+    return b"[" + b",".join(documentos) + b"]"
+
+
+def pagina_json(paginador, documentos):
+    """
+    El JSON de paginador.get_paginated_response() con los documentos como
+    "results" (la última clave de los paginadores de DRF)
+    """
+    envoltorio = ORJSONRenderer().render(paginador.get_paginated_response([]).data)
+    return envoltorio[: -len(b"[]}")] + lista_json(documentos) + b"}"
+
+
+def precalentar():
+    """Carga los documentos de todos los productos activos"""
+    ids = list(Producto.objects.filter(is_active=True).values_list("pk", flat=True))
+    return len(documentos_de_productos(ids))
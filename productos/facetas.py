@@ -0,0 +1,366 @@
+"""
+Filtros del catálogo y conteo de facetas.
+
+Los filtros (?categoria=1,2&genero=3&autor=4&editorial=5&precio_min=10
+&precio_max=50&en_oferta=true) se aplican en la base para el listado
+(filtrar_productos) y en memoria para las facetas (MotorFacetas).
+
+El motor guarda los productos activos ordenados por precio, de modo que cada
+producto es una posición y un conjunto de productos es un entero usado como
+bitmap: filtrar es hacer AND/OR de máscaras y un rango de precios es un rango
+contiguo de bits. Para contar una faceta se combinan los filtros de las demás
+(contar una categoría no depende de la categoría elegida) y se cuentan los
+valores de su columna en las posiciones elegidas. Todo esto corre en C
+(operaciones de enteros, bytes.translate, itertools.compress, Counter), así que
+una consulta de facetas cuesta unos milisegundos aun con cientos de miles de
+productos, y el resultado se memoriza por combinación de filtros.
+
+El motor se rearma cuando el bus de invalidación avisa cambios de productos u
+ofertas (también al empezar o terminar una oferta). Con muchos productos se
+rearma en un hilo aparte y mientras tanto responde el anterior.
+"""
+
+import logging
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from decimal import Decimal, InvalidOperation
+from itertools import compress, repeat
+from operator import eq
+
+from django.db import connection
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from backend import invalidacion
+
+from . import lookups
+from .models import Oferta, Producto
+
+logger = logging.getLogger(__name__)
+
+FACETAS = {
+    "categoria": lookups.categorias,
+    "genero": lookups.generos,
+    "autor": lookups.autores,
+    "editorial": lookups.editoriales,
+}
+# Límites de los tramos de la faceta de precio (el último no tiene tope)
+TRAMOS_PRECIO = (Decimal(0), Decimal(10), Decimal(25), Decimal(50), Decimal(100))
+MAXIMO_VALORES = 50
+# Facetas con hasta esta cantidad de valores guardan un bitmap por valor y se
+# cuentan con bit_count(); las demás (autores) guardan las posiciones de cada
+# valor y se cuentan recorriendo su columna
+MAXIMO_VALORES_DENSOS = 64
+MAXIMO_MEMORIZADOS = 1000
+# Motores con más productos que esto se rearman en segundo plano
+MINIMO_SEGUNDO_PLANO = 20000
+
+_BYTE_A_CARACTER = bytes.maketrans(b"\x00\x01", b"01")
+_CARACTER_A_BYTE = bytes.maketrans(b"01", b"\x00\x01")
+
+
+def _ids(valor, parametro):
+    try:
+        return frozenset(int(parte) for parte in valor.split(",") if parte.strip())
+    except ValueError:
+        raise ValidationError(
+            {parametro: ["Debe ser un id o una lista de ids separados por comas."]}
+        )
+
+
+def _precio(valor, parametro):
+    try:
+        valor = Decimal(valor)
+    except InvalidOperation:
+        raise ValidationError({parametro: ["Debe ser un número."]})
+    # Decimal acepta "nan" e "Infinity", que no se pueden comparar con precios
+    if not valor.is_finite():
+        raise ValidationError({parametro: ["Debe ser un número."]})
+    return valor
+
+
+def leer_filtros(query_params):
+    """Filtros presentes en los parámetros, validados y normalizados"""
+    filtros = {}
+    for faceta in FACETAS:
+        if query_params.get(faceta):
+            filtros[faceta] = _ids(query_params[faceta], faceta)
+    for parametro in ("precio_min", "precio_max"):
+        if query_params.get(parametro):
+            filtros[parametro] = _precio(query_params[parametro], parametro)
+    en_oferta = query_params.get("en_oferta", "").lower()
+    if en_oferta:
+        if en_oferta not in ("true", "false", "1", "0"):
+            raise ValidationError({"en_oferta": ["Debe ser true o false."]})
+        filtros["en_oferta"] = en_oferta in ("true", "1")
+    return filtros
+
+
+def filtrar_productos(queryset, filtros):
+    for faceta in FACETAS:
+        if faceta in filtros:
+            queryset = queryset.filter(**{f"{faceta}_id__in": filtros[faceta]})
+    if "precio_min" in filtros:
+        queryset = queryset.filter(precio__gte=filtros["precio_min"])
+    if "precio_max" in filtros:
+        queryset = queryset.filter(precio__lte=filtros["precio_max"])
+    if "en_oferta" in filtros:
+        ahora = timezone.now()
+        vigente = {
+            "oferta__is_active": True,
+            "oferta__fecha_inicio__lte": ahora,
+            "oferta__fecha_fin__gte": ahora,
+        }
+        if filtros["en_oferta"]:
+            queryset = queryset.filter(**vigente)
+        else:
+            queryset = queryset.exclude(**vigente)
+    return queryset
+
+
+def _mascara(selectores):
+    """Bitmap con las posiciones cuyo selector es verdadero"""
+    texto = bytes(selectores).translate(_BYTE_A_CARACTER)[::-1]
+    return int(texto, 2) if texto else 0
+
+
+def _rango(desde, hasta):
+    return ((1 << hasta) - 1) ^ ((1 << desde) - 1)
+
+
+class MotorFacetas:
+    def __init__(self, filas, ofertas_vigentes):
+        # filas: (precio, categoria_id, genero_id, autor_id, editorial_id,
+        # oferta_id), ordenadas por precio
+        self.cantidad = len(filas)
+        self.todos = (1 << self.cantidad) - 1
+        self.precios = [fila[0] for fila in filas]
+        self.columnas = {
+            faceta: [fila[i] for fila in filas] for i, faceta in enumerate(FACETAS, 1)
+        }
+        self.en_oferta = _mascara(fila[5] in ofertas_vigentes for fila in filas)
+        self._mascaras = {}
+        self._memorizados = {}
+        self._densas = {}
+        self._posiciones = {}
+        for faceta, columna in self.columnas.items():
+            valores = set(columna) - {None}
+            if len(valores) <= MAXIMO_VALORES_DENSOS:
+                self._densas[faceta] = {
+                    valor: _mascara(map(eq, columna, repeat(valor)))
+                    for valor in valores
+                }
+            else:
+                posiciones = self._posiciones[faceta] = {}
+                for posicion, valor in enumerate(columna):
+                    if valor is not None:
+                        if valor not in posiciones:
+                            posiciones[valor] = array("I")
+                        posiciones[valor].append(posicion)
+
+    def _selectores(self, mascara):
+        """Un byte 0/1 por posición, para itertools.compress"""
+        texto = format(mascara, f"0{self.cantidad}b").encode()
+        return texto[::-1].translate(_CARACTER_A_BYTE)
+
+    def mascara_de(self, faceta, valor):
+        if faceta in self._densas:
+            return self._densas[faceta].get(valor, 0)
+        clave = (faceta, valor)
+        mascara = self._mascaras.get(clave)
+        if mascara is None:
+            bits = bytearray(self.cantidad // 8 + 1)
+            for posicion in self._posiciones[faceta].get(valor, ()):
+                bits[posicion >> 3] |= 1 << (posicion & 7)
+            mascara = int.from_bytes(bits, "little")
+            if len(self._mascaras) >= MAXIMO_MEMORIZADOS:
+                self._mascaras.clear()
+            self._mascaras[clave] = mascara
+        return mascara
+
+    def _mascara_de_precio(self, filtros):
+        desde = 0
+        hasta = self.cantidad
+        if "precio_min" in filtros:
+            desde = bisect_left(self.precios, filtros["precio_min"])
+        if "precio_max" in filtros:
+            hasta = bisect_right(self.precios, filtros["precio_max"])
+        return _rango(desde, max(desde, hasta))
+
+    def _contar_faceta(self, faceta, mascara):
+        """{valor: productos de mascara con ese valor}"""
+        conteo = Counter()
+        if faceta in self._densas:
+            for valor, mascara_valor in self._densas[faceta].items():
+                cantidad = (mascara & mascara_valor).bit_count()
+                if cantidad:
+                    conteo[valor] = cantidad
+        elif mascara == self.todos:
+            conteo.update(
+                {valor: len(p) for valor, p in self._posiciones[faceta].items()}
+            )
+        else:
+            conteo.update(compress(self.columnas[faceta], self._selectores(mascara)))
+            conteo.pop(None, None)
+        return conteo
+
+    def contar(self, filtros):
+        clave = tuple(sorted(filtros.items()))
+        resultado = self._memorizados.get(clave)
+        if resultado is None:
+            resultado = self._contar(filtros)
+            if len(self._memorizados) >= MAXIMO_MEMORIZADOS:
+                self._memorizados.clear()
+            self._memorizados[clave] = resultado
+        return resultado
+
+    def _contar(self, filtros):
+        por_faceta = {}
+        for faceta in FACETAS:
+            if faceta in filtros:
+                mascara = 0
+                for valor in filtros[faceta]:
+                    mascara |= self.mascara_de(faceta, valor)
+                por_faceta[faceta] = mascara
+        precio = self._mascara_de_precio(filtros)
+        oferta = self.todos
+        if "en_oferta" in filtros:
+            oferta = self.en_oferta
+            if not filtros["en_oferta"]:
+                oferta = self.todos & ~self.en_oferta
+
+        def combinar(*excepto):
+            mascara = self.todos
+            for faceta, mascara_faceta in por_faceta.items():
+                if faceta not in excepto:
+                    mascara &= mascara_faceta
+            if "precio" not in excepto:
+                mascara &= precio
+            if "en_oferta" not in excepto:
+                mascara &= oferta
+            return mascara
+
+        conteos = {
+            faceta: self._contar_faceta(faceta, combinar(faceta)) for faceta in FACETAS
+        }
+
+        sin_oferta = combinar("en_oferta")
+        con_oferta = (sin_oferta & self.en_oferta).bit_count()
+        conteos["en_oferta"] = {
+            "true": con_oferta,
+            "false": sin_oferta.bit_count() - con_oferta,
+        }
+
+        sin_precio = combinar("precio")
+        tramos = []
+        limites = TRAMOS_PRECIO + (None,)
+        for desde, hasta in zip(limites, limites[1:]):
+            inicio = bisect_left(self.precios, desde)
+            fin = self.cantidad if hasta is None else bisect_left(self.precios, hasta)
+            cantidad = (sin_precio & _rango(inicio, max(inicio, fin))).bit_count()
+            tramos.append((desde, hasta, cantidad))
+        conteos["precio"] = tramos
+
+        return combinar().bit_count(), conteos
+
+
+class Facetas:
+    """El motor vigente de este proceso"""
+
+    def __init__(self):
+        self.sucio = True
+        self._motor = None
+        # Lo tiene quien esté rearmando el motor
+        self._lock = threading.Lock()
+        invalidacion.suscribir(self.ensuciar, ["producto", "oferta"])
+
+    def ensuciar(self, entidades=None):
+        self.sucio = True
+
+    def _rearmar(self):
+        # Un cambio durante el armado lo vuelve a ensuciar
+        self.sucio = False
+        try:
+            ahora = timezone.now()
+            vigentes = frozenset(
+                Oferta.objects.filter(
+                    is_active=True, fecha_inicio__lte=ahora, fecha_fin__gte=ahora
+                ).values_list("pk", flat=True)
+            )
+            filas = list(
+                Producto.objects.filter(is_active=True)
+                .order_by("precio", "pk")
+                .values_list(
+                    "precio",
+                    *(f"{faceta}_id" for faceta in FACETAS),
+                    "oferta_id",
+                )
+            )
+            self._motor = MotorFacetas(filas, vigentes)
+        except Exception:
+            self.sucio = True
+            raise
+
+    def _rearmar_en_segundo_plano(self):
+        try:
+            self._rearmar()
+        except Exception:
+            logger.exception("No se pudo rearmar el motor de facetas")
+        finally:
+            connection.close()
+            self._lock.release()
+
+    def motor(self):
+        invalidacion.sincronizar()
+        if not self.sucio:
+            return self._motor
+        motor = self._motor
+        if motor is None or motor.cantidad < MINIMO_SEGUNDO_PLANO:
+            with self._lock:
+                # Otro hilo pudo haberlo rearmado mientras se esperaba
+                if self.sucio:
+                    self._rearmar()
+        elif self._lock.acquire(blocking=False):
+            threading.Thread(
+                target=self._rearmar_en_segundo_plano,
+                name="facetas",
+                daemon=True,
+            ).start()
+        return self._motor
+
+
+facetas = Facetas()
+
+
+def _valores(faceta, conteo):
+    tabla = FACETAS[faceta].filas()
+    valores = [
+        {
+            "id": pk,
+            "nombre": tabla[pk].nombre if pk in tabla else None,
+            "cantidad": cantidad,
+        }
+        for pk, cantidad in conteo.items()
+    ]
+    valores.sort(key=lambda valor: (-valor["cantidad"], valor["nombre"] or ""))
+    return valores[:MAXIMO_VALORES]
+
+
+def contar_facetas(filtros):
+    """Total de productos con los filtros y conteos de cada faceta"""
+    total, conteos = facetas.motor().contar(filtros)
+    respuesta = {"total": total, "facetas": {}}
+    for faceta in FACETAS:
+        respuesta["facetas"][faceta] = _valores(faceta, conteos[faceta])
+    respuesta["facetas"]["en_oferta"] = conteos["en_oferta"]
+    respuesta["facetas"]["precio"] = [
+        {
+            "desde": str(desde),
+            "hasta": str(hasta) if hasta is not None else None,
+            "cantidad": cantidad,
+        }
+        for desde, hasta, cantidad in conteos["precio"]
+    ]
+    return respuesta
@@ -0,0 +1,173 @@
+"""
+Cache por proceso de las tablas de referencia: categorías, géneros, autores y
+editoriales.
+
+Son tablas de pocas filas que casi no cambian, pero se leen en cada escritura
+de un producto (los *_id del ProductoSerializer) y en cada producto
+serializado (los objetos anidados). Cada tabla se carga entera la primera vez
+que se usa y se descarta cuando el bus de invalidación avisa un cambio de su
+entidad; la siguiente lectura la vuelve a cargar.
+
+Un id que no está en la cache (una fila creada por otro proceso que todavía
+no se sincronizó) se busca en la base, así que la cache nunca rechaza un id
+válido.
+"""
+
+import copy
+import threading
+import time
+
+from django.core.exceptions import ValidationError
+from rest_framework import serializers
+from rest_framework.response import Response
+
+from backend import invalidacion
+
+from .models import Autor, Categoria, Editorial, Genero
+
+# Al serializar, cada producto lee cuatro tablas; sincronizar el bus en cada
+# lectura costaría más que la propia cache
+SINCRONIZAR_CADA = 0.1
+
+
+class TablaCacheada:
+    def __init__(self, modelo, entidad):
+        self.modelo = modelo
+        self.entidad = entidad
+        self.generacion = 0
+        self._lock = threading.Lock()
+        self._filas = None
+        self._representaciones = {}
+        self._proxima_sincronizacion = 0.0
+        invalidacion.suscribir(self.limpiar, [entidad])
+
+    def __deepcopy__(self, memo):
+        # DRF copia los argumentos de cada campo declarado al instanciar un
+        # serializer; la tabla es única por proceso
+        return self
+
+    def limpiar(self, entidades=None):
+        with self._lock:
+            self._filas = None
+            self._representaciones = {}
+            self.generacion += 1
+
+    def filas(self):
+        """{pk: instancia} de toda la tabla, en el orden de la base"""
+        ahora = time.monotonic()
+        if ahora >= self._proxima_sincronizacion:
+            self._proxima_sincronizacion = ahora + SINCRONIZAR_CADA
+            invalidacion.sincronizar()
+
+        filas = self._filas
+        if filas is None:
+            generacion = self.generacion
+            filas = {fila.pk: fila for fila in self.modelo.objects.all()}
+            with self._lock:
+                # Si se invalidó mientras se leía, esta copia puede estar vieja
+                if generacion == self.generacion:
+                    self._filas = filas
+        return filas
+
+    def obtener(self, pk):
+        fila = self.filas().get(pk)
+        if fila is None:
+            fila = self.modelo.objects.filter(pk=pk).first()
+        return fila
+
+    def representacion(self, pk, serializer_class):
+        """serializer_class(fila).data, calculado una vez por versión"""
+        clave = (serializer_class, pk)
+        datos = self._representaciones.get(clave)
+        if datos is None:
+            generacion = self.generacion
+            fila = self.obtener(pk)
+            if fila is None:
+                return None
+            datos = dict(serializer_class(fila).data)
+            with self._lock:
+                if generacion == self.generacion:
+                    self._representaciones[clave] = datos
+        return dict(datos)
+
+
+categorias = TablaCacheada(Categoria, "categoria")
+generos = TablaCacheada(Genero, "genero")
+autores = TablaCacheada(Autor, "autor")
+editoriales = TablaCacheada(Editorial, "editorial")
+
+
+class PrimaryKeyCacheadoField(serializers.PrimaryKeyRelatedField):
+    """PrimaryKeyRelatedField que valida el id contra la tabla cacheada"""
+
+    def __init__(self, tabla, **kwargs):
+        self.tabla = tabla
+        kwargs.setdefault("queryset", tabla.modelo.objects.all())
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        if self.pk_field is not None:
+            data = self.pk_field.to_internal_value(data)
+        if isinstance(data, bool):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        try:
+            pk = self.tabla.modelo._meta.pk.to_python(data)
+        except (TypeError, ValidationError):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+
+        fila = self.tabla.obtener(pk)
+        if fila is None:
+            self.fail("does_not_exist", pk_value=data)
+        # La instancia de la cache es compartida entre peticiones
+        return copy.copy(fila)
+
+
+def serializer_cacheado(serializer_class, tabla):
+    """
+    Variante de solo lectura de serializer_class para usar anidada: toma el id
+    de la FK (sin cargar el objeto relacionado) y devuelve la representación
+    cacheada.
+    """
+
+    class Meta(serializer_class.Meta):
+        # Se documenta en línea: el nombre ya lo usa serializer_class
+        ref_name = None
+
+    def get_attribute(self, instance):
+        return getattr(instance, f"{self.source}_id")
+
+    def to_representation(self, pk):
+        return tabla.representacion(pk, serializer_class)
+
+    return type(
+        serializer_class.__name__,
+        (serializer_class,),
+        {
+            "Meta": Meta,
+            "get_attribute": get_attribute,
+            "to_representation": to_representation,
+        },
+    )
+
+
+class TablaCacheadaMixin:
+    """list y retrieve desde la tabla cacheada de la vista"""
+
+    tabla = None
+
+    def list(self, request, *args, **kwargs):
+        return Response(
+            [
+                self.tabla.representacion(pk, self.serializer_class)
+                for pk in self.tabla.filas()
+            ]
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            pk = int(kwargs[self.lookup_field])
+        except ValueError:
+            pk = None
+        if pk in self.tabla.filas():
+            return Response(self.tabla.representacion(pk, self.serializer_class))
+        return super().retrieve(request, *args, **kwargs)
@@ -0,0 +1,120 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from productos.autocompletar import SECCIONES, sugerencias
+from productos.busqueda import buscar_ids, indice_invertido, palabras
+from productos.facetas import FACETAS, contar_facetas, facetas
+from productos.models import Producto
+from reportes.management.commands.benchmark_endpoints import percentil
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide la latencia de la búsqueda de productos (primera página) con "
+        "consultas de una, dos y tres palabras tomadas del catálogo, la del "
+        "autocompletado con prefijos de esas palabras y la del conteo de "
+        "facetas con filtros al azar. Para medir "
+        "a gran escala, generar el catálogo con `generar_datos --escala N` en "
+        "PostgreSQL."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--consultas", type=int, default=200)
+        parser.add_argument("--semilla", type=int, default=42)
+        parser.add_argument("--pagina", type=int, default=20)
+
+    def handle(self, *args, **options):
+        if options["consultas"] < 2:
+            raise CommandError("Se necesitan al menos 2 consultas.")
+        total = Producto.objects.filter(is_active=True).count()
+        if not total:
+            raise CommandError(
+                "No hay productos; genere datos con `manage.py generar_datos`."
+            )
+
+        rnd = random.Random(options["semilla"])
+        muestra = Producto.objects.filter(is_active=True).values_list(
+            "nombre", "descripcion", "autor__nombre"
+        )[:1000]
+        vocabulario = sorted({p for fila in muestra for t in fila for p in palabras(t)})
+
+        if connection.vendor != "postgresql":
+            inicio = time.perf_counter()
+            indice_invertido.terminos()
+            self.stdout.write(
+                f"Índice invertido armado en {(time.perf_counter() - inicio) * 1000:.0f} ms"
+            )
+
+        self.stdout.write(f"{total} productos activos ({connection.vendor})")
+        for cantidad_palabras in (1, 2, 3):
+            tiempos = []
+            resultados = 0
+            for _ in range(options["consultas"]):
+                texto = " ".join(rnd.sample(vocabulario, cantidad_palabras))
+                inicio = time.perf_counter()
+                ids = buscar_ids(texto)
+                pagina = list(ids[: options["pagina"]])
+                cantidad = len(ids) if isinstance(ids, list) else ids.count()
+                tiempos.append((time.perf_counter() - inicio) * 1000)
+                resultados += cantidad
+            self.stdout.write(
+                f"{cantidad_palabras} palabra(s): p50={percentil(tiempos, 50):.2f} ms "
+                f"p90={percentil(tiempos, 90):.2f} ms p99={percentil(tiempos, 99):.2f} ms "
+                f"(promedio {resultados / options['consultas']:.0f} resultados)"
+            )
+
+        inicio = time.perf_counter()
+        for seccion in SECCIONES.values():
+            seccion.estado()
+        self.stdout.write(
+            f"Autocompletado armado en {(time.perf_counter() - inicio) * 1000:.0f} ms"
+        )
+        for largo in (1, 2, 3, 5):
+            tiempos = []
+            for _ in range(options["consultas"]):
+                prefijo = rnd.choice(vocabulario)[:largo]
+                inicio = time.perf_counter()
+                sugerencias(prefijo)
+                tiempos.append((time.perf_counter() - inicio) * 1000)
+            self.stdout.write(
+                f"autocompletar {largo} letra(s): p50={percentil(tiempos, 50):.3f} ms "
+                f"p90={percentil(tiempos, 90):.3f} ms p99={percentil(tiempos, 99):.3f} ms"
+            )
+
+        inicio = time.perf_counter()
+        motor = facetas.motor()
+        self.stdout.write(
+            f"Motor de facetas armado en {(time.perf_counter() - inicio) * 1000:.0f} ms"
+        )
+        valores = {
+            faceta: sorted(set(motor.columnas[faceta]) - {None}) for faceta in FACETAS
+        }
+        combinaciones = {
+            "sin filtros": (),
+            "categoria": ("categoria",),
+            "autor": ("autor",),
+            "categoria+precio+oferta": ("categoria", "precio", "en_oferta"),
+        }
+        for nombre, campos in combinaciones.items():
+            tiempos = []
+            for _ in range(options["consultas"]):
+                filtros = {}
+                for campo in campos:
+                    if campo == "precio":
+                        filtros["precio_max"] = rnd.choice(motor.precios)
+                    elif campo == "en_oferta":
+                        filtros["en_oferta"] = rnd.random() < 0.5
+                    elif valores[campo]:
+                        filtros[campo] = frozenset([rnd.choice(valores[campo])])
+                # Sin la memoria de resultados, para medir el conteo
+                motor._memorizados.clear()
+                inicio = time.perf_counter()
+                contar_facetas(filtros)
+                tiempos.append((time.perf_counter() - inicio) * 1000)
+            self.stdout.write(
+                f"facetas {nombre}: p50={percentil(tiempos, 50):.2f} ms "
+                f"p90={percentil(tiempos, 90):.2f} ms p99={percentil(tiempos, 99):.2f} ms"
+            )
@@ -0,0 +1,34 @@
+# Generated by Django 5.2 on 2026-10-19 07:03
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0003_oferta_producto_oferta'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='autor',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('nombre'), name='autor_nombre_lower_unico'),
+        ),
+        migrations.AddConstraint(
+            model_name='categoria',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('nombre'), name='categoria_nombre_lower_unico'),
+        ),
+        migrations.AddConstraint(
+            model_name='editorial',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('nombre'), name='editorial_nombre_lower_unico'),
+        ),
+        migrations.AddConstraint(
+            model_name='genero',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('nombre'), name='genero_nombre_lower_unico'),
+        ),
+        migrations.AddConstraint(
+            model_name='oferta',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('nombre'), name='oferta_nombre_lower_unico'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2 on 2026-10-19 07:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0004_nombre_lower_unico'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VersionCatalogo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entidad', models.CharField(max_length=30, unique=True)),
+                ('version', models.BigIntegerField(default=0)),
+            ],
+        ),
+    ]
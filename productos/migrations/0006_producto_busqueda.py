@@ -0,0 +1,50 @@
+# Generated by Django 5.2 on 2026-10-19 07:25
+
+import backend.indices
+import django.contrib.postgres.search
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+from django.db.models import OuterRef, Subquery
+
+
+def calcular_vectores(apps, schema_editor):
+    # Copia de productos.busqueda.vector_busqueda() al momento de la migración
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    Producto = apps.get_model("productos", "Producto")
+
+    def nombre_de(modelo, campo):
+        modelo = apps.get_model("productos", modelo)
+        return Subquery(modelo.objects.filter(pk=OuterRef(campo)).values("nombre"))
+
+    Producto.objects.update(
+        busqueda=SearchVector("nombre", weight="A", config="spanish")
+        + SearchVector(
+            nombre_de("Autor", "autor_id"),
+            nombre_de("Editorial", "editorial_id"),
+            weight="B",
+            config="spanish",
+        )
+        + SearchVector(nombre_de("Genero", "genero_id"), weight="C", config="spanish")
+        + SearchVector("descripcion", weight="D", config="spanish")
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0005_version_catalogo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='producto',
+            name='busqueda',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='producto',
+            index=backend.indices.IndiceBusqueda(fields=['busqueda'], name='producto_busqueda_gin'),
+        ),
+        migrations.RunPython(calcular_vectores, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2 on 2026-10-19 07:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0006_producto_busqueda'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(fields=['is_active', 'precio'], name='producto_activo_precio_idx'),
+        ),
+    ]
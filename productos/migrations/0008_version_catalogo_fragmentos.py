@@ -0,0 +1,27 @@
+# Generated by Django 5.2 on 2026-10-19 08:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0007_producto_activo_precio_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='versioncatalogo',
+            name='fragmento',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='versioncatalogo',
+            name='entidad',
+            field=models.CharField(max_length=30),
+        ),
+        migrations.AddConstraint(
+            model_name='versioncatalogo',
+            constraint=models.UniqueConstraint(fields=('entidad', 'fragmento'), name='version_entidad_fragmento_unica'),
+        ),
+    ]
@@ -0,0 +1,16 @@
+# Generated by Django 5.2 on 2026-10-19 08:28
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0008_version_catalogo_fragmentos'),
+    ]
+
+    operations = [
+        migrations.DeleteModel(
+            name='VersionCatalogo',
+        ),
+    ]
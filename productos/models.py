@@ -1,16 +1,32 @@
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.db.models.functions import Lower
 from django.core.validators import MinValueValidator
 
+from backend.indices import IndiceBusqueda
+
 
 class Categoria(models.Model):
     nombre = models.CharField(max_length=100, unique=True)
     is_active = models.BooleanField(default=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                Lower("nombre"), name="categoria_nombre_lower_unico"
+            )
+        ]
+
 
 class Genero(models.Model):
     nombre = models.CharField(max_length=100, unique=True)
     is_active = models.BooleanField(default=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(Lower("nombre"), name="genero_nombre_lower_unico")
+        ]
+
     def __str__(self):
         return self.nombre
 
@@ -19,6 +35,13 @@ class Editorial(models.Model):
     nombre = models.CharField(max_length=100, unique=True)
     is_active = models.BooleanField(default=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                Lower("nombre"), name="editorial_nombre_lower_unico"
+            )
+        ]
+
     def __str__(self):
         return self.nombre
 
@@ -27,6 +50,11 @@ class Autor(models.Model):
     nombre = models.CharField(max_length=100, unique=True)
     is_active = models.BooleanField(default=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(Lower("nombre"), name="autor_nombre_lower_unico")
+        ]
+
     def __str__(self):
         return self.nombre
 
@@ -46,6 +74,9 @@ class Oferta(models.Model):
 
     class Meta:
         ordering = ["-fecha_inicio"]
+        constraints = [
+            models.UniqueConstraint(Lower("nombre"), name="oferta_nombre_lower_unico")
+        ]
 
     def __str__(self):
         return f"{self.nombre} - Descuento: ${self.descuento}"
@@ -58,6 +89,13 @@ class Oferta(models.Model):
         return self.is_active and self.fecha_inicio <= now <= self.fecha_fin
 
 
+class ProductoManager(models.Manager):
+    def get_queryset(self):
+        # El vector de búsqueda solo lo lee la búsqueda; así no viaja en cada
+        # consulta ni lo pisa un save() (solo guarda los campos cargados)
+        return super().get_queryset().defer("busqueda")
+
+
 class Producto(models.Model):
     nombre = models.CharField(max_length=100, unique=True)
     descripcion = models.TextField()
@@ -80,10 +118,66 @@ class Producto(models.Model):
         related_name="productos",
     )
     is_active = models.BooleanField(default=True)
+    # Lo mantiene productos/busqueda.py (solo en PostgreSQL)
+    busqueda = SearchVectorField(null=True, editable=False)
+
+    objects = ProductoManager()
+
+    class Meta:
+        indexes = [
+            IndiceBusqueda(fields=["busqueda"], name="producto_busqueda_gin"),
+            # Filtro por rango de precio del listado (las FK ya tienen índice)
+            models.Index(
+                fields=["is_active", "precio"], name="producto_activo_precio_idx"
+            ),
+        ]
 
     def __str__(self):
         return self.nombre
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        producto = super().from_db(db, field_names, values)
+        producto._cargado = producto.valores_cargados()
+        return producto
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # Después de las señales post_save, que comparan con lo anterior
+        self._cargado = self.valores_cargados()
+
+    def valores_cargados(self):
+        """
+        Valores actuales de los campos cargados. from_db() y cada save() los
+        guardan en _cargado, para saber qué campos cambió el save() siguiente
+        """
+        return {
+            campo.attname: self.__dict__[campo.attname]
+            for campo in self._meta.concrete_fields
+            if campo.attname in self.__dict__
+        }
+
+    def campos_cambiados(self, update_fields=None):
+        """
+        attnames de los campos que cambió el save() en curso (para las
+        señales post_save), comparando con los valores que se leyeron de la
+        base; None si no se sabe (la instancia no se leyó y no se indicó
+        update_fields)
+        """
+        cargado = getattr(self, "_cargado", None)
+        if update_fields is None:
+            campos = None
+        else:
+            campos = {self._meta.get_field(campo).attname for campo in update_fields}
+        if cargado is None:
+            return campos
+        cambiados = {
+            campo
+            for campo, valor in self.valores_cargados().items()
+            if campo not in cargado or cargado[campo] != valor
+        }
+        return cambiados if campos is None else cambiados & campos
+
     def get_precio_con_descuento(self):
         """Calcula el precio con descuento si tiene oferta vigente"""
         if self.oferta and self.oferta.is_vigente():
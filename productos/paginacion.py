@@ -0,0 +1,9 @@
+from rest_framework.pagination import PageNumberPagination
+
+
+class BusquedaPagination(PageNumberPagination):
+    # Los resultados van por relevancia, no por una clave estable, así que se
+    # pagina por número de página
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
@@ -3,67 +3,61 @@ from .models import Producto, Categoria, Autor, Genero, Editorial, Oferta
 from rest_framework.validators import UniqueTogetherValidator
 from django.utils import timezone
 
+from backend.validators import NombreUnicoSerializerMixin, NombreUnicoValidator
 
-class CategoriaSerializer(serializers.ModelSerializer):
+from . import lookups
+from .lookups import PrimaryKeyCacheadoField, serializer_cacheado
+
+
+class CategoriaSerializer(NombreUnicoSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Categoria
         fields = "__all__"
-
-    def validate_nombre(self, value):
-        categoria_id = self.instance.id if self.instance else None
-        if (
-            Categoria.objects.filter(nombre__iexact=value)
-            .exclude(id=categoria_id)
-            .exists()
-        ):
-            raise serializers.ValidationError("Ya existe una categoría con ese nombre.")
-        return value
+        extra_kwargs = {
+            "nombre": {
+                "validators": [
+                    NombreUnicoValidator("Ya existe una categoría con ese nombre.")
+                ]
+            }
+        }
 
 
-class AutorSerializer(serializers.ModelSerializer):
+class AutorSerializer(NombreUnicoSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Autor
         fields = "__all__"
-
-    def validate_nombre(self, value):
-        # Si estamos actualizando, ignoramos el autor actual en la búsqueda
-        autor_id = self.instance.id if self.instance else None
-        if Autor.objects.filter(nombre__iexact=value).exclude(id=autor_id).exists():
-            raise serializers.ValidationError(
-                "Este nombre de autor ya está registrado."
-            )
-        return value
+        extra_kwargs = {
+            "nombre": {
+                "validators": [
+                    NombreUnicoValidator("Este nombre de autor ya está registrado.")
+                ]
+            }
+        }
 
 
-class GeneroSerializer(serializers.ModelSerializer):
+class GeneroSerializer(NombreUnicoSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Genero
         fields = "__all__"
+        extra_kwargs = {
+            "nombre": {"validators": [NombreUnicoValidator("Este género ya existe.")]}
+        }
 
-    def validate_nombre(self, value):
-        genero_id = self.instance.id if self.instance else None
-        if Genero.objects.filter(nombre__iexact=value).exclude(id=genero_id).exists():
-            raise serializers.ValidationError("Este género ya existe.")
-        return value
 
-
-class EditorialSerializer(serializers.ModelSerializer):
+class EditorialSerializer(NombreUnicoSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Editorial
         fields = "__all__"
-
-    def validate_nombre(self, value):
-        editorial_id = self.instance.id if self.instance else None
-        if (
-            Editorial.objects.filter(nombre__iexact=value)
-            .exclude(id=editorial_id)
-            .exists()
-        ):
-            raise serializers.ValidationError("Esta editorial ya está registrada.")
-        return value
+        extra_kwargs = {
+            "nombre": {
+                "validators": [
+                    NombreUnicoValidator("Esta editorial ya está registrada.")
+                ]
+            }
+        }
 
 
-class OfertaSerializer(serializers.ModelSerializer):
+class OfertaSerializer(NombreUnicoSerializerMixin, serializers.ModelSerializer):
     productos_count = serializers.SerializerMethodField()
     is_vigente = serializers.SerializerMethodField()
 
@@ -80,6 +74,13 @@ class OfertaSerializer(serializers.ModelSerializer):
             "productos_count",
             "is_vigente",
         ]
+        extra_kwargs = {
+            "nombre": {
+                "validators": [
+                    NombreUnicoValidator("Ya existe una oferta con ese nombre.")
+                ]
+            }
+        }
 
     def get_productos_count(self, obj):
         """Cuenta cuántos productos están asociados a esta oferta"""
@@ -89,13 +90,6 @@ class OfertaSerializer(serializers.ModelSerializer):
         """Indica si la oferta está vigente actualmente"""
         return obj.is_vigente()
 
-    def validate_nombre(self, value):
-        """Valida que el nombre de la oferta sea único"""
-        oferta_id = self.instance.id if self.instance else None
-        if Oferta.objects.filter(nombre__iexact=value).exclude(id=oferta_id).exists():
-            raise serializers.ValidationError("Ya existe una oferta con ese nombre.")
-        return value
-
     def validate(self, data):
         """Validaciones personalizadas para la oferta"""
         fecha_inicio = data.get("fecha_inicio")
@@ -116,33 +110,38 @@ class OfertaSerializer(serializers.ModelSerializer):
 
 
 class ProductoSerializer(serializers.ModelSerializer):
-    # Incluir los objetos completos para las relaciones
-    categoria = CategoriaSerializer(read_only=True)
-    genero = GeneroSerializer(read_only=True)
-    autor = AutorSerializer(read_only=True)
-    editorial = EditorialSerializer(read_only=True)
+    # Incluir los objetos completos para las relaciones (las tablas de
+    # referencia salen de la cache de lookups.py)
+    categoria = serializer_cacheado(CategoriaSerializer, lookups.categorias)(
+        read_only=True
+    )
+    genero = serializer_cacheado(GeneroSerializer, lookups.generos)(read_only=True)
+    autor = serializer_cacheado(AutorSerializer, lookups.autores)(read_only=True)
+    editorial = serializer_cacheado(EditorialSerializer, lookups.editoriales)(
+        read_only=True
+    )
     oferta = OfertaSerializer(read_only=True)
 
     # Campos para escritura (solo IDs)
-    categoria_id = serializers.PrimaryKeyRelatedField(
-        queryset=Categoria.objects.all(), source="categoria", write_only=True
+    categoria_id = PrimaryKeyCacheadoField(
+        lookups.categorias, source="categoria", write_only=True
     )
-    genero_id = serializers.PrimaryKeyRelatedField(
-        queryset=Genero.objects.all(),
+    genero_id = PrimaryKeyCacheadoField(
+        lookups.generos,
         source="genero",
         write_only=True,
         required=False,
         allow_null=True,
     )
-    autor_id = serializers.PrimaryKeyRelatedField(
-        queryset=Autor.objects.all(),
+    autor_id = PrimaryKeyCacheadoField(
+        lookups.autores,
         source="autor",
         write_only=True,
         required=False,
         allow_null=True,
     )
-    editorial_id = serializers.PrimaryKeyRelatedField(
-        queryset=Editorial.objects.all(),
+    editorial_id = PrimaryKeyCacheadoField(
+        lookups.editoriales,
         source="editorial",
         write_only=True,
         required=False,
@@ -0,0 +1,87 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .busqueda import CAMPOS_VECTOR, actualizar_vectores
+from .catalogo import invalidar_catalogo
+from .models import Autor, Categoria, Editorial, Genero, Oferta, Producto
+
+ENTIDAD_POR_MODELO = {
+    Categoria: "categoria",
+    Genero: "genero",
+    Autor: "autor",
+    Editorial: "editorial",
+}
+
+
+@receiver(post_save, sender=Categoria)
+@receiver(post_delete, sender=Categoria)
+@receiver(post_save, sender=Genero)
+@receiver(post_delete, sender=Genero)
+@receiver(post_save, sender=Autor)
+@receiver(post_delete, sender=Autor)
+@receiver(post_save, sender=Editorial)
+@receiver(post_delete, sender=Editorial)
+def invalidar_por_cambio_en_catalogo(sender, **kwargs):
+    invalidar_catalogo(ENTIDAD_POR_MODELO[sender])
+
+
+@receiver(post_save, sender=Oferta)
+@receiver(post_delete, sender=Oferta)
+def invalidar_por_cambio_de_oferta(sender, instance, **kwargs):
+    invalidar_catalogo("oferta", ids=[instance.pk])
+
+
+@receiver(post_save, sender=Producto)
+@receiver(post_delete, sender=Producto)
+def invalidar_por_cambio_de_producto(
+    sender, instance, created=False, update_fields=None, **kwargs
+):
+    """
+    Publica el producto con su id: como "stock" si solo cambió el stock (lo
+    que hace cada compra; no afecta a búsqueda, facetas ni autocompletado) y
+    como "producto" si no. Si el producto entra o sale de una oferta, o deja
+    de estar activo, publica también esas ofertas (su cantidad de productos
+    aparece en los documentos de sus otros productos).
+    """
+    eliminado = kwargs["signal"] is post_delete
+    anterior = getattr(instance, "_cargado", None) or {}
+    if created or eliminado:
+        cambiados = None
+    else:
+        cambiados = instance.campos_cambiados(update_fields)
+
+    if cambiados == {"stock"}:
+        invalidar_catalogo("stock", ids=[instance.pk])
+    elif cambiados is None or cambiados:
+        invalidar_catalogo("producto", ids=[instance.pk])
+
+    if cambiados is None or cambiados & {"oferta_id", "is_active"}:
+        if not created and "oferta_id" not in anterior:
+            # No se sabe en qué oferta estaba
+            invalidar_catalogo("oferta")
+        else:
+            ofertas = {instance.oferta_id, anterior.get("oferta_id")} - {None}
+            if ofertas:
+                invalidar_catalogo("oferta", ids=ofertas)
+
+
+@receiver(post_save, sender=Producto)
+def actualizar_busqueda_de_producto(
+    sender, instance, created, update_fields=None, **kwargs
+):
+    # Solo si cambió algo de lo que forma el vector (no, por ejemplo, el
+    # stock que descuenta cada compra)
+    cambiados = None if created else instance.campos_cambiados(update_fields)
+    if cambiados is None or cambiados & CAMPOS_VECTOR:
+        actualizar_vectores(Producto.objects.filter(pk=instance.pk))
+
+
+@receiver(post_save, sender=Genero)
+@receiver(post_save, sender=Autor)
+@receiver(post_save, sender=Editorial)
+def actualizar_busqueda_por_nombre(sender, instance, created, **kwargs):
+    # Los productos llevan el nombre de su autor, editorial y género en el
+    # vector de búsqueda
+    if not created:
+        campo = ENTIDAD_POR_MODELO[sender]
+        actualizar_vectores(Producto.objects.filter(**{campo: instance}))
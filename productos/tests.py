@@ -1,3 +1,827 @@
-from django.test import TestCase
+import io
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from backend import invalidacion
+from usuarios.models import Permiso, Rol, Usuario
+from usuarios.serializers import PermisoSerializer
+
+from . import catalogo, lookups
+from .autocompletar import SECCIONES, normalizar
+from .busqueda import indice_invertido, palabras
+from .catalogo import ENTIDADES
+from .facetas import facetas, leer_filtros
+from .documentos import CacheDocumentos, cache_documentos
+from .models import (
+    Autor,
+    Categoria,
+    Editorial,
+    Genero,
+    Oferta,
+    Producto,
+)
+from .serializers import (
+    AutorSerializer,
+    CategoriaSerializer,
+    GeneroSerializer,
+    ProductoSerializer,
+)
+
+PERMISOS_ADMIN = [
+    "ver_productos",
+    "crear_productos",
+    "editar_productos",
+    "ver_categorias",
+    "crear_categorias",
+    "ver_autores",
+    "ver_generos",
+    "ver_editoriales",
+    "ver_ofertas",
+    "ver_usuarios",
+    "ver_reportes",
+]
+
+
+def crear_catalogo(cantidad=5):
+    """
+    Catálogo con categoría, autor, género, editorial y una oferta vigente en
+    los productos impares; devuelve (cliente autenticado como admin, productos)
+    """
+    rol = Rol.objects.create(nombre="Administrador")
+    for nombre in PERMISOS_ADMIN:
+        rol.permisos.add(Permiso.objects.get_or_create(nombre=nombre)[0])
+    admin = Usuario.objects.create_user(
+        "admin@example.com",
+        "clave-segura",
+        nombre_completo="Admin",
+        rol=rol,
+        is_staff=True,
+    )
+
+    categoria = Categoria.objects.create(nombre="Libros")
+    autor = Autor.objects.create(nombre="Gabriel García Márquez")
+    genero = Genero.objects.create(nombre="Novela")
+    editorial = Editorial.objects.create(nombre="Sudamericana")
+    oferta = Oferta.objects.create(
+        nombre="Invierno",
+        descuento=Decimal("10"),
+        fecha_inicio=timezone.now() - timedelta(days=1),
+        fecha_fin=timezone.now() + timedelta(days=1),
+    )
+    productos = [
+        Producto.objects.create(
+            nombre=f"Cien años de soledad {i}",
+            descripcion="Edición de bolsillo",
+            stock=100,
+            imagen="https://example.com/libro.png",
+            precio=Decimal("10.00") + i,
+            categoria=categoria,
+            autor=autor,
+            genero=genero,
+            editorial=editorial,
+            oferta=oferta if i % 2 else None,
+        )
+        for i in range(cantidad)
+    ]
+
+    cliente = APIClient()
+    cliente.force_authenticate(admin)
+    return cliente, productos
+
+
+class NombreUnicoTests(TestCase):
+    def test_nombre_repetido_con_otras_mayusculas(self):
+        Categoria.objects.create(nombre="Libros")
+
+        serializer = CategoriaSerializer(data={"nombre": "LIBROS"})
+        self.assertFalse(serializer.is_valid())
+        self.assertEqual(serializer.errors["nombre"][0].code, "unique")
+
+        self.assertTrue(CategoriaSerializer(data={"nombre": "Revistas"}).is_valid())
+        self.assertTrue(GeneroSerializer(data={"nombre": "libros"}).is_valid())
+
+    def test_renombrar_cambiando_solo_mayusculas(self):
+        categoria = Categoria.objects.create(nombre="Libros")
+
+        serializer = CategoriaSerializer(categoria, data={"nombre": "LIBROS"})
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        serializer.save()
+
+        categoria.refresh_from_db()
+        self.assertEqual(categoria.nombre, "LIBROS")
+
+    def test_carrera_entre_validar_y_guardar(self):
+        serializer = CategoriaSerializer(data={"nombre": "Revistas"})
+        self.assertTrue(serializer.is_valid())
+        # Otra petición guarda el mismo nombre después de la validación
+        Categoria.objects.create(nombre="revistas")
+
+        with self.assertRaises(ValidationError) as contexto:
+            serializer.save()
+        self.assertIn("nombre", contexto.exception.detail)
+        self.assertEqual(Categoria.objects.count(), 1)
+
+    def test_cualquier_restriccion_unica_del_nombre(self):
+        serializer = CategoriaSerializer(data={"nombre": "Libros"})
+        self.assertTrue(serializer.is_valid())
+
+        def guardar_con_error(mensaje):
+            def guardar():
+                raise IntegrityError(mensaje)
+
+            return lambda: serializer._guardar(guardar)
+
+        for mensaje in (
+            # La restricción unique=True de la columna, en SQLite y PostgreSQL
+            "UNIQUE constraint failed: productos_categoria.nombre",
+            'duplicate key value violates unique constraint "productos_categoria_'
+            'nombre_key"\nDETAIL:  Key (nombre)=(Libros) already exists.',
+            "UNIQUE constraint failed: index 'categoria_nombre_lower_unico'",
+        ):
+            with self.subTest(mensaje=mensaje):
+                with self.assertRaises(ValidationError) as contexto:
+                    guardar_con_error(mensaje)()
+                self.assertIn("nombre", contexto.exception.detail)
+
+        for mensaje in (
+            "NOT NULL constraint failed: productos_categoria.nombre",
+            "UNIQUE constraint failed: productos_categoria.otro",
+        ):
+            with self.subTest(mensaje=mensaje):
+                self.assertRaises(IntegrityError, guardar_con_error(mensaje))
+
+    def test_lote_con_nombres_repetidos(self):
+        serializer = PermisoSerializer(
+            data=[{"nombre": "ver_reportes"}, {"nombre": "VER_REPORTES"}], many=True
+        )
+        self.assertTrue(serializer.is_valid())
+
+        with self.assertRaises(ValidationError):
+            serializer.save()
+        self.assertEqual(
+            Permiso.objects.filter(nombre__iexact="ver_reportes").count(), 1
+        )
+
+
+class GetCondicionalTests(TestCase):
+    def setUp(self):
+        self.cliente, self.productos = crear_catalogo(cantidad=20)
+
+    def test_304_si_nada_cambio(self):
+        respuesta = self.cliente.get("/Libreria/productos/")
+        etag = respuesta["ETag"]
+        self.assertIn("no-cache", respuesta["Cache-Control"])
+        self.assertIn("Authorization", respuesta["Vary"])
+
+        with self.assertNumQueries(0):
+            repetida = self.cliente.get("/Libreria/productos/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(repetida.status_code, 304)
+        self.assertEqual(repetida.content, b"")
+        self.assertEqual(repetida["ETag"], etag)
+
+        # Otra URL u otro formato es otra representación
+        detalle = self.cliente.get(f"/Libreria/productos/{self.productos[0].pk}/")
+        self.assertNotEqual(detalle["ETag"], etag)
+        categorias = self.cliente.get("/Libreria/categorias/")
+        self.assertEqual(
+            self.cliente.get(
+                "/Libreria/categorias/", HTTP_IF_NONE_MATCH=categorias["ETag"]
+            ).status_code,
+            304,
+        )
+
+    def test_una_escritura_cambia_el_etag(self):
+        etag = self.cliente.get("/Libreria/productos/")["ETag"]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            producto = self.productos[0]
+            producto.stock = 3
+            producto.save()
+
+        respuesta = self.cliente.get("/Libreria/productos/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertNotEqual(respuesta["ETag"], etag)
+
+    def test_cada_vista_depende_de_sus_entidades(self):
+        categorias = self.cliente.get("/Libreria/categorias/")["ETag"]
+        ofertas = self.cliente.get("/Libreria/ofertas/")["ETag"]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            producto = self.productos[0]
+            producto.stock = 3
+            producto.save()
+
+        # Un producto no cambia las categorías, pero sí productos_count
+        self.assertEqual(self.cliente.get("/Libreria/categorias/")["ETag"], categorias)
+        self.assertNotEqual(self.cliente.get("/Libreria/ofertas/")["ETag"], ofertas)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Categoria.objects.create(nombre="Revistas")
+        self.assertNotEqual(
+            self.cliente.get("/Libreria/categorias/")["ETag"], categorias
+        )
+
+    def test_el_etag_cambia_al_empezar_o_terminar_una_oferta(self):
+        etag = self.cliente.get("/Libreria/productos/")["ETag"]
+
+        pasado_manana = timezone.now() + timedelta(days=2)
+        with mock.patch("productos.catalogo.timezone.now", return_value=pasado_manana):
+            respuesta = self.cliente.get(
+                "/Libreria/productos/", HTTP_IF_NONE_MATCH=etag
+            )
+        self.assertEqual(respuesta.status_code, 200)
+
+    def test_304_solo_despues_de_los_permisos(self):
+        etag = self.cliente.get("/Libreria/categorias/")["ETag"]
+
+        respuesta = APIClient().get("/Libreria/categorias/", HTTP_IF_NONE_MATCH=etag)
+        self.assertIn(respuesta.status_code, (401, 403))
+
+
+@override_settings(INVALIDACION_INTERVALO_SONDEO=3600)
+class LimitesDeOfertasTests(TestCase):
+    def setUp(self):
+        invalidacion.sincronizar(forzar=True)
+        self.avisos = []
+        invalidacion.suscribir(self.avisos.append, ENTIDADES)
+        self.addCleanup(invalidacion._suscriptores.pop)
+
+    def test_aviso_al_empezar_una_oferta(self):
+        inicio = timezone.now() + timedelta(hours=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            Oferta.objects.create(
+                nombre="Primavera",
+                descuento=Decimal("5"),
+                fecha_inicio=inicio,
+                fecha_fin=inicio + timedelta(days=1),
+            )
+        self.avisos.clear()
+
+        invalidacion.sincronizar()
+        self.assertEqual(self.avisos, [])
+
+        despues = inicio + timedelta(minutes=1)
+        with mock.patch.object(catalogo.timezone, "now", return_value=despues):
+            invalidacion.sincronizar()
+        self.assertEqual(self.avisos, [{"oferta": None}])
+
+
+@override_settings(INVALIDACION_INTERVALO_SONDEO=3600)
+class CacheDocumentosTests(TestCase):
+    def setUp(self):
+        self.cliente, self.productos = crear_catalogo()
+        invalidacion.sincronizar(forzar=True)
+        cache_documentos.limpiar()
+
+    def esperado(self):
+        productos = Producto.objects.filter(is_active=True)
+        return JSONRenderer().render(ProductoSerializer(productos, many=True).data)
+
+    def get(self, url):
+        return self.cliente.get(url, HTTP_ACCEPT="application/json")
+
+    def test_listado_y_detalle_iguales_al_serializer(self):
+        respuesta = self.get("/Libreria/productos/")
+        self.assertEqual(respuesta.content, self.esperado())
+        self.assertGreater(cache_documentos.bytes, 0)
+
+        repetida = self.get("/Libreria/productos/")
+        self.assertEqual(repetida.content, respuesta.content)
+
+        producto = self.productos[1]
+        detalle = self.get(f"/Libreria/productos/{producto.pk}/")
+        self.assertEqual(
+            detalle.json(),
+            ProductoSerializer(Producto.objects.get(pk=producto.pk)).data,
+        )
+        self.assertEqual(self.get("/Libreria/productos/9999/").status_code, 404)
+
+    def test_un_cambio_descarta_los_documentos(self):
+        self.get("/Libreria/productos/")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            producto = self.productos[0]
+            producto.nombre = "El amor en los tiempos del cólera"
+            producto.save()
+
+        respuesta = self.get("/Libreria/productos/")
+        self.assertIn("cólera".encode(), respuesta.content)
+        self.assertEqual(respuesta.content, self.esperado())
+
+    def test_una_compra_descarta_solo_su_producto(self):
+        self.get("/Libreria/productos/")
+        ids = [producto.pk for producto in self.productos]
+        facetas.motor()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            # Como Carrito.convertir_a_pedido: el producto se lee y se guarda
+            producto = Producto.objects.get(pk=ids[0])
+            producto.stock -= 1
+            producto.save()
+
+        self.assertEqual(set(cache_documentos.obtener_varios(ids)), set(ids[1:]))
+        # El stock no cambia las facetas
+        self.assertFalse(facetas.sucio)
+        respuesta = self.get("/Libreria/productos/")
+        self.assertEqual(respuesta.content, self.esperado())
+
+    def test_cambio_de_oferta_descarta_los_productos_de_la_oferta(self):
+        self.get("/Libreria/productos/")
+        ids = [producto.pk for producto in self.productos]
+
+        # El producto 2 entra en la oferta de los impares: cambia la cantidad
+        # de productos que muestran los documentos de todos ellos
+        with self.captureOnCommitCallbacks(execute=True):
+            producto = Producto.objects.get(pk=ids[2])
+            producto.oferta = self.productos[1].oferta
+            producto.save()
+
+        self.assertEqual(set(cache_documentos.obtener_varios(ids)), {ids[0], ids[4]})
+        self.assertEqual(self.get("/Libreria/productos/").content, self.esperado())
+
+        # Lo mismo con el update() masivo de la vista de ofertas
+        oferta = self.productos[1].oferta
+        with self.captureOnCommitCallbacks(execute=True):
+            Rol.objects.get(nombre="Administrador").permisos.add(
+                Permiso.objects.create(nombre="editar_ofertas")
+            )
+        with self.captureOnCommitCallbacks(execute=True):
+            respuesta = self.cliente.post(
+                f"/Libreria/ofertas/{oferta.pk}/quitar-productos/",
+                {"productos_ids": [ids[1]]},
+                format="json",
+            )
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(set(cache_documentos.obtener_varios(ids)), {ids[0], ids[4]})
+        self.assertEqual(self.get("/Libreria/productos/").content, self.esperado())
+
+    def test_fin_de_oferta_sin_escrituras(self):
+        antes = self.get("/Libreria/productos/").content
+
+        pasado_manana = timezone.now() + timedelta(days=2)
+        with mock.patch("django.utils.timezone.now", return_value=pasado_manana):
+            despues = self.get("/Libreria/productos/").content
+            self.assertEqual(despues, self.esperado())
+        self.assertNotEqual(despues, antes)
+
+    def test_generacion_vieja_no_se_guarda(self):
+        cache = CacheDocumentos(maximo_bytes=1000)
+        generacion = cache.generacion
+        cache.limpiar()
+
+        cache.guardar_varios({1: b"{}"}, generacion)
+        self.assertEqual(cache.obtener_varios([1]), {})
+
+    def test_lru_acotado_por_bytes(self):
+        cache = CacheDocumentos(maximo_bytes=10)
+        cache.guardar_varios({1: b"aaaa", 2: b"bbbb"}, cache.generacion)
+        cache.obtener_varios([1])
+        cache.guardar_varios({3: b"cccc"}, cache.generacion)
+
+        self.assertEqual(set(cache.obtener_varios([1, 2, 3])), {1, 3})
+        self.assertEqual(cache.bytes, 8)
+
+
+@override_settings(INVALIDACION_INTERVALO_SONDEO=3600)
+class TablasCacheadasTests(TestCase):
+    def setUp(self):
+        self.cliente, self.productos = crear_catalogo()
+        invalidacion.sincronizar(forzar=True)
+        for tabla in (
+            lookups.categorias,
+            lookups.autores,
+            lookups.generos,
+            lookups.editoriales,
+        ):
+            tabla.limpiar()
+        self.categoria = Categoria.objects.get()
+        self.datos = {
+            "nombre": "Crónica de una muerte anunciada",
+            "descripcion": "Tapa dura",
+            "stock": 1,
+            "imagen": "https://example.com/cronica.png",
+            "precio": "15.00",
+            "categoria_id": self.categoria.pk,
+        }
+
+    def get(self, url):
+        return self.cliente.get(url, HTTP_ACCEPT="application/json")
+
+    def test_relaciones_anidadas_desde_la_cache(self):
+        producto = Producto.objects.get(pk=self.productos[0].pk)
+        datos = ProductoSerializer(producto).data
+
+        self.assertEqual(
+            datos["categoria"], CategoriaSerializer(producto.categoria).data
+        )
+        self.assertEqual(datos["autor"], AutorSerializer(producto.autor).data)
+
+        productos = list(Producto.objects.all())
+        with CaptureQueriesContext(connection) as consultas:
+            ProductoSerializer(productos, many=True).data
+        # Con las tablas ya cargadas no se consultan las relaciones
+        for consulta in consultas.captured_queries:
+            for tabla in ("categoria", "autor", "genero", "editorial"):
+                self.assertNotIn(f'"productos_{tabla}"', consulta["sql"])
+
+    def test_listado_y_detalle_de_categorias(self):
+        self.assertEqual(
+            self.get("/Libreria/categorias/").json(),
+            [CategoriaSerializer(self.categoria).data],
+        )
+        detalle = self.get(f"/Libreria/categorias/{self.categoria.pk}/")
+        self.assertEqual(detalle.json()["nombre"], "Libros")
+        self.assertEqual(self.get("/Libreria/categorias/999/").status_code, 404)
+        self.assertEqual(self.get("/Libreria/categorias/abc/").status_code, 404)
+
+    def test_validacion_de_ids(self):
+        respuesta = self.cliente.post("/Libreria/productos/", self.datos, format="json")
+        self.assertEqual(respuesta.status_code, 201, respuesta.content)
+
+        for invalido in (999, "abc", True):
+            with self.subTest(categoria_id=invalido):
+                respuesta = self.cliente.post(
+                    "/Libreria/productos/",
+                    {**self.datos, "nombre": "Otro", "categoria_id": invalido},
+                    format="json",
+                )
+                self.assertEqual(respuesta.status_code, 400)
+                self.assertIn("categoria_id", respuesta.json())
+
+    def test_fila_creada_por_otro_proceso(self):
+        lookups.categorias.filas()
+        # Sin publicar: este proceso todavía no se enteró
+        nueva = Categoria.objects.create(nombre="Ensayo")
+
+        respuesta = self.cliente.post(
+            "/Libreria/productos/",
+            {**self.datos, "categoria_id": nueva.pk},
+            format="json",
+        )
+        self.assertEqual(respuesta.status_code, 201, respuesta.content)
+        self.assertEqual(respuesta.json()["categoria"]["nombre"], "Ensayo")
+
+    def test_un_cambio_descarta_la_tabla(self):
+        self.get("/Libreria/categorias/")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.categoria.nombre = "Literatura"
+            self.categoria.save()
+
+        self.assertEqual(
+            self.get("/Libreria/categorias/").json()[0]["nombre"], "Literatura"
+        )
+        detalle = self.get(f"/Libreria/productos/{self.productos[0].pk}/").json()
+        self.assertEqual(detalle["categoria"]["nombre"], "Literatura")
+
+
+@override_settings(INVALIDACION_INTERVALO_SONDEO=3600)
+class BusquedaTests(TestCase):
+    def setUp(self):
+        self.cliente, self.productos = crear_catalogo()
+        invalidacion.sincronizar(forzar=True)
+        indice_invertido.limpiar()
+
+    def buscar(self, **parametros):
+        return self.cliente.get(
+            "/Libreria/productos/buscar/", parametros, HTTP_ACCEPT="application/json"
+        )
+
+    def ids(self, respuesta):
+        return [producto["id"] for producto in respuesta.json()["results"]]
+
+    def test_palabras_sin_tildes_ni_palabras_vacias(self):
+        self.assertEqual(
+            palabras("Cien Años de Soledad, García-Márquez"),
+            ["cien", "anos", "soledad", "garcia", "marquez"],
+        )
+
+    def test_todas_las_palabras_por_relevancia(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.productos[2].descripcion = "Una historia de amor"
+            self.productos[2].save()
+            self.productos[3].nombre = "El amor en los tiempos del cólera"
+            self.productos[3].save()
+
+        # El nombre pesa más que la descripción
+        respuesta = self.buscar(q="amor")
+        self.assertEqual(
+            self.ids(respuesta), [self.productos[3].pk, self.productos[2].pk]
+        )
+        self.assertEqual(respuesta.json()["count"], 2)
+        self.assertEqual(self.ids(self.buscar(q="amor colera")), [self.productos[3].pk])
+        self.assertEqual(self.buscar(q="amor zzz").json()["count"], 0)
+
+    def test_el_vector_solo_se_recalcula_si_cambia_lo_indexado(self):
+        producto = Producto.objects.get(pk=self.productos[0].pk)
+        with mock.patch("productos.signals.actualizar_vectores") as actualizar:
+            producto.stock -= 1
+            producto.save()
+            producto.precio += 1
+            producto.save(update_fields=["precio"])
+            self.assertFalse(actualizar.called)
+
+            producto.descripcion = "Otra edición"
+            producto.save()
+            producto.autor = None
+            producto.save(update_fields=["autor"])
+            self.assertEqual(actualizar.call_count, 2)
+
+            # Sin saber qué se leyó, se recalcula
+            Producto(
+                pk=producto.pk,
+                **{
+                    campo: getattr(producto, campo)
+                    for campo in ("nombre", "descripcion", "stock", "imagen", "precio")
+                },
+            ).save()
+            self.assertEqual(actualizar.call_count, 3)
+
+    def test_busca_por_autor_y_pagina(self):
+        respuesta = self.buscar(q="garcia cien", page_size=2)
+        datos = respuesta.json()
+        self.assertEqual(datos["count"], 5)
+        self.assertEqual(len(datos["results"]), 2)
+
+        siguiente = self.cliente.get(datos["next"], HTTP_ACCEPT="application/json")
+        self.assertEqual(len(siguiente.json()["results"]), 2)
+        self.assertFalse(set(self.ids(respuesta)) & set(self.ids(siguiente)))
+
+    def test_productos_inactivos_y_cambios_de_autor(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.productos[0].is_active = False
+            self.productos[0].save()
+            autor = Autor.objects.get()
+            autor.nombre = "Julio Cortázar"
+            autor.save()
+
+        self.assertNotIn(self.productos[0].pk, self.ids(self.buscar(q="soledad")))
+        self.assertEqual(self.buscar(q="garcia").json()["count"], 0)
+        self.assertEqual(self.buscar(q="cortazar").json()["count"], 4)
+
+    def test_sin_texto(self):
+        self.assertEqual(self.buscar().status_code, 400)
+        self.assertEqual(self.buscar(q="   ").status_code, 400)
+        self.assertEqual(
+            self.buscar(q="de la").json(),
+            {"count": 0, "next": None, "previous": None, "results": []},
+        )
+
+    def test_benchmark(self):
+        salida = io.StringIO()
+        call_command("benchmark_busqueda", consultas=2, stdout=salida)
+        self.assertIn("1 palabra(s)", salida.getvalue())
+        self.assertIn("autocompletar", salida.getvalue())
+
+
+@override_settings(INVALIDACION_INTERVALO_SONDEO=3600)
+class AutocompletarTests(TransactionTestCase):
+    # La renovación corre en otro hilo, con otra conexión: los datos de cada
+    # test tienen que estar confirmados
+
+    def setUp(self):
+        from pedidos.models import DetallePedido, Pedido
+
+        self.cliente, self.productos = crear_catalogo()
+        invalidacion.sincronizar(forzar=True)
+        for seccion in SECCIONES.values():
+            seccion._estado = None
+            seccion.ensuciar()
+        self.addCleanup(self.esperar_renovacion)
+
+        # El último producto es el más vendido
+        pedido = Pedido.objects.create(usuario=Usuario.objects.get(), total=0)
+        DetallePedido.objects.create(
+            pedido=pedido,
+            producto=self.productos[-1],
+            cantidad=3,
+            precio_unitario=self.productos[-1].precio,
+        )
+
+    def autocompletar(self, **parametros):
+        return self.cliente.get(
+            "/Libreria/productos/autocompletar/",
+            parametros,
+            HTTP_ACCEPT="application/json",
+        )
+
+    def esperar_renovacion(self):
+        for seccion in SECCIONES.values():
+            with seccion._lock:
+                pass
+
+    def test_normalizar(self):
+        self.assertEqual(normalizar("  García-Márquez, Ñandú "), "garcia marquez nandu")
+
+    def test_prefijo_de_cualquier_palabra(self):
+        datos = self.autocompletar(q="marq").json()
+        self.assertEqual(
+            datos["autores"],
+            [{"id": Autor.objects.get().pk, "nombre": "Gabriel García Márquez"}],
+        )
+        self.assertEqual(datos["editoriales"], [])
+
+        datos = self.autocompletar(q="Ñand", secciones="editoriales").json()
+        self.assertEqual(datos, {"editoriales": []})
+        Editorial.objects.create(nombre="Ñandú Ediciones")
+        self.autocompletar(q="nand", secciones="editoriales")
+        self.esperar_renovacion()
+        datos = self.autocompletar(q="nand", secciones="editoriales").json()
+        self.assertEqual(datos["editoriales"][0]["nombre"], "Ñandú Ediciones")
+
+    def test_mas_vendidos_primero(self):
+        datos = self.autocompletar(q="cien a", limite=3, secciones="productos").json()
+        self.assertEqual(list(datos), ["productos"])
+        self.assertEqual(len(datos["productos"]), 3)
+        self.assertEqual(datos["productos"][0]["id"], self.productos[-1].pk)
+
+    def test_responde_con_el_estado_anterior_mientras_renueva(self):
+        seccion = SECCIONES["productos"]
+        self.autocompletar(q="cien")
+
+        with seccion._lock:
+            # Como si otro hilo estuviera renovando: no se espera
+            self.productos[0].nombre = "Otro título"
+            self.productos[0].save()
+            self.assertTrue(seccion.sucia)
+            self.assertEqual(self.autocompletar(q="otro").json()["productos"], [])
+
+        self.autocompletar(q="otro")
+        self.esperar_renovacion()
+        self.assertFalse(seccion.sucia)
+        self.assertEqual(
+            self.autocompletar(q="otro").json()["productos"],
+            [{"id": self.productos[0].pk, "nombre": "Otro título"}],
+        )
+
+    def test_cambios_sin_rearmar_la_base(self):
+        seccion = SECCIONES["productos"]
+        self.autocompletar(q="cien")
+        base = seccion._estado[0]
+
+        self.productos[0].nombre = "Otro título"
+        self.productos[0].save()
+        self.productos[1].is_active = False
+        self.productos[1].save()
+        nuevo = Producto.objects.create(
+            nombre="Cien sonetos de amor",
+            descripcion="Poesía",
+            stock=1,
+            imagen="https://example.com/sonetos.png",
+            precio=12,
+        )
+        self.autocompletar(q="cien")
+        self.esperar_renovacion()
+
+        ids = [
+            sugerencia["id"]
+            for sugerencia in self.autocompletar(q="cien", limite=20).json()[
+                "productos"
+            ]
+        ]
+        self.assertIs(seccion._estado[0], base)
+        self.assertIn(nuevo.pk, ids)
+        self.assertNotIn(self.productos[0].pk, ids)
+        self.assertNotIn(self.productos[1].pk, ids)
+        self.assertEqual(
+            self.autocompletar(q="otro").json()["productos"],
+            [{"id": self.productos[0].pk, "nombre": "Otro título"}],
+        )
+
+    def test_parametros_invalidos(self):
+        self.assertEqual(
+            self.autocompletar(q=" ").json(),
+            {"productos": [], "autores": [], "editoriales": []},
+        )
+        self.assertEqual(self.autocompletar(q="c", limite="a").status_code, 400)
+        self.assertEqual(self.autocompletar(q="c", secciones="foo").status_code, 400)
+
+
+@override_settings(INVALIDACION_INTERVALO_SONDEO=3600)
+class FacetasTests(TestCase):
+    def setUp(self):
+        self.cliente, self.productos = crear_catalogo()
+        invalidacion.sincronizar(forzar=True)
+        facetas.ensuciar()
+
+    def get(self, url, **parametros):
+        return self.cliente.get(url, parametros, HTTP_ACCEPT="application/json")
+
+    def test_precios_no_finitos(self):
+        for valor in ("nan", "NaN", "sNaN", "Infinity", "-inf"):
+            with self.subTest(valor=valor):
+                with self.assertRaises(ValidationError):
+                    leer_filtros({"precio_min": valor})
+
+        for url, parametros in (
+            ("/Libreria/productos/", {"precio_max": "nan"}),
+            ("/Libreria/productos/", {"precio_min": "Infinity"}),
+            ("/Libreria/productos/facetas/", {"precio_min": "sNaN"}),
+            ("/Libreria/productos/facetas/", {"precio_max": "x"}),
+        ):
+            with self.subTest(url=url, parametros=parametros):
+                respuesta = self.get(url, **parametros)
+                self.assertEqual(respuesta.status_code, 400)
+                self.assertIn(next(iter(parametros)), respuesta.json())
+
+    def agregar_revista(self):
+        self.revistas = Categoria.objects.create(nombre="Revistas")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.revista = Producto.objects.create(
+                nombre="Caras y Caretas",
+                descripcion="Semanario",
+                stock=1,
+                imagen="https://example.com/revista.png",
+                precio=Decimal("60"),
+                categoria=self.revistas,
+            )
+
+    def test_conteos(self):
+        self.agregar_revista()
+        datos = self.get("/Libreria/productos/facetas/").json()
+
+        self.assertEqual(datos["total"], 6)
+        self.assertEqual(
+            datos["facetas"]["categoria"],
+            [
+                {
+                    "id": self.productos[0].categoria_id,
+                    "nombre": "Libros",
+                    "cantidad": 5,
+                },
+                {"id": self.revistas.pk, "nombre": "Revistas", "cantidad": 1},
+            ],
+        )
+        self.assertEqual(datos["facetas"]["en_oferta"], {"true": 2, "false": 4})
+        self.assertEqual(
+            [tramo["cantidad"] for tramo in datos["facetas"]["precio"]],
+            [0, 5, 0, 1, 0],
+        )
+
+    def test_cada_faceta_sin_su_propio_filtro(self):
+        self.agregar_revista()
+        datos = self.get(
+            "/Libreria/productos/facetas/", categoria=self.revistas.pk
+        ).json()
+
+        self.assertEqual(datos["total"], 1)
+        self.assertEqual(
+            {
+                valor["nombre"]: valor["cantidad"]
+                for valor in datos["facetas"]["categoria"]
+            },
+            {"Libros": 5, "Revistas": 1},
+        )
+        self.assertEqual(datos["facetas"]["genero"], [])
+
+    def test_igual_que_el_listado(self):
+        self.agregar_revista()
+        for parametros in (
+            {},
+            {"categoria": f"{self.revistas.pk},{self.productos[0].categoria_id}"},
+            {"precio_min": "11", "precio_max": "13"},
+            {"en_oferta": "true"},
+            {"en_oferta": "false", "precio_max": "50"},
+            {"autor": str(self.productos[0].autor_id), "en_oferta": "0"},
+            {"precio_max": "4"},
+        ):
+            with self.subTest(parametros=parametros):
+                conteos = self.get("/Libreria/productos/facetas/", **parametros).json()
+                listado = self.get("/Libreria/productos/", **parametros).json()
+                self.assertEqual(conteos["total"], len(listado))
+
+                sin_oferta = {k: v for k, v in parametros.items() if k != "en_oferta"}
+                for valor in ("true", "false"):
+                    listado = self.get(
+                        "/Libreria/productos/", **sin_oferta, en_oferta=valor
+                    ).json()
+                    self.assertEqual(
+                        conteos["facetas"]["en_oferta"][valor], len(listado)
+                    )
+
+    def test_un_cambio_descarta_los_conteos(self):
+        self.assertEqual(self.get("/Libreria/productos/facetas/").json()["total"], 5)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.productos[0].is_active = False
+            self.productos[0].save()
+
+        self.assertEqual(self.get("/Libreria/productos/facetas/").json()["total"], 4)
+
+    def test_filtros_invalidos(self):
+        for parametros in ({"categoria": "a"}, {"en_oferta": "quizas"}):
+            with self.subTest(parametros=parametros):
+                respuesta = self.get("/Libreria/productos/facetas/", **parametros)
+                self.assertEqual(respuesta.status_code, 400)
+                respuesta = self.get("/Libreria/productos/", **parametros)
+                self.assertEqual(respuesta.status_code, 400)
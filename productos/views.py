@@ -5,6 +5,7 @@ from rest_framework import viewsets, status
 from rest_framework.permissions import AllowAny
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from django.http import HttpResponse
 from django.utils import timezone
 
 from .models import Producto, Categoria, Autor, Genero, Editorial, Oferta
@@ -20,12 +21,29 @@ from productos.serializers import (
 
 from usuarios.permissions import TienePermisoPersonalizado
 
+from .catalogo import ENTIDADES, CatalogoCondicionalMixin, invalidar_catalogo
+from .autocompletar import SECCIONES, sugerencias
+from .busqueda import buscar_ids
+from .facetas import contar_facetas, filtrar_productos, leer_filtros
+from .documentos import (
+    cache_documentos,
+    documentos_de_productos,
+    lista_json,
+    pagina_json,
+)
+from .paginacion import BusquedaPagination
+from . import lookups
+from .lookups import TablaCacheadaMixin
+
 
-class ProductoViewSet(viewsets.ModelViewSet):
+class ProductoViewSet(CatalogoCondicionalMixin, viewsets.ModelViewSet):
     queryset = Producto.objects.all()
     serializer_class = ProductoSerializer
     permission_classes = [TienePermisoPersonalizado]
 
+    acciones_condicionales_extra = ("productos_en_oferta", "buscar", "facetas")
+    entidades_etag = ENTIDADES + ("stock",)
+
     permiso_por_accion = {
         "list": "ver_productos",
         "retrieve": "ver_productos",
@@ -33,10 +51,57 @@ class ProductoViewSet(viewsets.ModelViewSet):
         "update": "editar_productos",
         "partial_update": "editar_productos",
         "destroy": "eliminar_productos",
+        "productos_en_oferta": "ver_productos",
+        "buscar": "ver_productos",
+        "autocompletar": "ver_productos",
+        "facetas": "ver_productos",
+        "aplicar_oferta": "editar_productos",
+        "quitar_oferta": "editar_productos",
     }
 
     def get_queryset(self):
-        return Producto.objects.filter(is_active=True)
+        queryset = Producto.objects.filter(is_active=True)
+
+        # ?categoria=1,2&genero=&autor=&editorial=&precio_min=&precio_max=
+        # &en_oferta=true (ver facetas.py)
+        if self.action == "list":
+            queryset = filtrar_productos(
+                queryset, leer_filtros(self.request.query_params)
+            )
+        return queryset
+
+    def usa_documentos(self):
+        """
+        Las respuestas JSON se arman con los documentos de productos ya
+        serializados (ver documentos.py); la API navegable usa el serializer.
+        """
+        return (
+            cache_documentos.maximo_bytes > 0
+            and getattr(self.request.accepted_renderer, "format", None) == "json"
+        )
+
+    def respuesta_documentos(self, queryset):
+        ids = list(queryset.values_list("pk", flat=True))
+        return HttpResponse(
+            lista_json(documentos_de_productos(ids)), content_type="application/json"
+        )
+
+    def list(self, request, *args, **kwargs):
+        if not self.usa_documentos():
+            return super().list(request, *args, **kwargs)
+        return self.respuesta_documentos(self.filter_queryset(self.get_queryset()))
+
+    def retrieve(self, request, *args, **kwargs):
+        if self.usa_documentos():
+            try:
+                pk = int(kwargs[self.lookup_field])
+            except ValueError:
+                pk = None
+            documentos = documentos_de_productos([pk]) if pk is not None else []
+            if documentos:
+                return HttpResponse(documentos[0], content_type="application/json")
+        # Inexistente o inactivo: el camino normal responde el 404
+        return super().retrieve(request, *args, **kwargs)
 
     @action(detail=False, methods=["get"], url_path="en-oferta")
     def productos_en_oferta(self, request):
@@ -48,9 +113,80 @@ class ProductoViewSet(viewsets.ModelViewSet):
             oferta__fecha_inicio__lte=timezone.now(),
             oferta__fecha_fin__gte=timezone.now(),
         )
+        if self.usa_documentos():
+            return self.respuesta_documentos(productos_con_oferta)
         serializer = self.get_serializer(productos_con_oferta, many=True)
         return Response(serializer.data)
 
+    @action(detail=False, methods=["get"])
+    def buscar(self, request):
+        """
+        Busca productos por nombre, descripción, autor, editorial y género,
+        del más relevante al menos.
+        URL: /productos/buscar/?q=texto&page=1&page_size=20
+        """
+        texto = request.query_params.get("q", "").strip()
+        if not texto:
+            return Response(
+                {"error": "Se requiere el parámetro 'q'"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        paginador = BusquedaPagination()
+        ids = list(paginador.paginate_queryset(buscar_ids(texto), request, view=self))
+        if self.usa_documentos():
+            return HttpResponse(
+                pagina_json(paginador, documentos_de_productos(ids)),
+                content_type="application/json",
+            )
+
+        productos = Producto.objects.select_related("oferta").in_bulk(ids)
+        serializer = self.get_serializer(
+            [productos[pk] for pk in ids if pk in productos], many=True
+        )
+        return paginador.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=["get"])
+    def facetas(self, request):
+        """
+        Cantidad de productos por categoría, género, autor, editorial, oferta
+        vigente y tramo de precio, con los mismos filtros que el listado. Cada
+        faceta se cuenta con los filtros de las demás.
+        URL: /productos/facetas/?categoria=1&precio_max=50
+        """
+        return Response(contar_facetas(leer_filtros(request.query_params)))
+
+    @action(detail=False, methods=["get"])
+    def autocompletar(self, request):
+        """
+        Sugerencias para el buscador: productos, autores y editoriales con
+        alguna palabra del nombre que empieza con q, de más a menos vendidos.
+        URL: /productos/autocompletar/?q=garc&limite=10&secciones=productos,autores
+        """
+        try:
+            limite = int(request.query_params.get("limite", 10))
+        except ValueError:
+            return Response(
+                {"error": "'limite' debe ser un número entero"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        secciones = request.query_params.get("secciones")
+        secciones = secciones.split(",") if secciones else list(SECCIONES)
+        invalidas = set(secciones) - set(SECCIONES)
+        if invalidas:
+            return Response(
+                {
+                    "error": f"Secciones inválidas: {', '.join(sorted(invalidas))}. "
+                    f"Opciones: {', '.join(SECCIONES)}"
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        return Response(
+            sugerencias(request.query_params.get("q", ""), limite, secciones)
+        )
+
     @action(
         detail=True, methods=["post"], url_path="aplicar-oferta/(?P<oferta_id>[^/.]+)"
     )
@@ -128,13 +264,18 @@ class ProductoViewSet(viewsets.ModelViewSet):
         )
 
 
-class CategoriaViewSet(viewsets.ModelViewSet):
+class CategoriaViewSet(
+    CatalogoCondicionalMixin, TablaCacheadaMixin, viewsets.ModelViewSet
+):
     queryset = Categoria.objects.all()
     serializer_class = CategoriaSerializer
     permission_classes = [TienePermisoPersonalizado]
+    tabla = lookups.categorias
+    entidades_etag = ("categoria",)
 
     permiso_por_accion = {
         "list": "ver_categorias",
+        "retrieve": "ver_categorias",
         "create": "crear_categorias",
         "update": "editar_categorias",
         "partial_update": "editar_categorias",
@@ -142,13 +283,16 @@ class CategoriaViewSet(viewsets.ModelViewSet):
     }
 
 
-class AutorViewSet(viewsets.ModelViewSet):
+class AutorViewSet(CatalogoCondicionalMixin, TablaCacheadaMixin, viewsets.ModelViewSet):
     queryset = Autor.objects.all()
     serializer_class = AutorSerializer
     permission_classes = [TienePermisoPersonalizado]
+    tabla = lookups.autores
+    entidades_etag = ("autor",)
 
     permiso_por_accion = {
         "list": "ver_autores",
+        "retrieve": "ver_autores",
         "create": "crear_autores",
         "update": "editar_autores",
         "partial_update": "editar_autores",
@@ -156,13 +300,18 @@ class AutorViewSet(viewsets.ModelViewSet):
     }
 
 
-class GeneroViewSet(viewsets.ModelViewSet):
+class GeneroViewSet(
+    CatalogoCondicionalMixin, TablaCacheadaMixin, viewsets.ModelViewSet
+):
     queryset = Genero.objects.all()
     serializer_class = GeneroSerializer
     permission_classes = [TienePermisoPersonalizado]
+    tabla = lookups.generos
+    entidades_etag = ("genero",)
 
     permiso_por_accion = {
         "list": "ver_generos",
+        "retrieve": "ver_generos",
         "create": "crear_generos",
         "update": "editar_generos",
         "partial_update": "editar_generos",
@@ -170,13 +319,18 @@ class GeneroViewSet(viewsets.ModelViewSet):
     }
 
 
-class EditorialViewSet(viewsets.ModelViewSet):
+class EditorialViewSet(
+    CatalogoCondicionalMixin, TablaCacheadaMixin, viewsets.ModelViewSet
+):
     queryset = Editorial.objects.all()
     serializer_class = EditorialSerializer
     permission_classes = [TienePermisoPersonalizado]
+    tabla = lookups.editoriales
+    entidades_etag = ("editorial",)
 
     permiso_por_accion = {
         "list": "ver_editoriales",
+        "retrieve": "ver_editoriales",
         "create": "crear_editoriales",
         "update": "editar_editoriales",
         "partial_update": "editar_editoriales",
@@ -184,10 +338,19 @@ class EditorialViewSet(viewsets.ModelViewSet):
     }
 
 
-class OfertaViewSet(viewsets.ModelViewSet):
+class OfertaViewSet(CatalogoCondicionalMixin, viewsets.ModelViewSet):
     queryset = Oferta.objects.all()
     serializer_class = OfertaSerializer
     permission_classes = [TienePermisoPersonalizado]
+    # productos_count y los productos de la oferta (con su stock)
+    entidades_etag = ("oferta", "producto", "stock")
+
+    acciones_condicionales_extra = (
+        "ofertas_vigentes",
+        "ofertas_proximas",
+        "ofertas_expiradas",
+        "productos_en_oferta",
+    )
 
     permiso_por_accion = {
         "list": "ver_ofertas",
@@ -196,6 +359,12 @@ class OfertaViewSet(viewsets.ModelViewSet):
         "update": "editar_ofertas",
         "partial_update": "editar_ofertas",
         "destroy": "eliminar_ofertas",
+        "ofertas_vigentes": "ver_ofertas",
+        "ofertas_proximas": "ver_ofertas",
+        "ofertas_expiradas": "ver_ofertas",
+        "productos_en_oferta": "ver_ofertas",
+        "agregar_productos": "editar_ofertas",
+        "quitar_productos": "editar_ofertas",
     }
 
     def get_queryset(self):
@@ -307,8 +476,12 @@ class OfertaViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_404_NOT_FOUND,
             )
 
-        # Aplicar la oferta a todos los productos encontrados
+        # Aplicar la oferta a todos los productos encontrados. update() no
+        # dispara señales: se publican los productos y sus ofertas anteriores
+        anteriores = dict(productos.values_list("pk", "oferta_id"))
         productos_actualizados = productos.update(oferta=oferta)
+        invalidar_catalogo("producto", ids=list(anteriores))
+        invalidar_catalogo("oferta", ids={oferta.pk, *anteriores.values()} - {None})
 
         return Response(
             {
@@ -363,8 +536,12 @@ class OfertaViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_404_NOT_FOUND,
             )
 
-        # Quitar la oferta de los productos encontrados
+        # Quitar la oferta de los productos encontrados. update() no dispara
+        # señales: se publican los productos y la oferta
+        ids = list(productos.values_list("pk", flat=True))
         productos_actualizados = productos.update(oferta=None)
+        invalidar_catalogo("producto", ids=ids)
+        invalidar_catalogo("oferta", ids=[oferta.pk])
 
         return Response(
             {
@@ -5,3 +5,6 @@ class ReportesConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "reportes"
     verbose_name = "Reportes de Ventas"
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,350 @@
+# reportes/columnar.py
+"""
+Motor analítico en memoria (opcional) para los reportes de ventas.
+
+Mantiene una copia columnar de los hechos de venta en arrays de NumPy y
+responde la misma API que ReporteManager para `productos_mas_vendidos` y
+`ventas_por_periodo` con agregaciones vectorizadas, sin ir a la base de datos
+salvo para refrescar los datos nuevos.
+"""
+
+import threading
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.utils import timezone
+
+from pedidos.models import Pedido, DetallePedido
+from productos.models import Producto
+
+from .models import ReporteManager
+
+try:
+    import numpy as np
+except ImportError:  # numpy es opcional; sin él se usa siempre el ORM
+    np = None
+
+
+EPOCH = datetime(1970, 1, 1)
+DOS_DECIMALES = Decimal("0.01")
+
+
+def _centavos(valor):
+    return int((valor or 0) * 100)
+
+
+def _a_decimal(centavos):
+    return (Decimal(int(centavos)) / 100).quantize(DOS_DECIMALES)
+
+
+class MotorColumnar:
+    """
+    Snapshot columnar de pedidos y detalles de pedido.
+
+    Tabla de pedidos: id, instante (µs), día local (int), usuario, total,
+    descuento y activo. Tabla de detalles: id, posición de su pedido, producto,
+    cantidad, precio unitario y descuento de oferta. Los importes se guardan en
+    centavos (int64) para no perder precisión.
+    """
+
+    def __init__(self, intervalo_refresco=5, intervalo_recarga=3600):
+        self.intervalo_refresco = intervalo_refresco
+        self.intervalo_recarga = intervalo_recarga
+        self._lock = threading.Lock()
+        self._datos = None
+        self._ultimo_refresco = 0
+        self._ultima_recarga = 0
+
+    # ------------------------------------------------------------------
+    # Carga de datos
+    # ------------------------------------------------------------------
+
+    def _dia_local(self, fecha):
+        local = timezone.localtime(fecha).replace(tzinfo=None)
+        return (local.date() - EPOCH.date()).days
+
+    def _micros(self, fecha):
+        return int(fecha.timestamp() * 1_000_000)
+
+    def _leer_pedidos(self, queryset):
+        filas = list(
+            queryset.order_by("id").values_list(
+                "id", "fecha_pedido", "usuario_id", "total", "descuento", "activo"
+            )
+        )
+        return {
+            "id": np.array([f[0] for f in filas], dtype=np.int64),
+            "ts": np.array([self._micros(f[1]) for f in filas], dtype=np.int64),
+            "dia": np.array([self._dia_local(f[1]) for f in filas], dtype=np.int32),
+            "usuario": np.array([f[2] for f in filas], dtype=np.int64),
+            "total": np.array([_centavos(f[3]) for f in filas], dtype=np.int64),
+            "descuento": np.array([_centavos(f[4]) for f in filas], dtype=np.int64),
+            "activo": np.array([f[5] for f in filas], dtype=bool),
+        }
+
+    def _leer_detalles(self, queryset):
+        filas = list(
+            queryset.order_by("id").values_list(
+                "id",
+                "pedido_id",
+                "producto_id",
+                "cantidad",
+                "precio_unitario",
+                "descuento_oferta",
+            )
+        )
+        return {
+            "id": np.array([f[0] for f in filas], dtype=np.int64),
+            "pedido_id": np.array(
+                [f[1] if f[1] is not None else -1 for f in filas], dtype=np.int64
+            ),
+            "producto": np.array([f[2] for f in filas], dtype=np.int64),
+            "cantidad": np.array([f[3] for f in filas], dtype=np.int64),
+            "precio": np.array([_centavos(f[4]) for f in filas], dtype=np.int64),
+            "descuento_oferta": np.array(
+                [_centavos(f[5]) for f in filas], dtype=np.int64
+            ),
+        }
+
+    def _indexar(self, pedidos, detalles):
+        """Resuelve la posición del pedido de cada detalle (-1 si no tiene)"""
+        posicion = np.searchsorted(pedidos["id"], detalles["pedido_id"])
+        posicion = np.clip(posicion, 0, max(len(pedidos["id"]) - 1, 0))
+        encontrado = (detalles["pedido_id"] >= 0) & (len(pedidos["id"]) > 0)
+        if len(pedidos["id"]):
+            encontrado &= pedidos["id"][posicion] == detalles["pedido_id"]
+        detalles["pedido_pos"] = np.where(encontrado, posicion, -1)
+        return {"pedidos": pedidos, "detalles": detalles}
+
+    def recargar(self):
+        """Carga completa del snapshot"""
+        pedidos = self._leer_pedidos(Pedido.objects.all())
+        detalles = self._leer_detalles(DetallePedido.objects.all())
+        self._datos = self._indexar(pedidos, detalles)
+        self._ultima_recarga = self._ultimo_refresco = time.monotonic()
+
+    def refrescar(self):
+        """
+        Carga incremental: agrega los pedidos y detalles con id mayor al último
+        cargado y relee los pedidos afectados por los detalles nuevos (su total y
+        descuento se recalculan al agregar detalles). Los cambios sobre pedidos
+        antiguos (p. ej. desactivarlos) se recogen en la recarga completa.
+        """
+        datos = self._datos
+        pedidos, detalles = datos["pedidos"], datos["detalles"]
+        ultimo_pedido = int(pedidos["id"][-1]) if len(pedidos["id"]) else 0
+        ultimo_detalle = int(detalles["id"][-1]) if len(detalles["id"]) else 0
+
+        nuevos_detalles = self._leer_detalles(
+            DetallePedido.objects.filter(id__gt=ultimo_detalle)
+        )
+        afectados = set(nuevos_detalles["pedido_id"].tolist()) - {-1}
+        afectados = [p for p in afectados if p <= ultimo_pedido]
+        nuevos_pedidos = self._leer_pedidos(Pedido.objects.filter(id__gt=ultimo_pedido))
+
+        pedidos = {k: v.copy() for k, v in pedidos.items()}
+        if afectados:
+            releidos = self._leer_pedidos(Pedido.objects.filter(id__in=afectados))
+            posiciones = np.searchsorted(pedidos["id"], releidos["id"])
+            for campo in ("total", "descuento", "activo"):
+                pedidos[campo][posiciones] = releidos[campo]
+
+        pedidos = {k: np.concatenate([pedidos[k], nuevos_pedidos[k]]) for k in pedidos}
+        detalles = {
+            k: np.concatenate([detalles[k], nuevos_detalles[k]])
+            for k in nuevos_detalles
+        }
+        self._datos = self._indexar(pedidos, detalles)
+        self._ultimo_refresco = time.monotonic()
+
+    def _asegurar_datos(self):
+        ahora = time.monotonic()
+        if (
+            self._datos is not None
+            and ahora - self._ultimo_refresco < self.intervalo_refresco
+        ):
+            return self._datos
+
+        with self._lock:
+            ahora = time.monotonic()
+            if (
+                self._datos is None
+                or ahora - self._ultima_recarga >= self.intervalo_recarga
+            ):
+                self.recargar()
+            elif ahora - self._ultimo_refresco >= self.intervalo_refresco:
+                self.refrescar()
+            return self._datos
+
+    # ------------------------------------------------------------------
+    # Utilidades de filtrado y agrupación
+    # ------------------------------------------------------------------
+
+    def _mascara_pedidos(self, pedidos, fecha_inicio, fecha_fin):
+        mascara = np.ones(len(pedidos["id"]), dtype=bool)
+        if fecha_inicio:
+            mascara &= pedidos["ts"] >= self._micros(fecha_inicio)
+        if fecha_fin:
+            mascara &= pedidos["ts"] <= self._micros(fecha_fin)
+        return mascara
+
+    def _truncar(self, dias, agrupar_por):
+        """Trunca días locales (desde 1970-01-01) al inicio del período"""
+        if agrupar_por == "semana":
+            # 1970-01-05 fue lunes, igual que el Trunc("week") de la base de datos
+            return (dias - 4) // 7 * 7 + 4
+        if agrupar_por in ("mes", "año"):
+            unidad = "M" if agrupar_por == "mes" else "Y"
+            truncado = dias.astype("datetime64[D]").astype(f"datetime64[{unidad}]")
+            return truncado.astype("datetime64[D]").astype(np.int64)
+        return dias
+
+    def _periodo(self, dia):
+        fecha = EPOCH + timedelta(days=int(dia))
+        return timezone.make_aware(fecha, timezone.get_current_timezone())
+
+    # ------------------------------------------------------------------
+    # API compatible con ReporteManager
+    # ------------------------------------------------------------------
+
+    def productos_mas_vendidos(self, fecha_inicio=None, fecha_fin=None, limite=10):
+        """
+        Obtiene los productos más vendidos en un rango de fechas
+        """
+        datos = self._asegurar_datos()
+        pedidos, detalles = datos["pedidos"], datos["detalles"]
+
+        posicion = detalles["pedido_pos"]
+        if fecha_inicio or fecha_fin:
+            en_rango = self._mascara_pedidos(pedidos, fecha_inicio, fecha_fin)
+            mascara = (posicion >= 0) & en_rango[np.maximum(posicion, 0)]
+        else:
+            mascara = np.ones(len(posicion), dtype=bool)
+
+        if not mascara.any():
+            return []
+
+        productos, grupo = np.unique(detalles["producto"][mascara], return_inverse=True)
+        cantidad = detalles["cantidad"][mascara]
+        precio = detalles["precio"][mascara]
+
+        cantidad_vendida = np.bincount(grupo, weights=cantidad).astype(np.int64)
+        veces_comprado = np.bincount(grupo, weights=posicion[mascara] >= 0)
+        ingreso_total = np.bincount(grupo, weights=cantidad * precio)
+        lineas = np.bincount(grupo)
+        suma_precios = np.bincount(grupo, weights=precio)
+
+        orden = np.argsort(-cantidad_vendida, kind="stable")[:limite]
+        ids = productos[orden].tolist()
+        info = {
+            p["id"]: p
+            for p in Producto.objects.filter(id__in=ids).values(
+                "id", "nombre", "precio", "stock"
+            )
+        }
+
+        resultado = []
+        for i in orden:
+            producto = info.get(int(productos[i]), {})
+            resultado.append(
+                {
+                    "producto__id": int(productos[i]),
+                    "producto__nombre": producto.get("nombre"),
+                    "producto__precio": producto.get("precio"),
+                    "producto__stock": producto.get("stock"),
+                    "cantidad_vendida": int(cantidad_vendida[i]),
+                    "veces_comprado": int(veces_comprado[i]),
+                    "ingreso_total": _a_decimal(ingreso_total[i]),
+                    "precio_promedio_venta": _a_decimal(
+                        round(suma_precios[i] / lineas[i])
+                    ),
+                }
+            )
+        return resultado
+
+    def ventas_por_periodo(self, fecha_inicio=None, fecha_fin=None, agrupar_por="dia"):
+        """
+        Obtiene ventas agrupadas por período (día, semana, mes, año).
+
+        Reproduce la consulta del ORM, que une cada pedido con sus detalles:
+        un pedido aporta una fila por detalle (o una sola si no tiene).
+        """
+        datos = self._asegurar_datos()
+        pedidos, detalles = datos["pedidos"], datos["detalles"]
+        total_pedidos = len(pedidos["id"])
+
+        con_pedido = detalles["pedido_pos"] >= 0
+        posicion = detalles["pedido_pos"][con_pedido]
+        n_detalles = np.bincount(posicion, minlength=total_pedidos)
+        cantidad = np.bincount(
+            posicion,
+            weights=detalles["cantidad"][con_pedido],
+            minlength=total_pedidos,
+        )
+        filas = np.maximum(n_detalles, 1)
+
+        mascara = pedidos["activo"] & self._mascara_pedidos(
+            pedidos, fecha_inicio, fecha_fin
+        )
+        if not mascara.any():
+            return []
+
+        periodos, grupo = np.unique(
+            self._truncar(pedidos["dia"][mascara], agrupar_por), return_inverse=True
+        )
+        filas = filas[mascara]
+        total_filas = np.bincount(grupo, weights=filas)
+        ingresos = np.bincount(grupo, weights=pedidos["total"][mascara] * filas)
+        descuentos = np.bincount(grupo, weights=pedidos["descuento"][mascara] * filas)
+        vendidos = np.bincount(grupo, weights=cantidad[mascara])
+        con_detalles = np.bincount(grupo, weights=n_detalles[mascara])
+
+        return [
+            {
+                "periodo": self._periodo(periodos[i]),
+                "total_pedidos": int(total_filas[i]),
+                "total_ingresos": _a_decimal(ingresos[i]),
+                "total_productos_vendidos": (
+                    int(vendidos[i]) if con_detalles[i] else None
+                ),
+                "ingreso_promedio_pedido": _a_decimal(
+                    round(ingresos[i] / total_filas[i])
+                ),
+                "descuento_promedio": _a_decimal(round(descuentos[i] / total_filas[i])),
+            }
+            for i in range(len(periodos))
+        ]
+
+
+_motor = None
+_motor_lock = threading.Lock()
+
+
+def columnar_disponible():
+    return np is not None and getattr(settings, "REPORTES_MOTOR_COLUMNAR", False)
+
+
+def obtener_motor_reportes():
+    """
+    Devuelve el motor columnar si está habilitado (REPORTES_MOTOR_COLUMNAR) y
+    NumPy está instalado; en caso contrario, ReporteManager.
+    """
+    global _motor
+
+    if not columnar_disponible():
+        return ReporteManager
+
+    if _motor is None:
+        with _motor_lock:
+            if _motor is None:
+                _motor = MotorColumnar(
+                    intervalo_refresco=getattr(
+                        settings, "REPORTES_COLUMNAR_REFRESCO", 5
+                    ),
+                    intervalo_recarga=getattr(
+                        settings, "REPORTES_COLUMNAR_RECARGA", 3600
+                    ),
+                )
+    return _motor
@@ -0,0 +1,61 @@
+# reportes/exportacion.py
+import csv
+import zlib
+
+from django.http import StreamingHttpResponse
+
+# Tamaño aproximado de cada fragmento enviado al cliente
+TAMANO_FRAGMENTO = 64 * 1024
+
+
+class _Eco:
+    """Pseudo-archivo que devuelve lo escrito en lugar de guardarlo"""
+
+    def write(self, valor):
+        return valor
+
+
+def _lineas_csv(filas):
+    writer = csv.writer(_Eco())
+    buffer, tamano = [], 0
+    for fila in filas:
+        linea = writer.writerow(fila)
+        buffer.append(linea)
+        tamano += len(linea)
+        if tamano >= TAMANO_FRAGMENTO:
+            yield "".join(buffer).encode("utf-8")
+            buffer, tamano = [], 0
+    if buffer:
+        yield "".join(buffer).encode("utf-8")
+
+
+def _gzip(fragmentos):
+    compresor = zlib.compressobj(wbits=31)  # 31 = formato gzip
+    for fragmento in fragmentos:
+        comprimido = compresor.compress(fragmento)
+        if comprimido:
+            yield comprimido
+    yield compresor.flush()
+
+
+def respuesta_csv(filas, nombre_archivo, comprimir=False):
+    """
+    Construye una StreamingHttpResponse que va generando el CSV a medida que
+    se consume `filas` (un iterable de listas), con memoria constante.
+    Con comprimir=True el archivo se entrega como .csv.gz.
+    """
+    contenido = _lineas_csv(filas)
+
+    if comprimir:
+        response = StreamingHttpResponse(
+            _gzip(contenido), content_type="application/gzip"
+        )
+        nombre_archivo = f"{nombre_archivo}.gz"
+    else:
+        response = StreamingHttpResponse(
+            contenido, content_type="text/csv; charset=utf-8"
+        )
+
+    response["Content-Disposition"] = f'attachment; filename="{nombre_archivo}"'
+    response["Access-Control-Expose-Headers"] = "Content-Disposition"
+    return response
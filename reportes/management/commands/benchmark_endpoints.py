@@ -0,0 +1,417 @@
+import json
+import logging
+import statistics
+import time
+import uuid
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from backend.middleware import Medicion
+from pedidos.models import Carrito, DetalleCarrito, Pedido
+from productos.models import Producto
+from usuarios.authentication import generar_token_acceso
+from usuarios.models import Permiso, Rol, Usuario
+
+# Diferencia mínima de p50 (ms) para considerar una regresión; por debajo es ruido
+MINIMO_REGRESION_MS = 1.0
+
+
+def percentil(valores, p):
+    return statistics.quantiles(valores, n=100, method="inclusive")[p - 1]
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide latencia (p50/p90/p99) y cantidad de consultas de los endpoints "
+        "principales. Los endpoints de lectura corren fuera de transacción, como "
+        "en producción; los que escriben revierten cada repetición en su propia "
+        "transacción. El rol y el usuario de benchmark se crean para la "
+        "ejecución, se autentican con un token de acceso real y se borran al "
+        "terminar. Usar con los datos de generar_datos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeticiones", type=int, default=20)
+        parser.add_argument(
+            "--calentamiento",
+            type=int,
+            default=2,
+            help="Ejecuciones previas a medir (no cuentan)",
+        )
+        parser.add_argument(
+            "--guardar", metavar="ARCHIVO", help="Guarda los resultados como JSON"
+        )
+        parser.add_argument(
+            "--comparar",
+            metavar="ARCHIVO",
+            help="JSON de referencia; falla si algún endpoint empeora",
+        )
+        parser.add_argument(
+            "--tolerancia",
+            type=float,
+            default=0.2,
+            help="Aumento relativo de p50 tolerado al comparar (0.2 = 20%%)",
+        )
+        parser.add_argument(
+            "--solo", nargs="+", metavar="NOMBRE", help="Mide solo estos endpoints"
+        )
+
+    def handle(self, *args, **options):
+        if options["repeticiones"] < 2:
+            raise CommandError("Se necesitan al menos 2 repeticiones.")
+        if not Producto.objects.filter(is_active=True).exists():
+            raise CommandError(
+                "No hay productos; genere datos con `manage.py generar_datos`."
+            )
+
+        referencia = None
+        if options["comparar"]:
+            with open(options["comparar"]) as archivo:
+                referencia = json.load(archivo)
+
+        logger = logging.getLogger("backend.instrumentacion")
+        nivel = logger.level
+        logger.setLevel(logging.WARNING)
+        try:
+            # Sin throttling ni presupuestos estrictos: se mide, no se limita
+            with override_settings(
+                THROTTLE_BUCKETS={}, PRESUPUESTO_CONSULTAS_ESTRICTO=False
+            ):
+                try:
+                    resultados = self.medir(options)
+                finally:
+                    self.limpiar()
+        finally:
+            logger.setLevel(nivel)
+
+        for nombre, resultado in resultados["endpoints"].items():
+            self.stdout.write(
+                f"{nombre:32} {resultado['estado']} "
+                f"consultas={resultado['consultas']:<5} "
+                f"p50={resultado['p50_ms']:.1f} ms p90={resultado['p90_ms']:.1f} ms "
+                f"p99={resultado['p99_ms']:.1f} ms"
+            )
+        if "reportes-reporte-rapido" in resultados["endpoints"]:
+            self.stdout.write(
+                "reportes-reporte-rapido corre sus sub-reportes en hilos; sus "
+                "consultas no se cuentan."
+            )
+
+        if options["guardar"]:
+            with open(options["guardar"], "w") as archivo:
+                json.dump(resultados, archivo, indent=2, ensure_ascii=False)
+            self.stdout.write(f"Resultados guardados en {options['guardar']}")
+
+        if referencia is not None:
+            regresiones = self.comparar(resultados, referencia, options["tolerancia"])
+            if regresiones:
+                raise CommandError(f"{regresiones} endpoint(s) con regresiones.")
+            self.stdout.write(self.style.SUCCESS("Sin regresiones."))
+
+    def preparar_usuario(self):
+        """
+        Crea un rol con todos los permisos y un usuario con un carrito activo.
+        Los nombres son propios de esta ejecución, así que no se modifica
+        ningún rol ni usuario existente; limpiar() borra solo lo creado.
+        """
+        sufijo = uuid.uuid4().hex[:8]
+        creados = []
+        self.vencimiento = 0
+        with transaction.atomic():
+            permiso, creado = Permiso.objects.get_or_create(nombre="ver_productos")
+            if creado:
+                creados.append(permiso)
+            rol = Rol.objects.create(nombre=f"benchmark-{sufijo}")
+            rol.permisos.set(Permiso.objects.all())
+            usuario = Usuario.objects.create_user(
+                f"benchmark-{sufijo}@ejemplo.com",
+                nombre_completo="Usuario benchmark",
+                rol=rol,
+            )
+            creados += [rol, usuario]
+            self.productos = list(Producto.objects.filter(is_active=True)[:5])
+            self.usuario = usuario
+            self.nuevo_carrito()
+        # Solo después del commit: si algo falló no quedó nada que borrar
+        self.creados = creados
+        return usuario
+
+    def limpiar(self):
+        """Borra lo que creó preparar_usuario (el usuario arrastra sus carritos)"""
+        for objeto in reversed(getattr(self, "creados", [])):
+            objeto.delete()
+
+    def autenticar(self, cliente):
+        """
+        Credenciales de un token de acceso firmado real, como las que usa el
+        frontend; se renuevan antes de que venzan
+        """
+        if time.time() < getattr(self, "vencimiento", 0):
+            return
+        acceso, duracion = generar_token_acceso(self.usuario)
+        # Margen para la petición más lenta de una repetición
+        self.vencimiento = time.time() + duracion / 2
+        cliente.credentials(HTTP_AUTHORIZATION=f"Bearer {acceso}")
+
+    def nuevo_carrito(self):
+        """Carrito activo con los productos (solo del usuario de benchmark)"""
+        Carrito.objects.filter(usuario=self.usuario, activo=True).update(activo=False)
+        carrito = Carrito.objects.create(usuario=self.usuario)
+        for producto in self.productos:
+            DetalleCarrito.objects.create(
+                carrito=carrito, producto=producto, cantidad=1
+            )
+        return carrito
+
+    def casos(self):
+        """(nombre, método, url, datos, preparar) de cada endpoint a medir"""
+        ahora = timezone.now()
+        inicio = Pedido.objects.order_by("fecha_pedido").values_list(
+            "fecha_pedido", flat=True
+        ).first() or (ahora - timedelta(days=365))
+        rango = {
+            "fecha_inicio": (ahora - timedelta(days=365)).isoformat(),
+            "fecha_fin": ahora.isoformat(),
+        }
+        reportes = "/Libreria/reportes"
+        carrito_para_convertir = {}
+
+        def preparar_conversion():
+            carrito_para_convertir["id"] = self.nuevo_carrito().pk
+
+        return [
+            ("productos-list", "get", "/Libreria/productos/", None, None),
+            (
+                "productos-buscar",
+                "get",
+                "/Libreria/productos/buscar/",
+                {"q": "aventura misterio"},
+                None,
+            ),
+            (
+                "productos-autocompletar",
+                "get",
+                "/Libreria/productos/autocompletar/",
+                {"q": "lib"},
+                None,
+            ),
+            (
+                "productos-facetas",
+                "get",
+                "/Libreria/productos/facetas/",
+                {"precio_max": "50"},
+                None,
+            ),
+            ("carrito-activo", "get", "/Libreria/carrito/activo/", None, None),
+            (
+                "carrito-convertir-a-pedido",
+                "post",
+                lambda: f"/Libreria/carrito/{carrito_para_convertir['id']}/convertir-a-pedido/",
+                None,
+                preparar_conversion,
+            ),
+            (
+                "reportes-productos-mas-vendidos",
+                "get",
+                f"{reportes}/productos-mas-vendidos/",
+                rango,
+                None,
+            ),
+            (
+                "reportes-top-tiempo-real",
+                "get",
+                f"{reportes}/top-productos-tiempo-real/",
+                {"ventana": "30d"},
+                None,
+            ),
+            (
+                "reportes-ventas-por-periodo",
+                "get",
+                f"{reportes}/ventas-por-periodo/",
+                {**rango, "agrupar_por": "mes"},
+                None,
+            ),
+            (
+                "reportes-resumen-general",
+                "get",
+                f"{reportes}/resumen-general/",
+                rango,
+                None,
+            ),
+            ("reportes-top-clientes", "get", f"{reportes}/top-clientes/", rango, None),
+            (
+                "reportes-efectividad-ofertas",
+                "get",
+                f"{reportes}/efectividad-ofertas/",
+                rango,
+                None,
+            ),
+            (
+                "reportes-comparativa-periodos",
+                "post",
+                f"{reportes}/comparativa-periodos/",
+                {
+                    "fecha_inicio_1": inicio.isoformat(),
+                    "fecha_fin_1": (ahora - timedelta(days=365)).isoformat(),
+                    "fecha_inicio_2": (ahora - timedelta(days=365)).isoformat(),
+                    "fecha_fin_2": ahora.isoformat(),
+                },
+                None,
+            ),
+            (
+                "reportes-reporte-rapido",
+                "get",
+                f"{reportes}/reporte-rapido/",
+                {"periodo": "ultimo_año"},
+                None,
+            ),
+            ("reportes-dashboard", "get", f"{reportes}/dashboard/", None, None),
+            (
+                "reportes-exportar-productos",
+                "get",
+                f"{reportes}/exportar-productos-csv/",
+                rango,
+                None,
+            ),
+            (
+                "reportes-exportar-ventas",
+                "get",
+                f"{reportes}/exportar-ventas-csv/",
+                rango,
+                None,
+            ),
+            (
+                "reportes-exportar-completo",
+                "get",
+                f"{reportes}/exportar-reporte-completo-csv/",
+                {"periodo": "ultimo_año"},
+                None,
+            ),
+            (
+                "pedidos-combinaciones-ml",
+                "get",
+                "/Libreria/pedidos/combinaciones-ml/",
+                None,
+                None,
+            ),
+            ("pedidos-ml-csv", "get", "/Libreria/ml-csv/", None, None),
+        ]
+
+    def ejecutar(self, cliente, metodo, url, datos):
+        if metodo == "get":
+            respuesta = cliente.get(url, datos)
+        else:
+            respuesta = cliente.post(url, datos, format="json")
+        # Las exportaciones se generan mientras se consumen
+        if respuesta.streaming:
+            b"".join(respuesta.streaming_content)
+        else:
+            respuesta.content
+        return respuesta
+
+    def medir_una_vez(self, cliente, metodo, url, datos, preparar):
+        """
+        Devuelve (respuesta, ms, consultas). Los casos con preparar escriben y
+        se revierten; el resto corre en autocommit, así que reporte-rapido usa
+        su pool de hilos igual que en producción (las consultas de esos hilos
+        no se cuentan).
+        """
+        if preparar is None:
+            return self.medir_peticion(cliente, metodo, url, datos)
+        with transaction.atomic():
+            preparar()
+            destino = url() if callable(url) else url
+            resultado = self.medir_peticion(cliente, metodo, destino, datos)
+            transaction.set_rollback(True)
+        return resultado
+
+    def medir_peticion(self, cliente, metodo, url, datos):
+        medicion = Medicion()
+        with connection.execute_wrapper(medicion):
+            inicio = time.perf_counter()
+            respuesta = self.ejecutar(cliente, metodo, url, datos)
+            duracion = (time.perf_counter() - inicio) * 1000
+        return respuesta, duracion, medicion.consultas
+
+    def medir(self, options):
+        # Tamaño de los datos antes de que el benchmark cree nada
+        datos = {
+            "productos": Producto.objects.count(),
+            "usuarios": Usuario.objects.count(),
+            "pedidos": Pedido.objects.count(),
+        }
+        self.preparar_usuario()
+        cliente = APIClient()
+
+        endpoints = {}
+        for nombre, metodo, url, datos, preparar in self.casos():
+            if options["solo"] and nombre not in options["solo"]:
+                continue
+
+            tiempos, consultas = [], []
+            for i in range(options["calentamiento"] + options["repeticiones"]):
+                self.autenticar(cliente)
+                respuesta, duracion, cantidad = self.medir_una_vez(
+                    cliente, metodo, url, datos, preparar
+                )
+                if i >= options["calentamiento"]:
+                    tiempos.append(duracion)
+                    consultas.append(cantidad)
+
+            endpoints[nombre] = {
+                "estado": respuesta.status_code,
+                "consultas": max(consultas),
+                "media_ms": round(statistics.fmean(tiempos), 2),
+                "p50_ms": round(percentil(tiempos, 50), 2),
+                "p90_ms": round(percentil(tiempos, 90), 2),
+                "p99_ms": round(percentil(tiempos, 99), 2),
+            }
+
+        return {
+            "fecha": timezone.now().isoformat(),
+            "motor": connection.vendor,
+            "repeticiones": options["repeticiones"],
+            "datos": datos,
+            "endpoints": endpoints,
+        }
+
+    def comparar(self, resultados, referencia, tolerancia):
+        """Informa las diferencias con la referencia y devuelve las regresiones"""
+        if referencia.get("datos") != resultados["datos"]:
+            self.stdout.write(
+                self.style.WARNING(
+                    f"Los datos difieren de la referencia ({referencia.get('datos')}); "
+                    "las latencias pueden no ser comparables."
+                )
+            )
+
+        regresiones = 0
+        for nombre, actual in resultados["endpoints"].items():
+            anterior = referencia["endpoints"].get(nombre)
+            if anterior is None:
+                continue
+            problemas = []
+            if actual["consultas"] > anterior["consultas"]:
+                problemas.append(
+                    f"consultas {anterior['consultas']} -> {actual['consultas']}"
+                )
+            limite = anterior["p50_ms"] * (1 + tolerancia)
+            if (
+                actual["p50_ms"] > limite
+                and actual["p50_ms"] - anterior["p50_ms"] >= MINIMO_REGRESION_MS
+            ):
+                problemas.append(
+                    f"p50 {anterior['p50_ms']:.1f} -> {actual['p50_ms']:.1f} ms"
+                )
+            if actual["estado"] != anterior["estado"]:
+                problemas.append(f"estado {anterior['estado']} -> {actual['estado']}")
+
+            if problemas:
+                regresiones += 1
+                self.stdout.write(self.style.ERROR(f"{nombre}: {', '.join(problemas)}"))
+        return regresiones
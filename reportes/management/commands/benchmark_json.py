@@ -0,0 +1,83 @@
+import io
+import json
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from backend.parsers import ORJSONParser
+from backend.renderers import ORJSONRenderer, orjson
+from productos.models import Producto
+from productos.serializers import ProductoSerializer
+from reportes.views import ReporteViewSet
+from usuarios.models import Usuario
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara el JSONRenderer/JSONParser de DRF con los basados en orjson "
+        "sobre el listado de productos y el dashboard de reportes"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeticiones", type=int, default=50)
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            raise CommandError("orjson no está instalado.")
+        usuario = Usuario.objects.first()
+        if usuario is None or not Producto.objects.exists():
+            raise CommandError(
+                "No hay datos; genere datos con `manage.py generar_datos`."
+            )
+
+        productos = Producto.objects.select_related(
+            "categoria", "genero", "autor", "editorial", "oferta"
+        )
+        request = APIRequestFactory().get("/Libreria/reportes/dashboard/")
+        force_authenticate(request, user=usuario)
+        dashboard = ReporteViewSet.as_view({"get": "dashboard"})(request).data
+
+        for nombre, datos in (
+            ("productos", ProductoSerializer(productos, many=True).data),
+            ("dashboard", dashboard),
+        ):
+            self.comparar(nombre, datos, options["repeticiones"])
+
+    def medir(self, funcion, repeticiones):
+        tiempos = []
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            funcion()
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+        return statistics.median(tiempos)
+
+    def comparar(self, nombre, datos, repeticiones):
+        stdlib = JSONRenderer().render(datos)
+        rapido = ORJSONRenderer().render(datos)
+        if stdlib != rapido:
+            iguales = json.loads(stdlib) == json.loads(rapido)
+            self.stderr.write(
+                f"{nombre}: la salida de orjson difiere byte a byte de la de DRF"
+                + (" (mismo contenido)" if iguales else "")
+            )
+
+        render_stdlib = self.medir(lambda: JSONRenderer().render(datos), repeticiones)
+        render_rapido = self.medir(lambda: ORJSONRenderer().render(datos), repeticiones)
+        parse_stdlib = self.medir(
+            lambda: JSONParser().parse(io.BytesIO(stdlib)), repeticiones
+        )
+        parse_rapido = self.medir(
+            lambda: ORJSONParser().parse(io.BytesIO(stdlib)), repeticiones
+        )
+
+        self.stdout.write(
+            f"{nombre} ({len(stdlib) / 1024:.1f} KiB): "
+            f"render DRF p50={render_stdlib:.2f} ms orjson p50={render_rapido:.2f} ms "
+            f"(x{render_stdlib / max(render_rapido, 1e-6):.1f}) | "
+            f"parse DRF p50={parse_stdlib:.2f} ms orjson p50={parse_rapido:.2f} ms "
+            f"(x{parse_stdlib / max(parse_rapido, 1e-6):.1f})"
+        )
@@ -0,0 +1,92 @@
+import random
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max, Min
+
+from pedidos.models import Pedido
+from reportes.columnar import MotorColumnar, np
+from reportes.models import ReporteManager
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara el tiempo de productos_mas_vendidos y ventas_por_periodo "
+        "entre el ORM y el motor columnar en memoria"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--combinaciones",
+            type=int,
+            default=50,
+            help="Cantidad de combinaciones de parámetros a probar",
+        )
+        parser.add_argument("--semilla", type=int, default=42)
+
+    def handle(self, *args, **options):
+        if np is None:
+            raise CommandError("El motor columnar requiere numpy instalado.")
+
+        rango = Pedido.objects.aggregate(
+            inicio=Min("fecha_pedido"), fin=Max("fecha_pedido")
+        )
+        if rango["inicio"] is None:
+            raise CommandError("No hay pedidos para medir.")
+
+        rnd = random.Random(options["semilla"])
+        dias_totales = max((rango["fin"] - rango["inicio"]).days, 1)
+        combinaciones = []
+        for _ in range(options["combinaciones"]):
+            desde = rnd.randint(0, dias_totales)
+            hasta = rnd.randint(desde, dias_totales) + 1
+            combinaciones.append(
+                (
+                    rango["inicio"] + timedelta(days=desde),
+                    rango["inicio"] + timedelta(days=hasta),
+                    rnd.choice(["dia", "semana", "mes", "año"]),
+                    rnd.choice([5, 10, 20, 50, 100]),
+                )
+            )
+
+        motor = MotorColumnar(intervalo_refresco=3600)
+        inicio = time.perf_counter()
+        motor.recargar()
+        self.stdout.write(
+            f"Carga del snapshot columnar: {(time.perf_counter() - inicio) * 1000:.1f} ms"
+        )
+
+        for nombre, orm, columnar in (
+            (
+                "productos_mas_vendidos",
+                lambda c: ReporteManager.productos_mas_vendidos(c[0], c[1], c[3]),
+                lambda c: motor.productos_mas_vendidos(c[0], c[1], c[3]),
+            ),
+            (
+                "ventas_por_periodo",
+                lambda c: ReporteManager.ventas_por_periodo(c[0], c[1], c[2]),
+                lambda c: motor.ventas_por_periodo(c[0], c[1], c[2]),
+            ),
+        ):
+            tiempos_orm, tiempos_columnar, diferencias = [], [], 0
+            for combinacion in combinaciones:
+                t0 = time.perf_counter()
+                esperado = orm(combinacion)
+                t1 = time.perf_counter()
+                obtenido = columnar(combinacion)
+                t2 = time.perf_counter()
+                tiempos_orm.append((t1 - t0) * 1000)
+                tiempos_columnar.append((t2 - t1) * 1000)
+                if len(esperado) != len(obtenido):
+                    diferencias += 1
+
+            self.stdout.write(
+                f"{nombre}: ORM p50={statistics.median(tiempos_orm):.2f} ms "
+                f"max={max(tiempos_orm):.2f} ms | columnar "
+                f"p50={statistics.median(tiempos_columnar):.2f} ms "
+                f"max={max(tiempos_columnar):.2f} ms | "
+                f"speedup x{statistics.median(tiempos_orm) / max(statistics.median(tiempos_columnar), 1e-6):.1f} | "
+                f"resultados con distinto tamaño: {diferencias}"
+            )
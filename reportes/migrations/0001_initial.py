@@ -0,0 +1,50 @@
+# Generated by Django 5.2 on 2026-10-19 06:51
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReporteGuardado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo_reporte', models.CharField(choices=[('productos_vendidos', 'Productos Más Vendidos'), ('ventas_periodo', 'Ventas por Período'), ('resumen_general', 'Resumen General'), ('top_clientes', 'Top Clientes'), ('efectividad_ofertas', 'Efectividad de Ofertas'), ('comparativa', 'Comparativa de Períodos')], max_length=50)),
+                ('nombre', models.CharField(max_length=200)),
+                ('parametros', models.JSONField(help_text='Parámetros usados para generar el reporte')),
+                ('datos', models.JSONField(help_text='Datos del reporte generado')),
+                ('fecha_generacion', models.DateTimeField(auto_now_add=True)),
+                ('activo', models.BooleanField(default=True)),
+                ('generado_por', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Reporte Guardado',
+                'verbose_name_plural': 'Reportes Guardados',
+                'ordering': ['-fecha_generacion'],
+            },
+        ),
+        migrations.CreateModel(
+            name='SketchDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('dimension', models.CharField(choices=[('clientes', 'Clientes únicos'), ('productos', 'Productos únicos vendidos')], max_length=20)),
+                ('registros', models.BinaryField(help_text='Registros del HyperLogLog')),
+                ('fecha_generacion', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Sketch Diario',
+                'verbose_name_plural': 'Sketches Diarios',
+                'constraints': [models.UniqueConstraint(fields=('fecha', 'dimension'), name='sketch_diario_unico')],
+            },
+        ),
+    ]
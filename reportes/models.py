@@ -17,6 +17,19 @@ class ReporteManager:
         """
         Obtiene los productos más vendidos en un rango de fechas
         """
+        return list(
+            ReporteManager.productos_mas_vendidos_queryset(
+                fecha_inicio, fecha_fin, limite
+            )
+        )
+
+    @staticmethod
+    def productos_mas_vendidos_queryset(fecha_inicio=None, fecha_fin=None, limite=None):
+        """
+        Queryset (sin evaluar) de los productos más vendidos.
+        Sin límite devuelve el ranking completo, pensado para recorrerse con
+        .iterator() en las exportaciones.
+        """
         # Filtro base para detalles de pedidos
         queryset = DetallePedido.objects.select_related("producto")
 
@@ -40,16 +53,32 @@ class ReporteManager:
                 ingreso_total=Sum(F("cantidad") * F("precio_unitario")),
                 precio_promedio_venta=Avg("precio_unitario"),
             )
-            .order_by("-cantidad_vendida")[:limite]
+            .order_by("-cantidad_vendida", "producto__id")
         )
 
-        return list(productos_vendidos)
+        if limite is not None:
+            productos_vendidos = productos_vendidos[:limite]
+
+        return productos_vendidos
 
     @staticmethod
     def ventas_por_periodo(fecha_inicio=None, fecha_fin=None, agrupar_por="dia"):
         """
         Obtiene ventas agrupadas por período (día, semana, mes)
         """
+        return list(
+            ReporteManager.ventas_por_periodo_queryset(
+                fecha_inicio, fecha_fin, agrupar_por
+            )
+        )
+
+    @staticmethod
+    def ventas_por_periodo_queryset(
+        fecha_inicio=None, fecha_fin=None, agrupar_por="dia"
+    ):
+        """
+        Queryset (sin evaluar) de las ventas agrupadas por período
+        """
         queryset = Pedido.objects.filter(activo=True)
 
         # Aplicar filtros de fecha
@@ -91,12 +120,14 @@ class ReporteManager:
             .order_by("periodo")
         )
 
-        return list(ventas)
+        return ventas
 
     @staticmethod
-    def resumen_ventas_general(fecha_inicio=None, fecha_fin=None):
+    def resumen_ventas_general(fecha_inicio=None, fecha_fin=None, exacto=True):
         """
-        Obtiene un resumen general de ventas
+        Obtiene un resumen general de ventas.
+        Con exacto=False los clientes y productos únicos se estiman con los
+        sketches HyperLogLog diarios en lugar de COUNT(DISTINCT).
         """
         queryset = Pedido.objects.filter(activo=True)
 
@@ -115,6 +146,14 @@ class ReporteManager:
             total_productos_vendidos=Sum("detalles__cantidad"),
         )
 
+        if not exacto:
+            from .sketches import contar_distintos_aproximado
+
+            distintos = contar_distintos_aproximado(fecha_inicio, fecha_fin)
+            resumen["productos_unicos_vendidos"] = distintos["productos"]
+            resumen["clientes_unicos"] = distintos["clientes"]
+            return resumen
+
         # Calcular productos únicos vendidos
         productos_unicos = (
             DetallePedido.objects.filter(pedido__in=queryset)
@@ -270,3 +309,28 @@ class ReporteGuardado(models.Model):
 
     def __str__(self):
         return f"{self.get_tipo_reporte_display()} - {self.nombre}"
+
+
+# Sketches HyperLogLog por día para contar clientes y productos distintos
+class SketchDiario(models.Model):
+    DIMENSIONES = [
+        ("clientes", "Clientes únicos"),
+        ("productos", "Productos únicos vendidos"),
+    ]
+
+    fecha = models.DateField()
+    dimension = models.CharField(max_length=20, choices=DIMENSIONES)
+    registros = models.BinaryField(help_text="Registros del HyperLogLog")
+    fecha_generacion = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["fecha", "dimension"], name="sketch_diario_unico"
+            )
+        ]
+        verbose_name = "Sketch Diario"
+        verbose_name_plural = "Sketches Diarios"
+
+    def __str__(self):
+        return f"{self.get_dimension_display()} - {self.fecha}"
@@ -0,0 +1,76 @@
+# reportes/paralelo.py
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+
+def _max_hilos():
+    return getattr(settings, "REPORTES_MAX_HILOS", 5)
+
+
+def _exportar_snapshot(conexion):
+    """
+    Abre una transacción REPEATABLE READ en la conexión actual y exporta su
+    snapshot para que los hilos lean exactamente los mismos datos.
+    Debe llamarse dentro de un transaction.atomic().
+    """
+    with conexion.cursor() as cursor:
+        cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+        cursor.execute("SELECT pg_export_snapshot()")
+        return cursor.fetchone()[0]
+
+
+def _ejecutar_en_hilo(funcion, args, snapshot, using):
+    """
+    Ejecuta un sub-reporte en un hilo del pool. Django abre una conexión propia
+    por hilo; se cierra al terminar para no dejar conexiones colgadas.
+    """
+    conexion = connections[using]
+    try:
+        if snapshot is None:
+            return funcion(*args)
+
+        with transaction.atomic(using=using):
+            with conexion.cursor() as cursor:
+                cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+                cursor.execute("SET TRANSACTION SNAPSHOT %s", [snapshot])
+            return funcion(*args)
+    finally:
+        conexion.close()
+
+
+def ejecutar_reportes_en_paralelo(tareas, using=DEFAULT_DB_ALIAS):
+    """
+    Ejecuta varios sub-reportes de solo lectura de forma concurrente.
+
+    `tareas` es un diccionario {clave: (funcion, args)} y se devuelve
+    {clave: resultado}. En PostgreSQL todos los hilos comparten el snapshot de
+    una transacción REPEATABLE READ, así que los resultados son consistentes
+    entre sí. Si ya estamos dentro de una transacción (p. ej. en los tests) las
+    otras conexiones no verían sus datos, por lo que se ejecuta en secuencia.
+    """
+    conexion = connections[using]
+    max_hilos = min(_max_hilos(), len(tareas))
+
+    if max_hilos <= 1 or conexion.in_atomic_block:
+        return {clave: funcion(*args) for clave, (funcion, args) in tareas.items()}
+
+    if conexion.vendor != "postgresql":
+        return _ejecutar_pool(tareas, max_hilos, None, using)
+
+    # El snapshot exportado solo es válido mientras su transacción siga abierta
+    with transaction.atomic(using=using):
+        snapshot = _exportar_snapshot(conexion)
+        return _ejecutar_pool(tareas, max_hilos, snapshot, using)
+
+
+def _ejecutar_pool(tareas, max_hilos, snapshot, using):
+    with ThreadPoolExecutor(
+        max_workers=max_hilos, thread_name_prefix="reportes"
+    ) as pool:
+        futuros = {
+            clave: pool.submit(_ejecutar_en_hilo, funcion, args, snapshot, using)
+            for clave, (funcion, args) in tareas.items()
+        }
+        return {clave: futuro.result() for clave, futuro in futuros.items()}
@@ -39,6 +39,17 @@ class ReporteParametrosSerializer(serializers.Serializer):
         return data
 
 
+class ResumenGeneralSerializer(ReporteParametrosSerializer):
+    """
+    Serializer para el reporte de resumen general
+    """
+
+    exact = serializers.BooleanField(
+        default=False,
+        help_text="Calcula clientes y productos únicos de forma exacta (más lento)",
+    )
+
+
 class ProductosVendidosSerializer(ReporteParametrosSerializer):
     """
     Serializer para el reporte de productos más vendidos
@@ -84,6 +95,55 @@ class TopClientesSerializer(ReporteParametrosSerializer):
     )
 
 
+class TopProductosTiempoRealSerializer(serializers.Serializer):
+    """
+    Serializer para el top de productos en tiempo real
+    """
+
+    OPCIONES_VENTANA = [
+        ("hoy", "Hoy"),
+        ("7d", "Últimos 7 días"),
+        ("30d", "Últimos 30 días"),
+    ]
+
+    ventana = serializers.ChoiceField(
+        choices=OPCIONES_VENTANA,
+        default="hoy",
+        help_text="Ventana de tiempo del ranking",
+    )
+    limite = serializers.IntegerField(
+        default=10,
+        min_value=1,
+        max_value=50,
+        help_text="Número máximo de productos a mostrar (1-50)",
+    )
+
+
+class ExportarProductosSerializer(ReporteParametrosSerializer):
+    """
+    Serializer para exportar el ranking de productos a CSV
+    """
+
+    limite = serializers.IntegerField(
+        required=False,
+        min_value=1,
+        help_text="Número máximo de productos a exportar (por defecto, todos)",
+    )
+    comprimir = serializers.BooleanField(
+        default=False, help_text="Entrega el archivo comprimido con gzip"
+    )
+
+
+class ExportarVentasSerializer(VentasPeriodoSerializer):
+    """
+    Serializer para exportar las ventas por período a CSV
+    """
+
+    comprimir = serializers.BooleanField(
+        default=False, help_text="Entrega el archivo comprimido con gzip"
+    )
+
+
 class ComparativaPeriodosSerializer(serializers.Serializer):
     """
     Serializer para comparar dos períodos de tiempo
@@ -184,6 +244,21 @@ class ReporteRapidoSerializer(serializers.Serializer):
             return inicio, ahora
 
 
+class ExportarReporteCompletoSerializer(ReporteRapidoSerializer):
+    """
+    Serializer para exportar el reporte completo a CSV
+    """
+
+    limite = serializers.IntegerField(
+        default=20,
+        min_value=1,
+        help_text="Número máximo de productos más vendidos a incluir",
+    )
+    comprimir = serializers.BooleanField(
+        default=False, help_text="Entrega el archivo comprimido con gzip"
+    )
+
+
 # Serializers para las respuestas (solo lectura)
 class ProductoVendidoResponseSerializer(serializers.Serializer):
     """
@@ -0,0 +1,37 @@
+# reportes/signals.py
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from pedidos.models import Pedido, DetallePedido
+
+from .sketches import invalidar_dia
+from .topk import top_productos_en_vivo
+
+
+@receiver(post_save, sender=Pedido)
+@receiver(post_delete, sender=Pedido)
+def invalidar_sketch_pedido(sender, instance, created=False, **kwargs):
+    # Un pedido nuevo siempre es de hoy, y el día en curso no tiene sketch
+    if not created:
+        invalidar_dia(instance.fecha_pedido)
+
+
+@receiver(post_save, sender=DetallePedido)
+@receiver(post_delete, sender=DetallePedido)
+def invalidar_sketch_detalle(sender, instance, **kwargs):
+    if instance.pedido_id:
+        invalidar_dia(instance.pedido.fecha_pedido)
+
+
+@receiver(post_save, sender=DetallePedido)
+def registrar_venta_top_productos(sender, instance, created, **kwargs):
+    if not created or not instance.pedido_id:
+        return
+
+    producto = instance.producto
+    transaction.on_commit(
+        lambda: top_productos_en_vivo.registrar_venta(
+            producto.id, producto.nombre, instance.cantidad
+        )
+    )
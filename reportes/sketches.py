@@ -0,0 +1,161 @@
+# reportes/sketches.py
+"""
+Conteo aproximado de clientes y productos distintos con sketches diarios.
+
+Cada día cerrado (anterior a hoy) guarda un HyperLogLog por dimensión en
+SketchDiario. Un rango arbitrario se resuelve uniendo los sketches de los días
+completos y agregando de forma exacta los tramos parciales de los extremos
+(incluido el día en curso). Los días que faltan se construyen al vuelo con una
+sola consulta y quedan guardados para las siguientes llamadas.
+"""
+
+from datetime import datetime, time, timedelta
+
+from django.db.models import Min
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from pedidos.models import Pedido, DetallePedido
+
+from .hll import HyperLogLog
+from .models import SketchDiario
+
+DIMENSIONES = ("clientes", "productos")
+
+
+def _inicio_dia(fecha):
+    return timezone.make_aware(
+        datetime.combine(fecha, time.min), timezone.get_current_timezone()
+    )
+
+
+def _pedidos_activos(desde, hasta, incluir_hasta=False):
+    filtro_hasta = "fecha_pedido__lte" if incluir_hasta else "fecha_pedido__lt"
+    return Pedido.objects.filter(
+        activo=True, fecha_pedido__gte=desde, **{filtro_hasta: hasta}
+    )
+
+
+def _ids_exactos(pedidos):
+    """Ids de clientes y productos distintos de un conjunto de pedidos"""
+    return {
+        "clientes": set(pedidos.values_list("usuario_id", flat=True).distinct()),
+        "productos": set(
+            DetallePedido.objects.filter(pedido__in=pedidos)
+            .values_list("producto_id", flat=True)
+            .distinct()
+        ),
+    }
+
+
+def _construir_dias(dias):
+    """Construye y guarda los sketches de los días indicados"""
+    pedidos = _pedidos_activos(
+        _inicio_dia(min(dias)), _inicio_dia(max(dias) + timedelta(days=1))
+    )
+    sketches = {(dia, dim): HyperLogLog() for dia in dias for dim in DIMENSIONES}
+
+    clientes = (
+        pedidos.annotate(dia=TruncDate("fecha_pedido"))
+        .values_list("dia", "usuario_id")
+        .distinct()
+    )
+    productos = (
+        DetallePedido.objects.filter(pedido__in=pedidos)
+        .annotate(dia=TruncDate("pedido__fecha_pedido"))
+        .values_list("dia", "producto_id")
+        .distinct()
+    )
+    for dimension, pares in (("clientes", clientes), ("productos", productos)):
+        for dia, valor in pares.iterator():
+            if (dia, dimension) in sketches:
+                sketches[(dia, dimension)].agregar(valor)
+
+    SketchDiario.objects.bulk_create(
+        [
+            SketchDiario(fecha=dia, dimension=dim, registros=sketch.a_bytes())
+            for (dia, dim), sketch in sketches.items()
+        ],
+        ignore_conflicts=True,
+    )
+    return {clave: sketch.a_bytes() for clave, sketch in sketches.items()}
+
+
+def _sketches_dias(primer_dia, ultimo_dia):
+    """Registros de todos los días del rango, construyendo los que falten"""
+    registros = {
+        (fecha, dimension): bytes(datos)
+        for fecha, dimension, datos in SketchDiario.objects.filter(
+            fecha__gte=primer_dia, fecha__lte=ultimo_dia
+        ).values_list("fecha", "dimension", "registros")
+    }
+
+    total_dias = (ultimo_dia - primer_dia).days + 1
+    faltantes = [
+        dia
+        for dia in (primer_dia + timedelta(days=i) for i in range(total_dias))
+        if any((dia, dim) not in registros for dim in DIMENSIONES)
+    ]
+    if faltantes:
+        registros.update(_construir_dias(faltantes))
+    return registros
+
+
+def contar_distintos_aproximado(fecha_inicio=None, fecha_fin=None):
+    """
+    Devuelve {"clientes": n, "productos": n} con los clientes y productos
+    distintos de los pedidos activos entre fecha_inicio y fecha_fin.
+    """
+    ahora = timezone.now()
+    fecha_fin = fecha_fin or ahora
+    if fecha_inicio is None:
+        fecha_inicio = Pedido.objects.aggregate(primero=Min("fecha_pedido"))["primero"]
+        if fecha_inicio is None:
+            return {dimension: 0 for dimension in DIMENSIONES}
+
+    primer_dia = timezone.localdate(fecha_inicio)
+    if _inicio_dia(primer_dia) < fecha_inicio:
+        primer_dia += timedelta(days=1)
+    # El día de hoy sigue recibiendo pedidos, así que nunca se guarda su sketch
+    ultimo_dia = min(
+        timezone.localdate(fecha_fin) - timedelta(days=1),
+        timezone.localdate(ahora) - timedelta(days=1),
+    )
+
+    if primer_dia > ultimo_dia:
+        exactos = _ids_exactos(_pedidos_activos(fecha_inicio, fecha_fin, True))
+        return {dimension: len(ids) for dimension, ids in exactos.items()}
+
+    # Tramos parciales de los extremos, calculados de forma exacta
+    inicio_tramo = _ids_exactos(_pedidos_activos(fecha_inicio, _inicio_dia(primer_dia)))
+    fin_tramo = _ids_exactos(
+        _pedidos_activos(
+            _inicio_dia(ultimo_dia + timedelta(days=1)), fecha_fin, incluir_hasta=True
+        )
+    )
+
+    registros = _sketches_dias(primer_dia, ultimo_dia)
+    resultado = {}
+    for dimension in DIMENSIONES:
+        extremos = HyperLogLog()
+        extremos.actualizar(inicio_tramo[dimension] | fin_tramo[dimension])
+        sketches = [
+            HyperLogLog.desde_bytes(datos)
+            for (_, dim), datos in registros.items()
+            if dim == dimension
+        ]
+        resultado[dimension] = HyperLogLog.unir(sketches + [extremos]).estimar()
+    return resultado
+
+
+def invalidar_dia(fecha_pedido):
+    """
+    Descarta los sketches del día de un pedido cuando sus datos cambian
+    (pedido desactivado, detalle agregado o eliminado). Se reconstruyen al
+    volver a pedirse.
+    """
+    if fecha_pedido is None:
+        return
+    dia = timezone.localdate(fecha_pedido)
+    if dia < timezone.localdate():
+        SketchDiario.objects.filter(fecha=dia).delete()
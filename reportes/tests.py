@@ -0,0 +1,458 @@
+import csv
+import gzip
+import random
+import threading
+from collections import Counter
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+from unittest import mock, skipIf
+
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from pedidos.models import Carrito, Pedido, DetallePedido
+from productos.models import Categoria, Producto
+from usuarios.models import Rol, Usuario
+
+from .columnar import MotorColumnar, np
+from .exportacion import TAMANO_FRAGMENTO, respuesta_csv
+from .hll import HyperLogLog
+from .models import ReporteManager, SketchDiario
+from . import paralelo
+from .paralelo import ejecutar_reportes_en_paralelo
+from .topk import SpaceSaving, TopProductosEnVivo, top_productos_en_vivo
+
+
+def crear_ventas(productos=5, pedidos=8):
+    """Catálogo chico con pedidos de hoy; devuelve (usuario, productos)"""
+    categoria = Categoria.objects.create(nombre="Libros")
+    catalogo = [
+        Producto.objects.create(
+            nombre=f"Producto {i}",
+            descripcion="",
+            stock=1000,
+            imagen="https://example.com/p.png",
+            precio=Decimal("10.00") + i,
+            categoria=categoria,
+        )
+        for i in range(productos)
+    ]
+    usuario = Usuario.objects.create_user(
+        "cliente@example.com", "clave", nombre_completo="Cliente"
+    )
+    for i in range(pedidos):
+        pedido = Pedido.objects.create(usuario=usuario, total=0)
+        for producto in catalogo[: i % productos + 1]:
+            DetallePedido.objects.create(
+                pedido=pedido,
+                producto=producto,
+                cantidad=i + 1,
+                precio_unitario=producto.precio,
+            )
+        pedido.calcular_total()
+        pedido.save()
+    return usuario, catalogo
+
+
+class HyperLogLogTests(TestCase):
+    def test_error_acotado(self):
+        # Error típico con p=12: 1.6%; se admite hasta 3 desviaciones
+        for cantidad in (100, 1_000, 10_000, 100_000):
+            sketch = HyperLogLog()
+            sketch.actualizar(range(cantidad))
+            error = abs(sketch.estimar() - cantidad) / cantidad
+            self.assertLess(error, 0.05, f"error {error:.3f} con {cantidad}")
+
+    def test_union_equivale_al_conjunto_unido(self):
+        a, b, todo = HyperLogLog(), HyperLogLog(), HyperLogLog()
+        a.actualizar(range(0, 6_000))
+        b.actualizar(range(4_000, 10_000))
+        todo.actualizar(range(0, 10_000))
+
+        unido = HyperLogLog.unir([a, b])
+
+        self.assertEqual(unido.a_bytes(), todo.a_bytes())
+
+    def test_serializacion(self):
+        sketch = HyperLogLog()
+        sketch.actualizar(["a", "b", "c"])
+        copia = HyperLogLog.desde_bytes(sketch.a_bytes())
+        self.assertEqual(copia.estimar(), 3)
+
+
+class ResumenAproximadoTests(TestCase):
+    def setUp(self):
+        categoria = Categoria.objects.create(nombre="Libros")
+        productos = [
+            Producto.objects.create(
+                nombre=f"Producto {i}",
+                descripcion="",
+                stock=1000,
+                imagen="https://example.com/p.png",
+                precio=Decimal("10.00"),
+                categoria=categoria,
+            )
+            for i in range(30)
+        ]
+        usuarios = [
+            Usuario.objects.create_user(
+                f"cliente{i}@example.com", None, nombre_completo=f"Cliente {i}"
+            )
+            for i in range(20)
+        ]
+
+        # Pedidos repartidos en los últimos 10 días
+        ahora = timezone.now()
+        for i in range(60):
+            pedido = Pedido.objects.create(usuario=usuarios[i % 20], total=0)
+            DetallePedido.objects.create(
+                pedido=pedido,
+                producto=productos[i % 30],
+                cantidad=1,
+                precio_unitario=Decimal("10.00"),
+            )
+            Pedido.objects.filter(pk=pedido.pk).update(
+                fecha_pedido=ahora - timedelta(days=i % 10, hours=1)
+            )
+
+        self.fecha_inicio = ahora - timedelta(days=12)
+        self.fecha_fin = ahora
+
+    def test_aproximado_cercano_al_exacto(self):
+        exacto = ReporteManager.resumen_ventas_general(
+            self.fecha_inicio, self.fecha_fin, exacto=True
+        )
+        aproximado = ReporteManager.resumen_ventas_general(
+            self.fecha_inicio, self.fecha_fin, exacto=False
+        )
+
+        for campo in ("clientes_unicos", "productos_unicos_vendidos"):
+            self.assertLessEqual(
+                abs(aproximado[campo] - exacto[campo]), max(1, exacto[campo] * 0.05)
+            )
+        self.assertTrue(SketchDiario.objects.exists())
+
+    def test_desactivar_pedido_invalida_su_dia(self):
+        ReporteManager.resumen_ventas_general(
+            self.fecha_inicio, self.fecha_fin, exacto=False
+        )
+        pedido = Pedido.objects.filter(
+            fecha_pedido__lt=timezone.now() - timedelta(days=2)
+        ).first()
+        dia = timezone.localdate(pedido.fecha_pedido)
+
+        pedido.activo = False
+        pedido.save()
+
+        self.assertFalse(SketchDiario.objects.filter(fecha=dia).exists())
+
+
+class EjecucionParalelaTests(TransactionTestCase):
+    def test_cada_tarea_corre_en_un_hilo_del_pool(self):
+        crear_ventas()
+
+        def tarea(valor):
+            return valor, threading.current_thread().name, Producto.objects.count()
+
+        resultado = ejecutar_reportes_en_paralelo(
+            {"a": (tarea, (1,)), "b": (tarea, (2,))}
+        )
+
+        self.assertEqual(resultado["a"][0], 1)
+        self.assertEqual(resultado["b"][0], 2)
+        for _, hilo, productos in resultado.values():
+            self.assertTrue(hilo.startswith("reportes"))
+            self.assertEqual(productos, 5)
+
+    def test_dentro_de_una_transaccion_corre_en_secuencia(self):
+        def tarea():
+            return threading.current_thread().name
+
+        with transaction.atomic():
+            resultado = ejecutar_reportes_en_paralelo(
+                {"a": (tarea, ()), "b": (tarea, ())}
+            )
+
+        self.assertEqual(set(resultado.values()), {threading.current_thread().name})
+
+    def test_reporte_rapido_igual_a_los_reportes_sueltos(self):
+        usuario, _ = crear_ventas()
+        cliente = APIClient()
+        cliente.force_authenticate(usuario)
+
+        respuesta = cliente.get("/Libreria/reportes/reporte-rapido/?periodo=hoy")
+
+        self.assertEqual(respuesta.status_code, 200)
+        rango = respuesta.data["rango_fechas"]
+        inicio, fin = rango["fecha_inicio"], rango["fecha_fin"]
+        self.assertEqual(
+            respuesta.data["resumen_general"],
+            ReporteManager.resumen_ventas_general(inicio, fin),
+        )
+        self.assertEqual(
+            respuesta.data["productos_mas_vendidos"],
+            ReporteManager.productos_mas_vendidos(inicio, fin, 10),
+        )
+        self.assertEqual(
+            respuesta.data["top_clientes"], ReporteManager.top_clientes(inicio, fin, 5)
+        )
+
+    def test_benchmark_mide_el_camino_en_paralelo_sin_dejar_datos(self):
+        crear_ventas()
+        # Un rol y un usuario que ya se llaman "benchmark" no se tocan
+        rol = Rol.objects.create(nombre="benchmark")
+        usuario = Usuario.objects.create_user(
+            "benchmark@ejemplo.com", nombre_completo="Existente", rol=rol
+        )
+        carrito = Carrito.objects.create(usuario=usuario)
+        pedidos = Pedido.objects.count()
+        usuarios = Usuario.objects.count()
+        salida = StringIO()
+
+        with mock.patch.object(
+            paralelo, "_ejecutar_pool", wraps=paralelo._ejecutar_pool
+        ) as pool:
+            call_command(
+                "benchmark_endpoints",
+                repeticiones=2,
+                calentamiento=0,
+                solo=["reportes-reporte-rapido", "carrito-convertir-a-pedido"],
+                stdout=salida,
+            )
+
+        self.assertEqual(pool.call_count, 2)
+        # Autenticado con un token de acceso real
+        self.assertRegex(salida.getvalue(), r"reportes-reporte-rapido +200 ")
+        self.assertRegex(salida.getvalue(), r"carrito-convertir-a-pedido +200 ")
+        # La conversión se revierte y lo creado por el benchmark se borra
+        self.assertEqual(Pedido.objects.count(), pedidos)
+        self.assertEqual(Usuario.objects.count(), usuarios)
+        self.assertEqual(
+            list(Rol.objects.values_list("nombre", flat=True)), ["benchmark"]
+        )
+        self.assertFalse(rol.permisos.exists())
+        carrito.refresh_from_db()
+        self.assertTrue(carrito.activo)
+
+
+@skipIf(np is None, "NumPy no está instalado")
+class MotorColumnarTests(TestCase):
+    CAMPOS_PRODUCTO = ("producto__id", "cantidad_vendida", "veces_comprado")
+    CAMPOS_PERIODO = (
+        "periodo",
+        "total_pedidos",
+        "total_ingresos",
+        "total_productos_vendidos",
+    )
+
+    def setUp(self):
+        self.usuario, self.productos = crear_ventas()
+        self.motor = MotorColumnar(intervalo_refresco=0)
+        self.inicio = timezone.now() - timedelta(days=3)
+        self.fin = timezone.now() + timedelta(days=1)
+
+    def assertMismasFilas(self, esperado, obtenido, campos):
+        self.assertEqual(
+            [tuple(fila[campo] for campo in campos) for fila in esperado],
+            [tuple(fila[campo] for campo in campos) for fila in obtenido],
+        )
+
+    def test_productos_mas_vendidos_igual_al_orm(self):
+        for args in ((None, None, 10), (self.inicio, self.fin, 3)):
+            self.assertMismasFilas(
+                ReporteManager.productos_mas_vendidos(*args),
+                self.motor.productos_mas_vendidos(*args),
+                self.CAMPOS_PRODUCTO,
+            )
+
+    def test_ventas_por_periodo_igual_al_orm(self):
+        for agrupar_por in ("dia", "semana", "mes", "año"):
+            self.assertMismasFilas(
+                ReporteManager.ventas_por_periodo(self.inicio, self.fin, agrupar_por),
+                self.motor.ventas_por_periodo(self.inicio, self.fin, agrupar_por),
+                self.CAMPOS_PERIODO,
+            )
+
+    def test_refresco_incremental_incorpora_pedidos_nuevos(self):
+        self.motor.productos_mas_vendidos()
+        pedido = Pedido.objects.create(usuario=self.usuario, total=0)
+        DetallePedido.objects.create(
+            pedido=pedido,
+            producto=self.productos[-1],
+            cantidad=500,
+            precio_unitario=Decimal("1.00"),
+        )
+        pedido.calcular_total()
+        pedido.save()
+
+        self.assertMismasFilas(
+            ReporteManager.productos_mas_vendidos(),
+            self.motor.productos_mas_vendidos(),
+            self.CAMPOS_PRODUCTO,
+        )
+        self.assertMismasFilas(
+            ReporteManager.ventas_por_periodo(),
+            self.motor.ventas_por_periodo(),
+            self.CAMPOS_PERIODO,
+        )
+
+
+class SpaceSavingTests(TestCase):
+    def test_garantias_del_resumen(self):
+        rnd = random.Random(7)
+        # Zipf aproximado: pocos productos concentran las ventas
+        ventas = [int(rnd.paretovariate(1.2)) for _ in range(20_000)]
+        reales = Counter(ventas)
+        resumen = SpaceSaving(50)
+        for producto in ventas:
+            resumen.agregar(producto)
+
+        self.assertEqual(len(resumen.contadores), 50)
+        self.assertEqual(
+            sum(conteo for conteo, _ in resumen.contadores.values()), len(ventas)
+        )
+        for producto, (conteo, error) in resumen.contadores.items():
+            self.assertLessEqual(conteo - error, reales[producto])
+            self.assertGreaterEqual(conteo, reales[producto])
+        for producto, cantidad in reales.items():
+            if cantidad > len(ventas) / 50:
+                self.assertIn(producto, resumen.contadores)
+
+    def test_reemplaza_al_de_menor_conteo(self):
+        resumen = SpaceSaving(2)
+        resumen.agregar("a", 5)
+        resumen.agregar("b", 1)
+        resumen.agregar("b", 1)
+        resumen.agregar("c", 1)
+
+        self.assertEqual(resumen.top(2), [("a", 5, 0), ("c", 3, 2)])
+
+    def test_combinar(self):
+        a, b = SpaceSaving(3), SpaceSaving(3)
+        for item, peso in (("x", 4), ("y", 2), ("z", 1)):
+            a.agregar(item, peso)
+        for item, peso in (("y", 5), ("w", 1)):
+            b.agregar(item, peso)
+
+        combinado = SpaceSaving.combinar([a, b], 2)
+        combinado.agregar("v", 1)
+
+        self.assertEqual(combinado.top(2), [("y", 7, 0), ("v", 5, 4)])
+
+
+class TopProductosEnVivoTests(TestCase):
+    def setUp(self):
+        self.usuario, self.productos = crear_ventas()
+
+    def test_sincroniza_con_la_base(self):
+        top = TopProductosEnVivo(capacidad=10).top("hoy", 3)
+
+        esperado = ReporteManager.productos_mas_vendidos(limite=3)
+        self.assertEqual(
+            [(fila["producto__id"], fila["cantidad_vendida"]) for fila in top],
+            [(fila["producto__id"], fila["cantidad_vendida"]) for fila in esperado],
+        )
+
+    def test_ventas_durante_la_sincronizacion_no_se_pierden(self):
+        top = TopProductosEnVivo(capacidad=10)
+        leer_base = top._leer_base
+        producto = self.productos[-1]
+
+        def leer_base_con_venta():
+            resultado = leer_base()
+            # Confirmada después de la lectura, antes de reemplazar el estado
+            top.registrar_venta(producto.pk, producto.nombre, 1000)
+            return resultado
+
+        top._leer_base = leer_base_con_venta
+        top.sincronizar()
+
+        primero = top.top("hoy", 1)[0]
+        self.assertEqual(primero["producto__id"], producto.pk)
+        self.assertGreaterEqual(primero["cantidad_vendida"], 1000)
+
+    def test_endpoint_refleja_ventas_confirmadas(self):
+        cliente = APIClient()
+        cliente.force_authenticate(self.usuario)
+        producto = self.productos[0]
+        # El resumen del proceso puede venir de otro test
+        top_productos_en_vivo.sincronizar()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            pedido = Pedido.objects.create(usuario=self.usuario, total=0)
+            DetallePedido.objects.create(
+                pedido=pedido,
+                producto=producto,
+                cantidad=1000,
+                precio_unitario=producto.precio,
+            )
+        respuesta = cliente.get(
+            "/Libreria/reportes/top-productos-tiempo-real/?ventana=7d&limite=3"
+        )
+
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.data["productos"][0]["producto__id"], producto.pk)
+
+
+class ExportacionCsvTests(TestCase):
+    EXPORTACIONES = (
+        "exportar-productos-csv",
+        "exportar-ventas-csv",
+        "exportar-reporte-completo-csv",
+    )
+
+    def setUp(self):
+        usuario, self.productos = crear_ventas()
+        self.cliente = APIClient()
+        self.cliente.force_authenticate(usuario)
+
+    def descargar(self, url):
+        respuesta = self.cliente.get(url)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertTrue(respuesta.streaming)
+        return respuesta, b"".join(respuesta.streaming_content)
+
+    def test_exportaciones_en_streaming(self):
+        for nombre in self.EXPORTACIONES:
+            respuesta, contenido = self.descargar(
+                f"/Libreria/reportes/{nombre}/?periodo=ultimo_mes"
+            )
+            self.assertIn("attachment;", respuesta["Content-Disposition"])
+            self.assertTrue(contenido.decode("utf-8").strip())
+
+    def test_comprimido_igual_al_plano(self):
+        # El encabezado lleva la fecha del período, que no debe cambiar entre
+        # una descarga y la otra
+        ahora = timezone.now()
+        for nombre in self.EXPORTACIONES:
+            url = f"/Libreria/reportes/{nombre}/?periodo=ultimo_mes"
+            with mock.patch.object(timezone, "now", return_value=ahora):
+                _, plano = self.descargar(url)
+                respuesta, comprimido = self.descargar(url + "&comprimir=true")
+
+            self.assertEqual(respuesta["Content-Type"], "application/gzip")
+            self.assertIn('.csv.gz"', respuesta["Content-Disposition"])
+            self.assertEqual(gzip.decompress(comprimido), plano)
+
+    def test_ranking_completo_y_con_limite(self):
+        _, contenido = self.descargar("/Libreria/reportes/exportar-productos-csv/")
+        filas = list(csv.reader(contenido.decode("utf-8").splitlines()))
+        self.assertEqual(len(filas), len(self.productos) + 1)
+        self.assertEqual(filas[0][0], "ID Producto")
+
+        _, contenido = self.descargar(
+            "/Libreria/reportes/exportar-productos-csv/?limite=2"
+        )
+        self.assertEqual(len(contenido.decode("utf-8").splitlines()), 3)
+
+    def test_fragmentos_acotados(self):
+        filas = ([i, "x" * 100] for i in range(5_000))
+        fragmentos = list(respuesta_csv(filas, "prueba.csv").streaming_content)
+
+        self.assertGreater(len(fragmentos), 1)
+        self.assertTrue(all(len(f) < 2 * TAMANO_FRAGMENTO for f in fragmentos))
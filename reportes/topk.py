@@ -0,0 +1,202 @@
+# reportes/topk.py
+"""
+Top-K de productos más vendidos en tiempo real, servido desde memoria.
+
+Cada día tiene un resumen Space-Saving (heavy hitters) que se actualiza con
+cada DetallePedido creado. Las ventanas "hoy", "7d" y "30d" se obtienen
+combinando los resúmenes diarios, sin consultar la base de datos.
+
+El estado es por proceso: al primer uso (y cada TOPK_RESINCRONIZACION
+segundos) se sincroniza con la base de datos para incorporar las ventas
+registradas por otros procesos. Las ventas registradas mientras se lee la base
+se guardan aparte y se suman al resultado; una venta confirmada justo cuando
+empieza la lectura puede contarse dos veces, dentro del error del resumen.
+"""
+
+import heapq
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from pedidos.models import DetallePedido
+
+VENTANAS = {"hoy": 1, "7d": 7, "30d": 30}
+
+
+class SpaceSaving:
+    """
+    Resumen Space-Saving con capacidad fija. Para cada producto guarda su
+    conteo estimado y el error máximo de ese conteo; cualquier producto con
+    ventas reales mayores a total / capacidad está garantizado en el resumen.
+    """
+
+    def __init__(self, capacidad):
+        self.capacidad = capacidad
+        self.contadores = {}
+        # (conteo, item) de cada contador; al crecer un conteo la entrada
+        # anterior queda vieja y se descarta al llegar a la cima
+        self._monticulo = []
+
+    def agregar(self, item, peso=1):
+        contador = self.contadores.get(item)
+        if contador is not None:
+            contador[0] += peso
+        elif len(self.contadores) < self.capacidad:
+            contador = self.contadores[item] = [peso, 0]
+        else:
+            # Reemplaza al de menor conteo heredando su conteo como error
+            conteo_minimo = self._quitar_minimo()
+            contador = self.contadores[item] = [conteo_minimo + peso, conteo_minimo]
+        heapq.heappush(self._monticulo, (contador[0], item))
+        if len(self._monticulo) > 2 * self.capacidad:
+            self._reconstruir_monticulo()
+
+    def _quitar_minimo(self):
+        while True:
+            conteo, item = heapq.heappop(self._monticulo)
+            contador = self.contadores.get(item)
+            if contador is not None and contador[0] == conteo:
+                del self.contadores[item]
+                return conteo
+
+    def _reconstruir_monticulo(self):
+        self._monticulo = [
+            (conteo, item) for item, (conteo, _) in self.contadores.items()
+        ]
+        heapq.heapify(self._monticulo)
+
+    def top(self, n):
+        ordenados = sorted(
+            self.contadores.items(), key=lambda par: par[1][0], reverse=True
+        )
+        return [(item, conteo, error) for item, (conteo, error) in ordenados[:n]]
+
+    @classmethod
+    def combinar(cls, resumenes, capacidad):
+        combinado = cls(capacidad)
+        totales = {}
+        for resumen in resumenes:
+            for item, (conteo, error) in resumen.contadores.items():
+                acumulado = totales.setdefault(item, [0, 0])
+                acumulado[0] += conteo
+                acumulado[1] += error
+        mayores = sorted(totales.items(), key=lambda par: par[1][0], reverse=True)
+        combinado.contadores = dict(mayores[:capacidad])
+        combinado._reconstruir_monticulo()
+        return combinado
+
+
+class TopProductosEnVivo:
+    def __init__(self, capacidad=200, intervalo_sincronizacion=300):
+        self.capacidad = capacidad
+        self.intervalo_sincronizacion = intervalo_sincronizacion
+        self._lock = threading.Lock()
+        # Lo tiene quien esté sincronizando
+        self._lock_sincronizacion = threading.Lock()
+        self._dias = {}
+        self._nombres = {}
+        # Ventas registradas durante una sincronización (None fuera de ella)
+        self._pendientes = None
+        self._ultima_sincronizacion = None
+
+    def _agregar(self, dias, nombres, producto_id, nombre, cantidad, dia):
+        resumen = dias.get(dia)
+        if resumen is None:
+            resumen = dias[dia] = SpaceSaving(self.capacidad)
+        resumen.agregar(producto_id, cantidad)
+        nombres[producto_id] = nombre
+
+    def registrar_venta(self, producto_id, nombre, cantidad, dia=None):
+        venta = (producto_id, nombre, cantidad, dia or timezone.localdate())
+        with self._lock:
+            self._agregar(self._dias, self._nombres, *venta)
+            if self._pendientes is not None:
+                self._pendientes.append(venta)
+
+    def sincronizar(self):
+        """Reconstruye los resúmenes de los últimos 30 días desde la base de datos"""
+        with self._lock_sincronizacion:
+            with self._lock:
+                self._pendientes = []
+            try:
+                dias, nombres = self._leer_base()
+            finally:
+                with self._lock:
+                    pendientes, self._pendientes = self._pendientes, None
+
+            with self._lock:
+                for venta in pendientes:
+                    self._agregar(dias, nombres, *venta)
+                self._dias = dias
+                self._nombres = nombres
+                self._ultima_sincronizacion = time.monotonic()
+
+    def _leer_base(self):
+        hoy = timezone.localdate()
+        desde = hoy - timedelta(days=max(VENTANAS.values()) - 1)
+        filas = (
+            DetallePedido.objects.filter(pedido__fecha_pedido__date__gte=desde)
+            .annotate(dia=TruncDate("pedido__fecha_pedido"))
+            .values("dia", "producto_id", "producto__nombre")
+            .annotate(cantidad=Sum("cantidad"))
+        )
+
+        dias, nombres = {}, {}
+        for fila in filas.iterator():
+            self._agregar(
+                dias,
+                nombres,
+                fila["producto_id"],
+                fila["producto__nombre"],
+                fila["cantidad"],
+                fila["dia"],
+            )
+        return dias, nombres
+
+    def _asegurar_sincronizado(self):
+        ultima = self._ultima_sincronizacion
+        if ultima is None:
+            self.sincronizar()
+        elif (
+            time.monotonic() - ultima >= self.intervalo_sincronizacion
+            # Si otro hilo ya está sincronizando se responde con lo que hay
+            and not self._lock_sincronizacion.locked()
+        ):
+            self.sincronizar()
+
+    def top(self, ventana="hoy", limite=10):
+        """Devuelve los `limite` productos más vendidos de la ventana indicada"""
+        self._asegurar_sincronizado()
+        hoy = timezone.localdate()
+        dias = [hoy - timedelta(days=i) for i in range(VENTANAS[ventana])]
+
+        with self._lock:
+            # Descartar días que ya salieron de la ventana más larga
+            limite_dias = hoy - timedelta(days=max(VENTANAS.values()))
+            for dia in [d for d in self._dias if d <= limite_dias]:
+                del self._dias[dia]
+
+            resumenes = [self._dias[dia] for dia in dias if dia in self._dias]
+            combinado = SpaceSaving.combinar(resumenes, self.capacidad)
+            nombres = self._nombres
+
+            return [
+                {
+                    "producto__id": producto_id,
+                    "producto__nombre": nombres.get(producto_id),
+                    "cantidad_vendida": conteo,
+                    "error_maximo": error,
+                }
+                for producto_id, conteo, error in combinado.top(limite)
+            ]
+
+
+top_productos_en_vivo = TopProductosEnVivo(
+    capacidad=getattr(settings, "TOPK_CAPACIDAD", 200),
+    intervalo_sincronizacion=getattr(settings, "TOPK_RESINCRONIZACION", 300),
+)
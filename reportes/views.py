@@ -7,13 +7,22 @@ from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 
 from .models import ReporteManager
+from .columnar import obtener_motor_reportes
+from .exportacion import respuesta_csv
+from .paralelo import ejecutar_reportes_en_paralelo
+from .topk import top_productos_en_vivo
 from .serializers import (
     ReporteParametrosSerializer,
+    ResumenGeneralSerializer,
     ProductosVendidosSerializer,
     VentasPeriodoSerializer,
     TopClientesSerializer,
+    TopProductosTiempoRealSerializer,
     ComparativaPeriodosSerializer,
     ReporteRapidoSerializer,
+    ExportarProductosSerializer,
+    ExportarVentasSerializer,
+    ExportarReporteCompletoSerializer,
     ProductoVendidoResponseSerializer,
     VentaPeriodoResponseSerializer,
     ResumenGeneralResponseSerializer,
@@ -22,11 +31,11 @@ from .serializers import (
     ComparativaResponseSerializer,
 )
 
-from django.http import HttpResponse
-import csv
-import json
 from datetime import datetime
 
+# Filas que se traen por viaje a la base de datos al exportar
+TAMANO_LOTE_EXPORTACION = 2000
+
 
 class ReporteViewSet(viewsets.ViewSet):
     """
@@ -69,8 +78,8 @@ class ReporteViewSet(viewsets.ViewSet):
         fecha_fin = serializer.validated_data.get("fecha_fin")
         limite = serializer.validated_data.get("limite", 10)
 
-        # Generar el reporte
-        productos = ReporteManager.productos_mas_vendidos(
+        # Generar el reporte (con el motor columnar si está habilitado)
+        productos = obtener_motor_reportes().productos_mas_vendidos(
             fecha_inicio=fecha_inicio, fecha_fin=fecha_fin, limite=limite
         )
 
@@ -86,6 +95,36 @@ class ReporteViewSet(viewsets.ViewSet):
             }
         )
 
+    @swagger_auto_schema(
+        method="get",
+        query_serializer=TopProductosTiempoRealSerializer,
+        responses={200: "Top de productos más vendidos en tiempo real"},
+        operation_description=(
+            "Obtiene los productos más vendidos de hoy, los últimos 7 o 30 días "
+            "desde memoria, sin consultar la base de datos"
+        ),
+    )
+    @action(detail=False, methods=["get"], url_path="top-productos-tiempo-real")
+    def top_productos_tiempo_real(self, request):
+        """
+        Top de productos más vendidos para refrescar el dashboard cada pocos segundos
+        """
+        serializer = TopProductosTiempoRealSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+
+        ventana = serializer.validated_data.get("ventana", "hoy")
+        limite = serializer.validated_data.get("limite", 10)
+
+        productos = top_productos_en_vivo.top(ventana=ventana, limite=limite)
+
+        return Response(
+            {
+                "productos": productos,
+                "parametros": {"ventana": ventana, "limite": limite},
+                "total_registros": len(productos),
+            }
+        )
+
     @swagger_auto_schema(
         method="get",
         query_serializer=VentasPeriodoSerializer,
@@ -104,7 +143,7 @@ class ReporteViewSet(viewsets.ViewSet):
         fecha_fin = serializer.validated_data.get("fecha_fin")
         agrupar_por = serializer.validated_data.get("agrupar_por", "dia")
 
-        ventas = ReporteManager.ventas_por_periodo(
+        ventas = obtener_motor_reportes().ventas_por_periodo(
             fecha_inicio=fecha_inicio, fecha_fin=fecha_fin, agrupar_por=agrupar_por
         )
 
@@ -122,29 +161,37 @@ class ReporteViewSet(viewsets.ViewSet):
 
     @swagger_auto_schema(
         method="get",
-        query_serializer=ReporteParametrosSerializer,
+        query_serializer=ResumenGeneralSerializer,
         responses={200: "Resumen general de ventas"},
-        operation_description="Obtiene un resumen general de las ventas en un período",
+        operation_description=(
+            "Obtiene un resumen general de las ventas en un período. "
+            "Los clientes y productos únicos son aproximados salvo con exact=true"
+        ),
     )
     @action(detail=False, methods=["get"], url_path="resumen-general")
     def resumen_general(self, request):
         """
         Obtiene un resumen general de ventas
         """
-        serializer = ReporteParametrosSerializer(data=request.query_params)
+        serializer = ResumenGeneralSerializer(data=request.query_params)
         serializer.is_valid(raise_exception=True)
 
         fecha_inicio = serializer.validated_data.get("fecha_inicio")
         fecha_fin = serializer.validated_data.get("fecha_fin")
+        exact = serializer.validated_data.get("exact", False)
 
         resumen = ReporteManager.resumen_ventas_general(
-            fecha_inicio=fecha_inicio, fecha_fin=fecha_fin
+            fecha_inicio=fecha_inicio, fecha_fin=fecha_fin, exacto=exact
         )
 
         return Response(
             {
                 "resumen": resumen,
-                "parametros": {"fecha_inicio": fecha_inicio, "fecha_fin": fecha_fin},
+                "parametros": {
+                    "fecha_inicio": fecha_inicio,
+                    "fecha_fin": fecha_fin,
+                    "exact": exact,
+                },
             }
         )
 
@@ -252,65 +299,67 @@ class ReporteViewSet(viewsets.ViewSet):
         periodo = serializer.validated_data["periodo"]
         fecha_inicio, fecha_fin = serializer.get_fechas_periodo(periodo)
 
-        # Generar todos los reportes para el período
-        resumen = ReporteManager.resumen_ventas_general(fecha_inicio, fecha_fin)
-        productos_vendidos = ReporteManager.productos_mas_vendidos(
-            fecha_inicio, fecha_fin, 10
-        )
-        top_clientes = ReporteManager.top_clientes(fecha_inicio, fecha_fin, 5)
-        ventas_diarias = ReporteManager.ventas_por_periodo(
-            fecha_inicio, fecha_fin, "dia"
-        )
-        efectividad = ReporteManager.productos_con_ofertas_efectividad(
-            fecha_inicio, fecha_fin
+        # Generar todos los reportes para el período (son independientes,
+        # así que se ejecutan en paralelo sobre el mismo snapshot)
+        reportes = ejecutar_reportes_en_paralelo(
+            {
+                "resumen_general": (
+                    ReporteManager.resumen_ventas_general,
+                    (fecha_inicio, fecha_fin),
+                ),
+                "productos_mas_vendidos": (
+                    ReporteManager.productos_mas_vendidos,
+                    (fecha_inicio, fecha_fin, 10),
+                ),
+                "top_clientes": (
+                    ReporteManager.top_clientes,
+                    (fecha_inicio, fecha_fin, 5),
+                ),
+                "ventas_por_dia": (
+                    ReporteManager.ventas_por_periodo,
+                    (fecha_inicio, fecha_fin, "dia"),
+                ),
+                "efectividad_ofertas": (
+                    ReporteManager.productos_con_ofertas_efectividad,
+                    (fecha_inicio, fecha_fin),
+                ),
+            }
         )
 
         return Response(
             {
                 "periodo": periodo,
                 "rango_fechas": {"fecha_inicio": fecha_inicio, "fecha_fin": fecha_fin},
-                "resumen_general": resumen,
-                "productos_mas_vendidos": productos_vendidos,
-                "top_clientes": top_clientes,
-                "ventas_por_dia": ventas_diarias,
-                "efectividad_ofertas": efectividad,
+                **reportes,
             }
         )
 
     @swagger_auto_schema(
         method="get",
-        query_serializer=ProductosVendidosSerializer,
+        query_serializer=ExportarProductosSerializer,
         responses={200: "Archivo CSV con productos más vendidos"},
         operation_description="Descarga un CSV con los productos más vendidos",
     )
     @action(detail=False, methods=["get"], url_path="exportar-productos-csv")
     def exportar_productos_csv(self, request):
         """
-        Exporta los productos más vendidos a CSV
+        Exporta los productos más vendidos a CSV (todo el ranking si no hay límite)
         """
-        serializer = ProductosVendidosSerializer(data=request.query_params)
+        serializer = ExportarProductosSerializer(data=request.query_params)
         serializer.is_valid(raise_exception=True)
 
         fecha_inicio = serializer.validated_data.get("fecha_inicio")
         fecha_fin = serializer.validated_data.get("fecha_fin")
-        limite = serializer.validated_data.get("limite", 10)
+        limite = serializer.validated_data.get("limite")
+        comprimir = serializer.validated_data.get("comprimir", False)
 
-        productos = ReporteManager.productos_mas_vendidos(
+        productos = ReporteManager.productos_mas_vendidos_queryset(
             fecha_inicio=fecha_inicio, fecha_fin=fecha_fin, limite=limite
         )
 
-        # Crear respuesta CSV
-        response = HttpResponse(content_type="text/csv; charset=utf-8")
-        response["Content-Disposition"] = (
-            'attachment; filename="productos_mas_vendidos.csv"'
-        )
-        response["Access-Control-Expose-Headers"] = "Content-Disposition"
-
-        writer = csv.writer(response)
-
-        # Escribir encabezados
-        writer.writerow(
-            [
+        def filas():
+            # Escribir encabezados
+            yield [
                 "ID Producto",
                 "Nombre Producto",
                 "Precio Actual",
@@ -320,12 +369,10 @@ class ReporteViewSet(viewsets.ViewSet):
                 "Ingreso Total",
                 "Precio Promedio Venta",
             ]
-        )
 
-        # Escribir datos
-        for producto in productos:
-            writer.writerow(
-                [
+            # Escribir datos a medida que llegan de la base de datos
+            for producto in productos.iterator(chunk_size=TAMANO_LOTE_EXPORTACION):
+                yield [
                     producto["producto__id"],
                     producto["producto__nombre"],
                     producto["producto__precio"],
@@ -335,13 +382,12 @@ class ReporteViewSet(viewsets.ViewSet):
                     producto["ingreso_total"],
                     producto["precio_promedio_venta"],
                 ]
-            )
 
-        return response
+        return respuesta_csv(filas(), "productos_mas_vendidos.csv", comprimir)
 
     @swagger_auto_schema(
         method="get",
-        query_serializer=VentasPeriodoSerializer,
+        query_serializer=ExportarVentasSerializer,
         responses={200: "Archivo CSV con ventas por período"},
         operation_description="Descarga un CSV con las ventas agrupadas por período",
     )
@@ -350,29 +396,21 @@ class ReporteViewSet(viewsets.ViewSet):
         """
         Exporta las ventas por período a CSV
         """
-        serializer = VentasPeriodoSerializer(data=request.query_params)
+        serializer = ExportarVentasSerializer(data=request.query_params)
         serializer.is_valid(raise_exception=True)
 
         fecha_inicio = serializer.validated_data.get("fecha_inicio")
         fecha_fin = serializer.validated_data.get("fecha_fin")
         agrupar_por = serializer.validated_data.get("agrupar_por", "dia")
+        comprimir = serializer.validated_data.get("comprimir", False)
 
-        ventas = ReporteManager.ventas_por_periodo(
+        ventas = ReporteManager.ventas_por_periodo_queryset(
             fecha_inicio=fecha_inicio, fecha_fin=fecha_fin, agrupar_por=agrupar_por
         )
 
-        # Crear respuesta CSV
-        response = HttpResponse(content_type="text/csv; charset=utf-8")
-        response["Content-Disposition"] = (
-            f'attachment; filename="ventas_por_{agrupar_por}.csv"'
-        )
-        response["Access-Control-Expose-Headers"] = "Content-Disposition"
-
-        writer = csv.writer(response)
-
-        # Escribir encabezados
-        writer.writerow(
-            [
+        def filas():
+            # Escribir encabezados
+            yield [
                 "Período",
                 "Total Pedidos",
                 "Total Ingresos",
@@ -380,12 +418,10 @@ class ReporteViewSet(viewsets.ViewSet):
                 "Ingreso Promedio por Pedido",
                 "Descuento Promedio (%)",
             ]
-        )
 
-        # Escribir datos
-        for venta in ventas:
-            writer.writerow(
-                [
+            # Escribir datos a medida que llegan de la base de datos
+            for venta in ventas.iterator(chunk_size=TAMANO_LOTE_EXPORTACION):
+                yield [
                     venta["periodo"].strftime("%Y-%m-%d %H:%M:%S"),
                     venta["total_pedidos"],
                     venta["total_ingresos"],
@@ -393,13 +429,12 @@ class ReporteViewSet(viewsets.ViewSet):
                     venta["ingreso_promedio_pedido"],
                     venta["descuento_promedio"],
                 ]
-            )
 
-        return response
+        return respuesta_csv(filas(), f"ventas_por_{agrupar_por}.csv", comprimir)
 
     @swagger_auto_schema(
         method="get",
-        query_serializer=ReporteRapidoSerializer,
+        query_serializer=ExportarReporteCompletoSerializer,
         responses={200: "Archivo CSV con reporte completo"},
         operation_description="Descarga un CSV con un reporte completo predefinido",
     )
@@ -408,68 +443,66 @@ class ReporteViewSet(viewsets.ViewSet):
         """
         Exporta un reporte completo a CSV
         """
-        serializer = ReporteRapidoSerializer(data=request.query_params)
+        serializer = ExportarReporteCompletoSerializer(data=request.query_params)
         serializer.is_valid(raise_exception=True)
 
         periodo = serializer.validated_data["periodo"]
+        limite = serializer.validated_data.get("limite", 20)
+        comprimir = serializer.validated_data.get("comprimir", False)
         fecha_inicio, fecha_fin = serializer.get_fechas_periodo(periodo)
 
         # Generar datos
         resumen = ReporteManager.resumen_ventas_general(fecha_inicio, fecha_fin)
-        productos_vendidos = ReporteManager.productos_mas_vendidos(
-            fecha_inicio, fecha_fin, 20
+        productos_vendidos = ReporteManager.productos_mas_vendidos_queryset(
+            fecha_inicio, fecha_fin, limite
         )
 
-        # Crear respuesta CSV
-        response = HttpResponse(content_type="text/csv; charset=utf-8")
-        response["Content-Disposition"] = (
-            f'attachment; filename="reporte_completo_{periodo}.csv"'
-        )
-        response["Access-Control-Expose-Headers"] = "Content-Disposition"
-
-        writer = csv.writer(response)
-
-        # Sección: Resumen General
-        writer.writerow(["=== RESUMEN GENERAL ==="])
-        writer.writerow(["Período", periodo])
-        writer.writerow(["Fecha Inicio", fecha_inicio.strftime("%Y-%m-%d %H:%M:%S")])
-        writer.writerow(["Fecha Fin", fecha_fin.strftime("%Y-%m-%d %H:%M:%S")])
-        writer.writerow([])
-
-        writer.writerow(["Métrica", "Valor"])
-        writer.writerow(["Total Pedidos", resumen.get("total_pedidos", 0)])
-        writer.writerow(["Total Ingresos", resumen.get("total_ingresos", 0)])
-        writer.writerow(["Ingreso Promedio", resumen.get("ingreso_promedio", 0)])
-        writer.writerow(
-            ["Descuento Promedio (%)", resumen.get("descuento_promedio", 0)]
-        )
-        writer.writerow(
-            ["Total Productos Vendidos", resumen.get("total_productos_vendidos", 0)]
-        )
-        writer.writerow(
-            ["Productos Únicos Vendidos", resumen.get("productos_unicos_vendidos", 0)]
-        )
-        writer.writerow(["Clientes Únicos", resumen.get("clientes_unicos", 0)])
-        writer.writerow([])
-
-        # Sección: Productos Más Vendidos
-        writer.writerow(["=== PRODUCTOS MÁS VENDIDOS ==="])
-        writer.writerow(
-            ["ID", "Nombre", "Cantidad Vendida", "Veces Comprado", "Ingreso Total"]
-        )
+        def filas():
+            # Sección: Resumen General
+            yield ["=== RESUMEN GENERAL ==="]
+            yield ["Período", periodo]
+            yield ["Fecha Inicio", fecha_inicio.strftime("%Y-%m-%d %H:%M:%S")]
+            yield ["Fecha Fin", fecha_fin.strftime("%Y-%m-%d %H:%M:%S")]
+            yield []
+
+            yield ["Métrica", "Valor"]
+            yield ["Total Pedidos", resumen.get("total_pedidos", 0)]
+            yield ["Total Ingresos", resumen.get("total_ingresos", 0)]
+            yield ["Ingreso Promedio", resumen.get("ingreso_promedio", 0)]
+            yield ["Descuento Promedio (%)", resumen.get("descuento_promedio", 0)]
+            yield [
+                "Total Productos Vendidos",
+                resumen.get("total_productos_vendidos", 0),
+            ]
+            yield [
+                "Productos Únicos Vendidos",
+                resumen.get("productos_unicos_vendidos", 0),
+            ]
+            yield ["Clientes Únicos", resumen.get("clientes_unicos", 0)]
+            yield []
+
+            # Sección: Productos Más Vendidos
+            yield ["=== PRODUCTOS MÁS VENDIDOS ==="]
+            yield [
+                "ID",
+                "Nombre",
+                "Cantidad Vendida",
+                "Veces Comprado",
+                "Ingreso Total",
+            ]
 
-        for producto in productos_vendidos:
-            writer.writerow(
-                [
+            for producto in productos_vendidos.iterator(
+                chunk_size=TAMANO_LOTE_EXPORTACION
+            ):
+                yield [
                     producto["producto__id"],
                     producto["producto__nombre"],
                     producto["cantidad_vendida"],
                     producto["veces_comprado"],
                     producto["ingreso_total"],
                 ]
-            )
 
-        return response
+        return respuesta_csv(filas(), f"reporte_completo_{periodo}.csv", comprimir)
 
     @swagger_auto_schema(
         method="get",
@@ -5,4 +5,7 @@ class UsuariosConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'usuarios'
 
+    def ready(self):
+        from . import checks, signals  # noqa: F401
+
 ##vienen a ser el archivo de configuracion de la aplicacion
\ No newline at end of file
@@ -0,0 +1,212 @@
+"""
+Autenticación por token con cache token -> usuario.
+
+Cada proceso guarda en un LRU acotado los tokens ya resueltos (con el usuario
+y su rol precargados), así que una petición autenticada no hace consultas
+mientras la entrada no supere TOKEN_CACHE_TTL segundos. Cada petición recibe
+su propia copia del usuario y del token, así que lo que una vista les cambie
+no se ve en otras peticiones. Las entradas se descartan al cerrar sesión, al
+desactivar o modificar al usuario (ver signals.py); en otros procesos el
+cambio se ve, como mucho, al vencer el TTL.
+
+Los tokens expiran TOKEN_EXPIRACION segundos después de creados (0 = nunca).
+La expiración se calcula con Token.created, sin escrituras por petición.
+
+Además, el login entrega un token de acceso firmado y de vida corta
+(TOKEN_ACCESO_DURACION segundos) que se verifica solo con CPU: una firma HMAC
+sobre id de usuario, id de rol, is_active, is_staff, versión de permisos y
+expiración. Solo se emite a usuarios activos, y desactivar a un usuario o
+cambiar roles o permisos cambia la versión de permisos, que se comparte entre
+procesos por la base (ver cache_permisos.py): los tokens emitidos antes dejan
+de valer en todos los procesos. El token normal hace de token de refresco
+para obtener uno nuevo.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.utils import timezone
+from rest_framework.authentication import (
+    BaseAuthentication,
+    TokenAuthentication,
+    get_authorization_header,
+)
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+
+from backend.metricas import contar_cache
+
+from .cache_permisos import version_permisos
+
+SALT_ACCESO = 'usuarios.token_acceso'
+
+
+def token_expirado(token):
+    expiracion = getattr(settings, 'TOKEN_EXPIRACION', 0)
+    if not expiracion:
+        return False
+    return token.created + timedelta(seconds=expiracion) <= timezone.now()
+
+
+def _copiar(usuario, token):
+    """Copias independientes del usuario (con su rol) y del token"""
+    usuario = copy.copy(usuario)
+    if usuario._meta.get_field('rol').is_cached(usuario) and usuario.rol is not None:
+        usuario.rol = copy.copy(usuario.rol)
+    token = copy.copy(token)
+    token.user = usuario
+    return usuario, token
+
+
+class CacheTokens:
+    """LRU acotado con TTL de token -> (usuario, token)"""
+
+    def __init__(self, maximo=10000, ttl=60):
+        self.maximo = maximo
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entradas = OrderedDict()
+
+    def obtener(self, clave):
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is None:
+                return None
+            usuario, token, guardado_en = entrada
+            if time.monotonic() - guardado_en >= self.ttl:
+                del self._entradas[clave]
+                return None
+            self._entradas.move_to_end(clave)
+        return _copiar(usuario, token)
+
+    def guardar(self, clave, usuario, token):
+        usuario, token = _copiar(usuario, token)
+        with self._lock:
+            self._entradas[clave] = (usuario, token, time.monotonic())
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.maximo:
+                self._entradas.popitem(last=False)
+
+    def invalidar_token(self, clave):
+        with self._lock:
+            self._entradas.pop(clave, None)
+
+    def invalidar_usuario(self, usuario_id):
+        with self._lock:
+            claves = [
+                clave
+                for clave, (usuario, _, _) in self._entradas.items()
+                if usuario.pk == usuario_id
+            ]
+            for clave in claves:
+                del self._entradas[clave]
+
+    def limpiar(self):
+        with self._lock:
+            self._entradas.clear()
+
+
+cache_tokens = CacheTokens(
+    maximo=getattr(settings, 'TOKEN_CACHE_MAXIMO', 10000),
+    ttl=getattr(settings, 'TOKEN_CACHE_TTL', 60),
+)
+
+
+class TokenCacheadoAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication que resuelve el token desde cache_tokens y rechaza
+    los tokens expirados. Header: "Authorization: Token <clave>".
+    """
+
+    def authenticate_credentials(self, key):
+        encontrado = cache_tokens.obtener(key)
+        contar_cache('tokens', encontrado is not None)
+        if encontrado is None:
+            try:
+                token = Token.objects.select_related('user', 'user__rol').get(key=key)
+            except Token.DoesNotExist:
+                raise AuthenticationFailed('Token inválido.')
+
+            if not token.user.is_active:
+                raise AuthenticationFailed('Usuario inactivo o eliminado.')
+
+            cache_tokens.guardar(key, token.user, token)
+            encontrado = (token.user, token)
+
+        usuario, token = encontrado
+        if token_expirado(token):
+            cache_tokens.invalidar_token(key)
+            raise AuthenticationFailed('El token ha expirado, inicie sesión nuevamente.')
+
+        return usuario, token
+
+
+def generar_token_acceso(usuario):
+    """Devuelve (token_de_acceso, segundos_de_validez) para el usuario"""
+    if not usuario.is_active:
+        raise AuthenticationFailed('Usuario inactivo o eliminado.')
+
+    duracion = getattr(settings, 'TOKEN_ACCESO_DURACION', 300)
+    datos = {
+        'u': usuario.pk,
+        'r': usuario.rol_id,
+        'a': usuario.is_active,
+        's': usuario.is_staff,
+        # La última versión, aunque este proceso todavía no la haya sondeado
+        'v': version_permisos(forzar=True),
+        'e': int(time.time()) + duracion,
+    }
+    return signing.dumps(datos, salt=SALT_ACCESO), duracion
+
+
+class AccesoFirmadoAuthentication(BaseAuthentication):
+    """
+    Autentica con "Authorization: Bearer <token_de_acceso>" sin consultar la
+    base de datos. El usuario se arma con id, rol, is_active e is_staff del
+    token; cualquier otro campo se carga de forma diferida si una vista lo
+    necesita.
+    """
+
+    campos = ['id', 'rol_id', 'is_active', 'is_staff']
+
+    keyword = 'Bearer'
+
+    def authenticate(self, request):
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) != 2:
+            raise AuthenticationFailed('Encabezado Bearer inválido.')
+
+        try:
+            datos = signing.loads(auth[1].decode(), salt=SALT_ACCESO)
+        except (signing.BadSignature, UnicodeError):
+            raise AuthenticationFailed('Token de acceso inválido.')
+
+        if datos['e'] <= time.time():
+            raise AuthenticationFailed('El token de acceso ha expirado.')
+        if not datos.get('a'):
+            raise AuthenticationFailed('Usuario inactivo o eliminado.')
+
+        version = version_permisos()
+        if datos['v'] > version:
+            # Lo emitió un proceso que ya vio un cambio que este todavía no
+            version = version_permisos(forzar=True)
+        if datos['v'] != version:
+            # Cambiaron roles o permisos, o se desactivó a un usuario: el
+            # cliente debe refrescar el token
+            raise AuthenticationFailed('El token de acceso está desactualizado.')
+
+        Usuario = get_user_model()
+        usuario = Usuario.from_db(
+            None, self.campos, [datos['u'], datos['r'], datos['a'], datos['s']]
+        )
+        return usuario, datos
+
+    def authenticate_header(self, request):
+        return self.keyword
@@ -0,0 +1,114 @@
+"""
+Permisos compilados por rol.
+
+Cada permiso recibe un bit (según el orden de sus ids) y cada rol se resuelve
+una sola vez a una máscara con los bits de sus permisos, así que comprobar un
+permiso es un AND de enteros. Índices y máscaras se guardan en memoria del
+proceso.
+
+Cambiar roles o permisos publica la entidad "permisos" en el bus de
+invalidación (backend/invalidacion.py): su versión vive en la base, en la
+misma transacción que el cambio, y cada proceso descarta sus máscaras al ver
+una versión nueva. En el proceso que hizo el cambio es inmediato; en los demás
+tarda lo que tarde el bus (el NOTIFY en PostgreSQL, o como mucho
+INVALIDACION_INTERVALO_SONDEO segundos en otras bases).
+"""
+import threading
+
+from backend import invalidacion
+from backend.metricas import contar_cache
+
+from .models import Permiso
+
+ENTIDAD = 'permisos'
+
+_lock = threading.Lock()
+_mascaras_por_rol = {}
+_indices = None
+_generacion = 0
+
+
+def _limpiar(entidades=None):
+    global _indices, _generacion
+
+    with _lock:
+        _mascaras_por_rol.clear()
+        _indices = None
+        _generacion += 1
+
+
+invalidacion.suscribir(_limpiar, [ENTIDAD])
+
+
+def _indices_de_permisos():
+    """Devuelve {nombre_permiso: bit}"""
+    global _indices
+
+    indices = _indices
+    if indices is not None:
+        return indices
+
+    generacion = _generacion
+    nombres = Permiso.objects.order_by('id').values_list('nombre', flat=True)
+    indices = {nombre: bit for bit, nombre in enumerate(nombres)}
+    with _lock:
+        # Si se invalidó mientras se leía, esta copia puede estar vieja
+        if generacion == _generacion:
+            _indices = indices
+    return indices
+
+
+def version_permisos(forzar=False):
+    """
+    Versión vigente de los permisos compilados (cambia al invalidarlos). Con
+    forzar=True se relee de la base sin esperar al próximo sondeo del bus.
+    """
+    invalidacion.sincronizar(forzar=forzar)
+    return invalidacion.version(ENTIDAD)
+
+
+def bit_de_permiso(nombre_permiso):
+    """Máscara con el bit del permiso; 0 si el permiso no existe"""
+    invalidacion.sincronizar()
+    bit = _indices_de_permisos().get(nombre_permiso)
+    return 0 if bit is None else 1 << bit
+
+
+def mascara_de_rol(rol_id):
+    """Devuelve la máscara con los bits de los permisos del rol"""
+    if rol_id is None:
+        return 0
+
+    invalidacion.sincronizar()
+    mascara = _mascaras_por_rol.get(rol_id)
+    contar_cache('permisos', mascara is not None)
+    if mascara is not None:
+        return mascara
+
+    generacion = _generacion
+    indices = _indices_de_permisos()
+    mascara = 0
+    for nombre in Permiso.objects.filter(roles__id=rol_id).values_list(
+        'nombre', flat=True
+    ):
+        if nombre in indices:
+            mascara |= 1 << indices[nombre]
+
+    with _lock:
+        if generacion == _generacion:
+            _mascaras_por_rol[rol_id] = mascara
+    return mascara
+
+
+def rol_tiene_permiso(rol_id, nombre_permiso):
+    return bool(mascara_de_rol(rol_id) & bit_de_permiso(nombre_permiso))
+
+
+def invalidar_permisos():
+    """
+    Invalida los permisos compilados de todos los roles en todos los procesos.
+    Debe llamarse en la transacción del cambio (las señales lo hacen).
+    """
+    invalidacion.publicar(ENTIDAD)
+    # Este proceso no espera al commit: lo que lea desde ahora ve el cambio
+    _limpiar()
@@ -0,0 +1,54 @@
+from django.core.checks import Tags, Warning, register
+
+from .matriz_permisos import SIN_ENTRADA, acciones_registradas, obtener_matriz
+from .permissions import TienePermisoPersonalizado
+
+
+def _nombre(cls):
+    return f'{cls.__module__}.{cls.__qualname__}'
+
+
+def _usa_permiso_personalizado(cls):
+    return any(
+        isinstance(permiso, type) and issubclass(permiso, TienePermisoPersonalizado)
+        for permiso in cls.permission_classes
+    )
+
+
+@register(Tags.security, Tags.urls)
+def revisar_permiso_por_accion(app_configs, **kwargs):
+    """Reporta al arrancar las acciones mal configuradas en permiso_por_accion"""
+    errores = []
+    matriz = obtener_matriz()
+
+    for cls, acciones in acciones_registradas().items():
+        permiso_por_accion = getattr(cls, 'permiso_por_accion', None)
+        if permiso_por_accion is None:
+            continue
+
+        if not _usa_permiso_personalizado(cls):
+            errores.append(Warning(
+                f'{_nombre(cls)} declara permiso_por_accion pero no usa TienePermisoPersonalizado.',
+                hint='Agregue TienePermisoPersonalizado a permission_classes.',
+                obj=cls,
+                id='usuarios.W001',
+            ))
+            continue
+
+        for accion in sorted(acciones):
+            if matriz.get((cls, accion)) is SIN_ENTRADA:
+                errores.append(Warning(
+                    f'La acción "{accion}" de {_nombre(cls)} no tiene entrada en permiso_por_accion; se deniega a todos.',
+                    hint='Asigne un permiso o None para marcarla como pública.',
+                    obj=cls,
+                    id='usuarios.W002',
+                ))
+
+        for accion in sorted(set(permiso_por_accion) - acciones):
+            errores.append(Warning(
+                f'permiso_por_accion de {_nombre(cls)} menciona "{accion}", que no es una acción enrutada.',
+                obj=cls,
+                id='usuarios.W003',
+            ))
+
+    return errores
@@ -0,0 +1,63 @@
+"""
+Hash de contraseñas en procesos aparte para la importación masiva.
+
+El pool de procesos es uno solo por proceso del servidor: se crea en la
+primera importación y lo reutilizan las siguientes, así que una petición a
+/usuarios/importar/ no paga el arranque de los procesos hijos.
+
+Los procesos hijos arrancan con "spawn" y no con fork: el proceso del
+servidor tiene hilos (la escucha del bus de invalidación, el volcado de
+métricas) y conexiones abiertas, y un hijo creado con fork heredaría locks
+tomados y sockets compartidos. Por eso este módulo no importa modelos: el
+hijo lo carga antes de que Django esté listo.
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+_lock = threading.Lock()
+_pool = None
+
+
+def inicializar_proceso(settings_module):
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+
+    from django.apps import apps
+
+    if not apps.ready:
+        import django
+
+        django.setup()
+
+
+def hashear_lote(contrasenas):
+    """Hashea cada contraseña; las vacías quedan como contraseña inutilizable"""
+    from django.contrib.auth.hashers import make_password
+
+    return [make_password(contrasena or None) for contrasena in contrasenas]
+
+
+def obtener_pool(procesos):
+    """Pool compartido; procesos solo cuenta al crearlo"""
+    global _pool
+
+    with _lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=procesos,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=inicializar_proceso,
+                initargs=(os.environ.get('DJANGO_SETTINGS_MODULE', 'backend.settings'),),
+            )
+        return _pool
+
+
+def cerrar_pool():
+    """Cierra el pool; la próxima importación crea uno nuevo"""
+    global _pool
+
+    with _lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown()
@@ -0,0 +1,205 @@
+"""
+Importación masiva de usuarios desde CSV o JSONL.
+
+Las filas se leen en streaming y se procesan por lotes:
+
+1. Validación de formato de cada fila (sin consultas).
+2. Unicidad de email y nombre sin distinguir mayúsculas contra un conjunto en
+   minúsculas: lo ya importado más lo que existe en la base de datos para los
+   valores del lote (una consulta por campo que usa los índices Lower).
+3. Hash de las contraseñas repartido en el pool de procesos compartido (ver
+   hashing.py). Las filas sin contraseña quedan con una contraseña
+   inutilizable y no cuestan hash.
+4. Inserción con bulk_create.
+
+Los errores se informan por fila sin detener la importación.
+"""
+import csv
+import io
+import json
+import os
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from django.db.models.functions import Lower
+from rest_framework import serializers
+
+from .hashing import cerrar_pool, hashear_lote, obtener_pool
+
+FORMATOS = ('csv', 'jsonl')
+
+
+class FilaUsuarioSerializer(serializers.Serializer):
+    email = serializers.EmailField(max_length=254)
+    nombre_completo = serializers.CharField(max_length=255)
+    telefono = serializers.CharField(max_length=20, required=False, allow_blank=True, allow_null=True)
+    direccion = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+    password = serializers.CharField(required=False, allow_blank=True, allow_null=True, trim_whitespace=False)
+
+
+def detectar_formato(nombre_archivo):
+    extension = os.path.splitext(nombre_archivo or '')[1].lower().lstrip('.')
+    if extension in ('jsonl', 'ndjson'):
+        return 'jsonl'
+    return 'csv'
+
+
+def leer_filas(archivo, formato):
+    """
+    Recorre un archivo binario y devuelve un dict por registro. Una línea JSONL
+    inválida se devuelve como ValueError para informarla como error de fila.
+    """
+    texto = io.TextIOWrapper(archivo, encoding='utf-8-sig', newline='')
+    try:
+        if formato == 'csv':
+            yield from csv.DictReader(texto)
+        else:
+            for linea in texto:
+                if not linea.strip():
+                    continue
+                try:
+                    fila = json.loads(linea)
+                except ValueError as error:
+                    yield ValueError(f'JSON inválido: {error}')
+                    continue
+                yield fila if isinstance(fila, dict) else ValueError('Se esperaba un objeto JSON.')
+    finally:
+        texto.detach()
+
+
+def detalle_integridad(error):
+    """Errores de fila según la restricción que rechazó la inserción"""
+    mensaje = str(error)
+    for campo in get_user_model()._meta.concrete_fields:
+        if not campo.unique or campo.primary_key:
+            continue
+        # SQLite y MySQL nombran tabla.columna; PostgreSQL, (columna) y el
+        # índice <tabla>_<columna>_key
+        columna = campo.column
+        if f'.{columna}' in mensaje or f'({columna})' in mensaje or f'_{columna}_key' in mensaje:
+            if campo.name == 'email':
+                return {'email': ['Este correo ya está registrado.']}
+            return {campo.name: [f'Ya existe un usuario con este valor de {campo.name}.']}
+    return {'fila': [f'No se pudo guardar el usuario: {mensaje}']}
+
+
+class ImportadorUsuarios:
+    def __init__(self, rol=None, tamano_lote=None, procesos=None):
+        self.rol = rol
+        self.tamano_lote = tamano_lote or getattr(settings, 'IMPORTACION_TAMANO_LOTE', 1000)
+        self.procesos = procesos or getattr(settings, 'IMPORTACION_PROCESOS', None) or os.cpu_count() or 1
+        self.emails_vistos = set()
+        self.nombres_vistos = set()
+        self.creados = 0
+        self.errores = []
+
+    def importar(self, filas):
+        """Importa todas las filas y devuelve el resumen con los errores por fila"""
+        total = 0
+        lote = []
+        for numero, fila in enumerate(filas, start=1):
+            total += 1
+            lote.append((numero, fila))
+            if len(lote) >= self.tamano_lote:
+                self._procesar_lote(lote)
+                lote = []
+        if lote:
+            self._procesar_lote(lote)
+
+        errores = sorted(self.errores, key=lambda error: error['fila'])
+        return {'total': total, 'creados': self.creados, 'errores': errores}
+
+    def _error(self, numero, detalle):
+        self.errores.append({'fila': numero, 'errores': detalle})
+
+    def _validar_formato(self, lote):
+        validas = []
+        for numero, fila in lote:
+            if isinstance(fila, Exception):
+                self._error(numero, {'fila': [str(fila)]})
+                continue
+            serializer = FilaUsuarioSerializer(data=fila)
+            if not serializer.is_valid():
+                self._error(numero, serializer.errors)
+                continue
+            datos = serializer.validated_data
+            datos['email'] = get_user_model().objects.normalize_email(datos['email'])
+            validas.append((numero, datos))
+        return validas
+
+    def _existentes(self, campo, valores):
+        Usuario = get_user_model()
+        return set(
+            Usuario.objects.annotate(valor_lower=Lower(campo))
+            .filter(valor_lower__in=valores)
+            .values_list('valor_lower', flat=True)
+        )
+
+    def _validar_unicidad(self, validas):
+        emails = {datos['email'].lower() for _, datos in validas}
+        nombres = {datos['nombre_completo'].lower() for _, datos in validas}
+        # Lo que ya existe en la base para los valores de este lote
+        emails_tomados = self._existentes('email', emails)
+        nombres_tomados = self._existentes('nombre_completo', nombres)
+
+        unicas = []
+        for numero, datos in validas:
+            email = datos['email'].lower()
+            nombre = datos['nombre_completo'].lower()
+            errores = {}
+            if email in emails_tomados or email in self.emails_vistos:
+                errores['email'] = ['Este correo ya está registrado.']
+            if nombre in nombres_tomados or nombre in self.nombres_vistos:
+                errores['nombre_completo'] = ['Este nombre ya está registrado.']
+            if errores:
+                self._error(numero, errores)
+                continue
+            self.emails_vistos.add(email)
+            self.nombres_vistos.add(nombre)
+            unicas.append((numero, datos))
+        return unicas
+
+    def _hashear(self, contrasenas):
+        if self.procesos <= 1 or len(contrasenas) < 2:
+            return hashear_lote(contrasenas)
+
+        tamano = -(-len(contrasenas) // self.procesos)
+        partes = [contrasenas[i:i + tamano] for i in range(0, len(contrasenas), tamano)]
+        try:
+            resultados = obtener_pool(self.procesos).map(hashear_lote, partes)
+            return [hash_ for parte in resultados for hash_ in parte]
+        except BrokenProcessPool:
+            # Murió un proceso hijo: este lote se hashea aquí y la próxima
+            # importación arranca un pool nuevo
+            cerrar_pool()
+            return hashear_lote(contrasenas)
+
+    def _procesar_lote(self, lote):
+        unicas = self._validar_unicidad(self._validar_formato(lote))
+        if not unicas:
+            return
+
+        hashes = self._hashear([datos.get('password') for _, datos in unicas])
+
+        Usuario = get_user_model()
+        usuarios = []
+        for (numero, datos), hash_ in zip(unicas, hashes):
+            datos.pop('password', None)
+            usuarios.append((numero, Usuario(password=hash_, rol=self.rol, **datos)))
+
+        try:
+            with transaction.atomic():
+                Usuario.objects.bulk_create([usuario for _, usuario in usuarios])
+            self.creados += len(usuarios)
+        except IntegrityError:
+            # Otro proceso registró alguno de estos usuarios mientras tanto:
+            # se insertan de a uno para saber cuáles fallan
+            for numero, usuario in usuarios:
+                try:
+                    with transaction.atomic():
+                        usuario.save()
+                    self.creados += 1
+                except IntegrityError as error:
+                    self._error(numero, detalle_integridad(error))
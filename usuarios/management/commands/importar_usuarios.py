@@ -0,0 +1,35 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from usuarios.importacion import FORMATOS, ImportadorUsuarios, detectar_formato, leer_filas
+from usuarios.models import Rol
+
+
+class Command(BaseCommand):
+    help = 'Importa usuarios en bloque desde un archivo CSV o JSONL'
+
+    def add_arguments(self, parser):
+        parser.add_argument('ruta', help='Archivo con columnas email, nombre_completo, telefono, direccion, password')
+        parser.add_argument('--formato', choices=FORMATOS, help='Por defecto se deduce de la extensión')
+        parser.add_argument('--rol', default='cliente', help='Nombre del rol a asignar')
+        parser.add_argument('--lote', type=int, help='Filas por lote')
+        parser.add_argument('--procesos', type=int, help='Procesos para el hash de contraseñas')
+
+    def handle(self, *args, **options):
+        formato = options['formato'] or detectar_formato(options['ruta'])
+        rol, _ = Rol.objects.get_or_create(nombre=options['rol'])
+        importador = ImportadorUsuarios(rol=rol, tamano_lote=options['lote'], procesos=options['procesos'])
+
+        try:
+            with open(options['ruta'], 'rb') as archivo:
+                resultado = importador.importar(leer_filas(archivo, formato))
+        except OSError as error:
+            raise CommandError(str(error))
+
+        for error in resultado['errores']:
+            self.stderr.write(f"Fila {error['fila']}: {json.dumps(error['errores'], ensure_ascii=False)}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{resultado['creados']} de {resultado['total']} usuarios importados "
+            f"({len(resultado['errores'])} con errores)"
+        ))
@@ -0,0 +1,85 @@
+"""
+Matriz (viewset, acción) -> permiso requerido.
+
+Se construye una sola vez recorriendo las rutas registradas en el urlconf
+(router de backend/urls.py y rutas sueltas hechas con as_view) y leyendo el
+permiso_por_accion de cada viewset. Un valor None en permiso_por_accion marca
+la acción como pública de forma explícita; una acción sin entrada se deniega
+(y checks.py la reporta al arrancar).
+"""
+import threading
+
+from django.urls import get_resolver
+
+# Marca para acciones que el viewset no menciona en permiso_por_accion
+SIN_ENTRADA = object()
+
+# OPTIONS solo describe la vista; cada método que describe se comprueba aparte
+ACCIONES_SIN_PERMISO = {'metadata'}
+
+_lock = threading.Lock()
+_matriz = None
+
+
+def _recorrer_rutas(patrones):
+    for patron in patrones:
+        if hasattr(patron, 'url_patterns'):
+            yield from _recorrer_rutas(patron.url_patterns)
+        else:
+            yield patron.callback
+
+
+def acciones_registradas():
+    """Devuelve {viewset: {acciones enrutadas}} de todo el urlconf"""
+    viewsets = {}
+    for callback in _recorrer_rutas(get_resolver().url_patterns):
+        cls = getattr(callback, 'cls', None)
+        acciones = getattr(callback, 'actions', None)
+        if cls is None or not acciones:
+            continue
+        viewsets.setdefault(cls, set()).update(acciones.values())
+    return viewsets
+
+
+def construir_matriz():
+    matriz = {}
+    for cls, acciones in acciones_registradas().items():
+        permiso_por_accion = getattr(cls, 'permiso_por_accion', None)
+        if permiso_por_accion is None:
+            continue
+        for accion in acciones:
+            matriz[(cls, accion)] = permiso_por_accion.get(accion, SIN_ENTRADA)
+    return matriz
+
+
+def obtener_matriz():
+    global _matriz
+    if _matriz is None:
+        with _lock:
+            if _matriz is None:
+                _matriz = construir_matriz()
+    return _matriz
+
+
+def permiso_requerido(view):
+    """
+    Nombre del permiso que exige la acción actual de la vista, None si la
+    acción no requiere permiso o SIN_ENTRADA si nadie la declaró (se deniega).
+    """
+    accion = getattr(view, 'action', None)
+    permiso = obtener_matriz().get((type(view), accion), SIN_ENTRADA)
+    if permiso is not SIN_ENTRADA:
+        return permiso
+
+    # Vistas o acciones fuera del router
+    if hasattr(view, 'permiso_requerido'):
+        return view.permiso_requerido
+    permiso_por_accion = getattr(view, 'permiso_por_accion', {})
+    if accion in permiso_por_accion:
+        return permiso_por_accion[accion]
+    if accion in ACCIONES_SIN_PERMISO:
+        return None
+    if hasattr(view, 'action') and accion is None:
+        # Método no enrutado en el viewset: DRF responde 405
+        return None
+    return SIN_ENTRADA
@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-19 07:01
+
+import backend.indices
+import django.db.models.functions.text
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='usuario',
+            index=backend.indices.IndicePrefijo(django.db.models.functions.text.Lower('email'), name='usuario_email_lower_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usuario',
+            index=backend.indices.IndicePrefijo(django.db.models.functions.text.Lower('nombre_completo'), name='usuario_nombre_lower_idx'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2 on 2026-10-19 07:03
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0002_usuario_indices_lower'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='permiso',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('nombre'), name='permiso_nombre_lower_unico'),
+        ),
+        migrations.AddConstraint(
+            model_name='rol',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('nombre'), name='rol_nombre_lower_unico'),
+        ),
+    ]
@@ -2,9 +2,7 @@ from rest_framework.permissions import IsAuthenticated
 from .permissions import TienePermisoPersonalizado
 
 class PermisoRequeridoMixin:
+    # El permiso de cada acción se resuelve con la matriz de permisos
+    # (usuarios/matriz_permisos.py) a partir de permiso_por_accion
+    permission_classes = [IsAuthenticated, TienePermisoPersonalizado]
     permiso_por_accion = {}
-
-    def get_permissions(self):
-        self.permission_classes = [IsAuthenticated, TienePermisoPersonalizado]
-        self.permiso_requerido = self.permiso_por_accion.get(self.action)
-        return [permission() for permission in self.permission_classes]
@@ -1,5 +1,8 @@
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager
 from django.db import models
+from django.db.models.functions import Lower
+
+from backend.indices import IndicePrefijo
 
 #aca se crean las tablas
 class Rol(models.Model):
@@ -7,6 +10,11 @@ class Rol(models.Model):
     permisos = models.ManyToManyField("Permiso", related_name='roles')
     is_active = models.BooleanField(default=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(Lower('nombre'), name='rol_nombre_lower_unico')
+        ]
+
 
     def __str__(self):
         return self.nombre
@@ -15,6 +23,11 @@ class Permiso(models.Model):
     nombre = models.CharField(max_length=100,unique=True)
     is_active = models.BooleanField(default=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(Lower('nombre'), name='permiso_nombre_lower_unico')
+        ]
+
     def __str__(self):
         return self.nombre
 
@@ -52,5 +65,20 @@ class Usuario(AbstractBaseUser):
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['nombre_completo']
 
+    class Meta:
+        indexes = [
+            # Búsqueda por prefijo y validación de unicidad sin distinguir mayúsculas
+            IndicePrefijo(Lower('email'), name='usuario_email_lower_idx'),
+            IndicePrefijo(Lower('nombre_completo'), name='usuario_nombre_lower_idx'),
+        ]
+
     def __str__(self):
-        return self.email
\ No newline at end of file
+        return self.email
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        usuario = super().from_db(db, field_names, values)
+        # is_active tal como se leyó, para saber si un save() desactiva al
+        # usuario (ver signals.py); None si no se cargó
+        usuario._estaba_activo = usuario.__dict__.get('is_active')
+        return usuario
@@ -0,0 +1,11 @@
+from rest_framework.pagination import CursorPagination
+
+
+class UsuarioCursorPagination(CursorPagination):
+    # Paginación por keyset sobre id: cada página es un rango de la clave
+    # primaria, sin OFFSET, así que cuesta lo mismo en la primera página y en
+    # la última
+    ordering = 'id'
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
@@ -1,5 +1,8 @@
 from rest_framework.permissions import BasePermission
 
+from .cache_permisos import bit_de_permiso, mascara_de_rol
+from .matriz_permisos import SIN_ENTRADA, permiso_requerido
+
 
 class TienePermisoPersonalizado(BasePermission):
     def has_permission(self, request, view):
@@ -8,15 +11,13 @@ class TienePermisoPersonalizado(BasePermission):
         if not usuario.is_authenticated:
             return False
 
-        # Aquí defines el nombre del permiso que debe tener
-        permiso_requerido = getattr(view, 'permiso_requerido', None)
-
-        if permiso_requerido is None:
-            return True  # Si no se especifica un permiso, se permite por defecto
+        # Permiso que exige la acción según la matriz de permiso_por_accion
+        nombre_permiso = permiso_requerido(view)
 
-        rol = usuario.rol
-        if rol is None:
-            return False
+        if nombre_permiso is SIN_ENTRADA:
+            return False  # Acción que nadie declaró: se deniega
+        if nombre_permiso is None:
+            return True  # Acción pública de forma explícita
 
-        # Verificar si el rol tiene el permiso requerido
-        return rol.permisos.filter(nombre=permiso_requerido).exists()
+        # Verificar contra la máscara compilada del rol (sin consultas)
+        return bool(mascara_de_rol(usuario.rol_id) & bit_de_permiso(nombre_permiso))
@@ -1,21 +1,20 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from django.db.models.functions import Lower
 from .models import Rol, Permiso
+from backend.validators import NombreUnicoSerializerMixin, NombreUnicoValidator
 
 #maneja el json
-class PermisoSerializer(serializers.ModelSerializer):
+class PermisoSerializer(NombreUnicoSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Permiso
         fields = ['id', 'nombre']
-
-    def validate_nombre(self, value):
-        permiso_id = self.instance.id if self.instance else None
-        if Permiso.objects.filter(nombre__iexact=value).exclude(id=permiso_id).exists():
-            raise serializers.ValidationError("Este permiso ya está registrado.")
-        return value
+        extra_kwargs = {
+            'nombre': {'validators': [NombreUnicoValidator("Este permiso ya está registrado.")]}
+        }
 
 
-class RolSerializer(serializers.ModelSerializer):
+class RolSerializer(NombreUnicoSerializerMixin, serializers.ModelSerializer):
     permisos = PermisoSerializer(many=True, read_only=True)
     permisos_ids = serializers.PrimaryKeyRelatedField(
         many=True, queryset=Permiso.objects.all(), write_only=True, source='permisos'
@@ -24,12 +23,9 @@ class RolSerializer(serializers.ModelSerializer):
     class Meta:
         model = Rol
         fields = ['id', 'nombre', 'permisos', 'permisos_ids']
-
-    def validate_nombre(self, value):
-        rol_id = self.instance.id if self.instance else None
-        if Rol.objects.filter(nombre__iexact=value).exclude(id=rol_id).exists():
-            raise serializers.ValidationError("Este rol ya existe.")
-        return value
+        extra_kwargs = {
+            'nombre': {'validators': [NombreUnicoValidator("Este rol ya existe.")]}
+        }
 
 
 # Obtén el modelo de usuario (con tu configuración personalizada)
@@ -50,13 +46,16 @@ class UsuarioSerializer(serializers.ModelSerializer):
 
     def validate_email(self, value):
         usuario_id = self.instance.id if self.instance else None
-        if Usuario.objects.filter(email__iexact=value).exclude(id=usuario_id).exists():
+        # LOWER(email) = valor usa el índice usuario_email_lower_idx (iexact no)
+        existe = Usuario.objects.alias(email_lower=Lower('email')).filter(email_lower=value.lower())
+        if existe.exclude(id=usuario_id).exists():
             raise serializers.ValidationError("Este correo ya está registrado.")
         return value
 
     def validate_nombre_completo(self, value):
         usuario_id = self.instance.id if self.instance else None
-        if Usuario.objects.filter(nombre_completo__iexact=value).exclude(id=usuario_id).exists():
+        existe = Usuario.objects.alias(nombre_lower=Lower('nombre_completo')).filter(nombre_lower=value.lower())
+        if existe.exclude(id=usuario_id).exists():
             raise serializers.ValidationError("Este nombre ya está registrado.")
         return value
 
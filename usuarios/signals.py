@@ -0,0 +1,58 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from rest_framework.authtoken.models import Token
+
+from .authentication import cache_tokens
+from .cache_permisos import invalidar_permisos
+from .models import Permiso, Rol, Usuario
+
+
+@receiver(m2m_changed, sender=Rol.permisos.through)
+def invalidar_por_cambio_de_permisos(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        invalidar_permisos()
+
+
+@receiver(post_save, sender=Rol)
+@receiver(post_delete, sender=Rol)
+@receiver(post_save, sender=Permiso)
+@receiver(post_delete, sender=Permiso)
+def invalidar_por_cambio_de_rol_o_permiso(sender, **kwargs):
+    invalidar_permisos()
+
+
+def _dejo_de_estar_activo(instance, eliminado):
+    """
+    Si el usuario activo se desactivó o se eliminó. Si no se sabe cómo estaba
+    (una instancia que no se leyó de la base) se supone que estaba activo.
+    """
+    estaba_activo = getattr(instance, '_estaba_activo', None) is not False
+    return estaba_activo and (eliminado or not instance.is_active)
+
+
+@receiver(post_save, sender=Usuario)
+@receiver(post_delete, sender=Usuario)
+def invalidar_tokens_de_usuario(sender, instance, created=False, **kwargs):
+    # Desactivación, cambio de rol o cualquier otro cambio del usuario
+    cache_tokens.invalidar_usuario(instance.pk)
+
+    # Los tokens de acceso firmados no se pueden revocar uno a uno: cambiar la
+    # versión de permisos obliga a todos a refrescarlos (y el refresco falla
+    # para el usuario desactivado). Solo hace falta cuando un usuario activo
+    # deja de estarlo; un usuario recién creado no tiene tokens
+    eliminado = kwargs['signal'] is post_delete
+    if not created and _dejo_de_estar_activo(instance, eliminado):
+        invalidar_permisos()
+    instance._estaba_activo = instance.is_active and not eliminado
+
+
+@receiver(post_delete, sender=Token)
+def invalidar_token_eliminado(sender, instance, **kwargs):
+    cache_tokens.invalidar_token(instance.key)
+
+
+@receiver(post_save, sender=Rol)
+def invalidar_tokens_por_cambio_de_rol(sender, **kwargs):
+    # Los usuarios cacheados llevan su rol precargado
+    cache_tokens.limpiar()
@@ -1,3 +1,592 @@
-from django.test import TestCase
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.core.files.uploadedfile import SimpleUploadedFile
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import IntegrityError
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework import viewsets
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIClient
+
+from backend import invalidacion
+from backend.throttling import AlmacenLocal, obtener_almacen
+
+from .authentication import (
+    AccesoFirmadoAuthentication,
+    TokenCacheadoAuthentication,
+    cache_tokens,
+    generar_token_acceso,
+)
+from .cache_permisos import (
+    bit_de_permiso,
+    invalidar_permisos,
+    mascara_de_rol,
+    rol_tiene_permiso,
+    version_permisos,
+)
+from .checks import revisar_permiso_por_accion
+from .hashing import cerrar_pool, obtener_pool
+from .importacion import ImportadorUsuarios, detalle_integridad, leer_filas
+from .matriz_permisos import SIN_ENTRADA, permiso_requerido
+from .models import Permiso, Rol, Usuario
+from .permissions import TienePermisoPersonalizado
+from .views import UsuarioViewSet
+
+
+def crear_rol(nombre, *permisos):
+    rol = Rol.objects.create(nombre=nombre)
+    for permiso in permisos:
+        rol.permisos.add(Permiso.objects.get_or_create(nombre=permiso)[0])
+    return rol
+
+
+def crear_usuario(email, rol=None, **extra):
+    return Usuario.objects.create_user(
+        email, 'clave-segura', nombre_completo=email.split('@')[0], rol=rol, **extra
+    )
+
+
+class CachePermisosTests(TestCase):
+    def setUp(self):
+        self.rol = crear_rol('Vendedor', 'ver_productos', 'crear_productos')
+        Permiso.objects.create(nombre='eliminar_usuario')
+
+    def test_mascara_del_rol(self):
+        self.assertTrue(rol_tiene_permiso(self.rol.id, 'ver_productos'))
+        self.assertTrue(rol_tiene_permiso(self.rol.id, 'crear_productos'))
+        self.assertFalse(rol_tiene_permiso(self.rol.id, 'eliminar_usuario'))
+        self.assertFalse(rol_tiene_permiso(self.rol.id, 'no_existe'))
+        self.assertFalse(rol_tiene_permiso(None, 'ver_productos'))
+
+    @override_settings(INVALIDACION_INTERVALO_SONDEO=3600)
+    def test_segunda_consulta_sin_ir_a_la_base(self):
+        invalidacion.sincronizar(forzar=True)
+        rol_tiene_permiso(self.rol.id, 'ver_productos')
+
+        with self.assertNumQueries(0):
+            rol_tiene_permiso(self.rol.id, 'ver_productos')
+
+    def test_cambio_en_este_proceso_es_inmediato(self):
+        self.assertTrue(rol_tiene_permiso(self.rol.id, 'ver_productos'))
+
+        self.rol.permisos.remove(Permiso.objects.get(nombre='ver_productos'))
+        self.rol.permisos.add(Permiso.objects.get(nombre='eliminar_usuario'))
+
+        self.assertFalse(rol_tiene_permiso(self.rol.id, 'ver_productos'))
+        self.assertTrue(rol_tiene_permiso(self.rol.id, 'eliminar_usuario'))
+
+    @override_settings(INVALIDACION_INTERVALO_SONDEO=3600)
+    def test_cambio_publicado_por_otro_proceso(self):
+        invalidacion.sincronizar(forzar=True)
+        version = version_permisos()
+        self.assertFalse(rol_tiene_permiso(self.rol.id, 'eliminar_usuario'))
+
+        # Otro proceso: escribe y publica en la base sin pasar por las señales
+        # ni por la memoria de este proceso, que no se entera hasta sondear
+        Rol.permisos.through.objects.create(
+            rol=self.rol, permiso=Permiso.objects.get(nombre='eliminar_usuario')
+        )
+        invalidacion.publicar('permisos')
+        self.assertFalse(rol_tiene_permiso(self.rol.id, 'eliminar_usuario'))
+
+        self.assertGreater(version_permisos(forzar=True), version)
+        self.assertTrue(rol_tiene_permiso(self.rol.id, 'eliminar_usuario'))
+
+    def test_la_version_vive_en_la_base(self):
+        invalidacion.sincronizar(forzar=True)
+        antes = invalidacion._leer(None)[0].get('permisos', 0)
+
+        invalidar_permisos()
+
+        self.assertEqual(invalidacion._leer(None)[0]['permisos'], antes + 1)
+
+    def test_bits_distintos_por_permiso(self):
+        bits = {bit_de_permiso(p.nombre) for p in Permiso.objects.all()}
+        self.assertEqual(len(bits), Permiso.objects.count())
+        self.assertEqual(
+            mascara_de_rol(self.rol.id),
+            bit_de_permiso('ver_productos') | bit_de_permiso('crear_productos'),
+        )
+
+
+class VistaSinDeclarar(viewsets.ViewSet):
+    permission_classes = [TienePermisoPersonalizado]
+    permiso_por_accion = {'list': 'ver_usuarios', 'publica': None}
+
+
+class MatrizPermisosTests(TestCase):
+    def setUp(self):
+        self.lector = crear_usuario(
+            'lector@example.com', crear_rol('Lector', 'ver_usuarios')
+        )
+        self.sin_permisos = crear_usuario('nadie@example.com', crear_rol('Nadie'))
+
+    def tiene_permiso(self, usuario, vista, accion):
+        vista.action = accion
+        request = SimpleNamespace(user=usuario)
+        return TienePermisoPersonalizado().has_permission(request, vista)
+
+    def test_permiso_de_cada_accion_enrutada(self):
+        vista = UsuarioViewSet()
+        for accion, permiso in (
+            ('retrieve', 'ver_usuarios'),
+            ('destroy', 'eliminar_usuario'),
+            ('crear_cliente', None),
+        ):
+            vista.action = accion
+            self.assertEqual(permiso_requerido(vista), permiso)
+
+    def test_accion_sin_declarar_se_deniega(self):
+        vista = VistaSinDeclarar()
+        vista.action = 'secreta'
+        self.assertIs(permiso_requerido(vista), SIN_ENTRADA)
+
+        self.assertFalse(self.tiene_permiso(self.lector, vista, 'secreta'))
+        self.assertTrue(self.tiene_permiso(self.lector, vista, 'list'))
+        self.assertTrue(self.tiene_permiso(self.sin_permisos, vista, 'publica'))
+        self.assertFalse(self.tiene_permiso(self.sin_permisos, vista, 'list'))
+
+    def test_options_y_metodos_no_enrutados(self):
+        vista = VistaSinDeclarar()
+        self.assertTrue(self.tiene_permiso(self.sin_permisos, vista, 'metadata'))
+        # Sin acción DRF responde 405; el permiso no lo tapa con un 403
+        self.assertTrue(self.tiene_permiso(self.sin_permisos, vista, None))
+
+    def test_todas_las_acciones_enrutadas_estan_declaradas(self):
+        avisos = [
+            aviso.msg
+            for aviso in revisar_permiso_por_accion(None)
+            if aviso.id in ('usuarios.W001', 'usuarios.W002')
+        ]
+        self.assertEqual(avisos, [])
+
+    def test_endpoint_segun_el_rol(self):
+        cliente = APIClient()
+        url = f'/Libreria/usuarios/{self.sin_permisos.pk}/'
+
+        cliente.force_authenticate(self.lector)
+        self.assertEqual(cliente.get(url).status_code, 200)
+        self.assertEqual(cliente.delete(url).status_code, 403)
+
+        cliente.force_authenticate(self.sin_permisos)
+        self.assertEqual(cliente.get(url).status_code, 403)
+
+
+class TokenCacheadoTests(TestCase):
+    def setUp(self):
+        cache_tokens.limpiar()
+        self.usuario = crear_usuario(
+            'token@example.com', crear_rol('Lector', 'ver_usuarios')
+        )
+        self.token = Token.objects.create(user=self.usuario)
+        self.autenticacion = TokenCacheadoAuthentication()
+
+    def autenticar(self):
+        return self.autenticacion.authenticate_credentials(self.token.key)
+
+    def test_segunda_resolucion_sin_consultas(self):
+        self.autenticar()
+        with self.assertNumQueries(0):
+            usuario, token = self.autenticar()
+            self.assertEqual(usuario.rol.nombre, 'Lector')
+        self.assertEqual(usuario.pk, self.usuario.pk)
+        self.assertEqual(token.key, self.token.key)
+
+    def test_cada_peticion_recibe_su_copia(self):
+        primero, token = self.autenticar()
+        primero.nombre_completo = 'Cambiado'
+        primero.rol.nombre = 'Cambiado'
+        token.key = 'otra'
+
+        segundo, token = self.autenticar()
+        self.assertIsNot(segundo, primero)
+        self.assertEqual(segundo.nombre_completo, 'token')
+        self.assertEqual(segundo.rol.nombre, 'Lector')
+        self.assertEqual(token.key, self.token.key)
+        self.assertIs(token.user, segundo)
+
+    def test_token_invalido(self):
+        with self.assertRaises(AuthenticationFailed):
+            self.autenticacion.authenticate_credentials('no-existe')
+
+    @override_settings(TOKEN_EXPIRACION=60)
+    def test_token_expirado(self):
+        Token.objects.filter(pk=self.token.pk).update(
+            created=timezone.now() - timedelta(minutes=2)
+        )
+        with self.assertRaisesMessage(AuthenticationFailed, 'expirado'):
+            self.autenticar()
+
+    def test_desactivar_al_usuario_descarta_su_entrada(self):
+        self.autenticar()
+        self.usuario.is_active = False
+        self.usuario.save()
+
+        with self.assertRaisesMessage(AuthenticationFailed, 'inactivo'):
+            self.autenticar()
+
+    def test_logout_borra_el_token(self):
+        cliente = APIClient()
+        cliente.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+        self.assertEqual(cliente.post('/Libreria/logout/').status_code, 200)
+
+        self.assertFalse(Token.objects.filter(key=self.token.key).exists())
+        with self.assertRaises(AuthenticationFailed):
+            self.autenticar()
+
+
+@override_settings(INVALIDACION_INTERVALO_SONDEO=3600)
+class AccesoFirmadoTests(TestCase):
+    def setUp(self):
+        cache_tokens.limpiar()
+        self.usuario = crear_usuario(
+            'firmado@example.com', crear_rol('Lector', 'ver_usuarios'), is_staff=True
+        )
+        self.cliente = APIClient()
+
+    def login(self, email='firmado@example.com'):
+        return self.cliente.post(
+            '/Libreria/login/',
+            {'username': email, 'password': 'clave-segura'},
+            format='json',
+        )
+
+    def autenticar(self, acceso):
+        request = SimpleNamespace(META={'HTTP_AUTHORIZATION': f'Bearer {acceso}'})
+        return AccesoFirmadoAuthentication().authenticate(request)
+
+    def test_login_entrega_un_token_de_acceso_valido(self):
+        respuesta = self.login()
+        self.assertEqual(respuesta.status_code, 200)
+
+        with self.assertNumQueries(0):
+            usuario, _ = self.autenticar(respuesta.data['access'])
+            self.assertTrue(usuario.is_active)
+            self.assertTrue(usuario.is_staff)
+            self.assertEqual(usuario.rol_id, self.usuario.rol_id)
+
+        acceso = respuesta.data['access']
+        self.cliente.credentials(HTTP_AUTHORIZATION=f'Bearer {acceso}')
+        detalle = self.cliente.get(f'/Libreria/usuarios/{self.usuario.pk}/')
+        self.assertEqual(detalle.status_code, 200)
+
+    def test_usuario_inactivo_no_inicia_sesion(self):
+        Usuario.objects.filter(pk=self.usuario.pk).update(is_active=False)
+
+        respuesta = self.login()
+
+        self.assertIn(respuesta.status_code, (401, 403))
+        self.assertNotIn('access', respuesta.data)
+        self.assertFalse(Token.objects.filter(user=self.usuario).exists())
+        self.usuario.is_active = False
+        with self.assertRaises(AuthenticationFailed):
+            generar_token_acceso(self.usuario)
+
+    def test_desactivar_invalida_los_tokens_emitidos(self):
+        acceso, _ = generar_token_acceso(self.usuario)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.usuario.is_active = False
+            self.usuario.save()
+
+        with self.assertRaisesMessage(AuthenticationFailed, 'desactualizado'):
+            self.autenticar(acceso)
+
+    def test_solo_desactivar_cambia_la_version(self):
+        inactivo = crear_usuario('inactivo@example.com', None)
+        with self.captureOnCommitCallbacks(execute=True):
+            inactivo.is_active = False
+            inactivo.save()
+        antes = version_permisos(forzar=True)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            inactivo = Usuario.objects.get(pk=inactivo.pk)
+            inactivo.nombre_completo = 'Otro nombre'
+            inactivo.save()
+            Usuario.objects.get(pk=self.usuario.pk).save()
+            Usuario.objects.get(pk=inactivo.pk).delete()
+            crear_usuario('nuevo@example.com', None)
+        self.assertEqual(version_permisos(forzar=True), antes)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Usuario.objects.get(pk=self.usuario.pk).delete()
+        self.assertEqual(version_permisos(forzar=True), antes + 1)
+
+    def test_token_de_un_proceso_adelantado(self):
+        acceso, _ = generar_token_acceso(self.usuario)
+        # Este proceso todavía no sondeó la versión con la que se emitió
+        invalidacion._versiones['permisos'] -= 1
+
+        usuario, _ = self.autenticar(acceso)
+        self.assertEqual(usuario.pk, self.usuario.pk)
+
+    def test_cambio_publicado_por_otro_proceso_invalida_el_token(self):
+        acceso, _ = generar_token_acceso(self.usuario)
+        invalidacion.publicar('permisos')
+        invalidacion.sincronizar(forzar=True)
+
+        with self.assertRaisesMessage(AuthenticationFailed, 'desactualizado'):
+            self.autenticar(acceso)
+
+    def test_token_alterado_o_vencido(self):
+        acceso, _ = generar_token_acceso(self.usuario)
+        with self.assertRaisesMessage(AuthenticationFailed, 'inválido'):
+            self.autenticar(acceso[:-2] + 'xx')
+
+        with self.settings(TOKEN_ACCESO_DURACION=-1):
+            acceso, _ = generar_token_acceso(self.usuario)
+        with self.assertRaisesMessage(AuthenticationFailed, 'expirado'):
+            self.autenticar(acceso)
+
+    def test_refresco_relee_al_usuario(self):
+        refresco = self.login().data['refresh']
+        respuesta = self.cliente.post(
+            '/Libreria/token/refrescar/', {'refresh': refresco}, format='json'
+        )
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertIn('access', respuesta.data)
+
+        # Desactivado por otro proceso: la entrada de la cache sigue acá
+        Usuario.objects.filter(pk=self.usuario.pk).update(is_active=False)
+        respuesta = self.cliente.post(
+            '/Libreria/token/refrescar/', {'refresh': refresco}, format='json'
+        )
+        self.assertEqual(respuesta.status_code, 401)
+
+
+@override_settings(THROTTLE_BUCKETS={'login': {'ip': (2, 1)}})
+class ThrottlingTests(TestCase):
+    def setUp(self):
+        obtener_almacen()._buckets.clear()
+        self.addCleanup(obtener_almacen()._buckets.clear)
+
+    def login(self, cliente):
+        return cliente.post(
+            '/Libreria/login/',
+            {'username': 'nadie@example.com', 'password': 'x'},
+            format='json',
+        )
+
+    def test_agotar_el_bucket_devuelve_429(self):
+        cliente = APIClient()
+        codigos = [self.login(cliente).status_code for _ in range(3)]
+
+        self.assertNotIn(429, codigos[:2])
+        self.assertEqual(codigos[2], 429)
+        self.assertIn('Retry-After', self.login(cliente))
+        # Otra IP tiene su propio bucket
+        self.assertNotEqual(self.login(APIClient(REMOTE_ADDR='10.0.0.2')).status_code, 429)
+
+    def test_x_forwarded_for_falsificado(self):
+        codigos = [
+            self.login(APIClient(HTTP_X_FORWARDED_FOR=f'192.0.2.{i}')).status_code
+            for i in range(3)
+        ]
+        self.assertEqual(codigos[2], 429)
+
+    def test_ip_del_proxy_de_confianza(self):
+        rest_framework = {**settings.REST_FRAMEWORK, 'NUM_PROXIES': 1}
+        with self.settings(REST_FRAMEWORK=rest_framework):
+            # El cliente agrega lo que quiera; el proxy agrega la IP real al final
+            codigos = [
+                self.login(
+                    APIClient(HTTP_X_FORWARDED_FOR=f'192.0.2.{i}, 198.51.100.7')
+                ).status_code
+                for i in range(3)
+            ]
+            otra = self.login(APIClient(HTTP_X_FORWARDED_FOR='198.51.100.8'))
+        self.assertEqual(codigos[2], 429)
+        self.assertNotEqual(otra.status_code, 429)
+
+    def test_rechazo_no_descuenta_de_los_otros_buckets(self):
+        almacen = AlmacenLocal()
+        buckets = [('amplio', 10, 1), ('estrecho', 1, 0.001)]
+
+        self.assertEqual(almacen.consumir(buckets, 1), 0)
+        for _ in range(5):
+            self.assertGreater(almacen.consumir(buckets, 1), 0)
+
+        tokens, _ = almacen._buckets['amplio']
+        self.assertAlmostEqual(tokens, 9, places=2)
+        self.assertEqual(almacen.consumir([buckets[0]], 9), 0)
+
+    def test_espera_del_bucket_mas_lento(self):
+        almacen = AlmacenLocal()
+        almacen.consumir([('a', 2, 1), ('b', 2, 0.5)], 2)
+
+        self.assertAlmostEqual(almacen.consumir([('a', 2, 1), ('b', 2, 0.5)], 1), 2, places=1)
+
+    def test_almacen_en_cache(self):
+        with self.settings(THROTTLE_ALMACEN='cache'):
+            cliente = APIClient(REMOTE_ADDR='10.0.0.3')
+            codigos = [self.login(cliente).status_code for _ in range(3)]
+        self.assertEqual(codigos[2], 429)
+
+    def test_almacen_desconocido(self):
+        with self.settings(THROTTLE_ALMACEN='redis'):
+            with self.assertRaisesMessage(ImproperlyConfigured, 'THROTTLE_ALMACEN'):
+                obtener_almacen()
+
+
+class DirectorioUsuariosTests(TestCase):
+    def setUp(self):
+        obtener_almacen()._buckets.clear()
+        self.addCleanup(obtener_almacen()._buckets.clear)
+        Usuario.objects.bulk_create(
+            Usuario(email=f'lector{i}@example.com', nombre_completo=f'Lector {i}')
+            for i in range(220)
+        )
+        Usuario.objects.create(email='Ana@example.com', nombre_completo='Zoe Ana')
+        Usuario.objects.create(email='baja@example.com', nombre_completo='Baja', is_active=False)
+        self.cliente = APIClient()
+
+    def test_recorre_todas_las_paginas_por_cursor(self):
+        respuesta = self.cliente.get('/Libreria/usuarios/')
+        self.assertEqual(len(respuesta.data['results']), 50)
+        self.assertIsNone(respuesta.data['previous'])
+
+        ids, url = [], '/Libreria/usuarios/'
+        while url:
+            respuesta = self.cliente.get(url)
+            ids += [usuario['id'] for usuario in respuesta.data['results']]
+            url = respuesta.data['next']
+        self.assertEqual(ids, sorted(ids))
+        self.assertEqual(len(ids), 221)
+
+    def test_tamano_de_pagina_acotado(self):
+        respuesta = self.cliente.get('/Libreria/usuarios/?page_size=10')
+        self.assertEqual(len(respuesta.data['results']), 10)
+
+        respuesta = self.cliente.get('/Libreria/usuarios/?page_size=500')
+        self.assertEqual(len(respuesta.data['results']), 200)
+
+    def test_buscar_por_prefijo_sin_distinguir_mayusculas(self):
+        respuesta = self.cliente.get('/Libreria/usuarios/?buscar=ANA')
+        self.assertEqual(
+            [usuario['email'] for usuario in respuesta.data['results']], ['Ana@example.com']
+        )
+
+        respuesta = self.cliente.get('/Libreria/usuarios/?buscar=zoe')
+        self.assertEqual(len(respuesta.data['results']), 1)
+
+        # Prefijo, no subcadena; y los inactivos no aparecen
+        self.assertEqual(self.cliente.get('/Libreria/usuarios/?buscar=na').data['results'], [])
+        self.assertEqual(self.cliente.get('/Libreria/usuarios/?buscar=baja').data['results'], [])
+
+        respuesta = self.cliente.get('/Libreria/usuarios/?buscar=lector 1&page_size=5')
+        self.assertEqual(len(respuesta.data['results']), 5)
+        self.assertIsNotNone(respuesta.data['next'])
+
+    def test_email_y_nombre_unicos_sin_distinguir_mayusculas(self):
+        respuesta = self.cliente.post(
+            '/Libreria/usuarios/crear-cliente/',
+            {'email': 'ANA@example.com', 'password': 'clave-segura', 'nombre_completo': 'Otra'},
+            format='json',
+        )
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertIn('email', respuesta.data)
+
+        respuesta = self.cliente.post(
+            '/Libreria/usuarios/crear-cliente/',
+            {'email': 'otra@example.com', 'password': 'clave-segura', 'nombre_completo': 'ZOE ANA'},
+            format='json',
+        )
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertIn('nombre_completo', respuesta.data)
+
+
+class ImportacionUsuariosTests(TestCase):
+    def setUp(self):
+        self.admin = crear_usuario('admin@example.com', crear_rol('Admin', 'crear_usuarios'))
+        crear_usuario('existe@example.com')
+        self.cliente = APIClient()
+        self.cliente.force_authenticate(self.admin)
+
+    def importar(self, contenido, nombre='usuarios.csv'):
+        archivo = SimpleUploadedFile(nombre, contenido.encode())
+        return self.cliente.post(
+            '/Libreria/usuarios/importar/', {'archivo': archivo}, format='multipart'
+        )
+
+    def test_importa_y_reporta_errores_por_fila(self):
+        respuesta = self.importar(
+            'email,nombre_completo,password\n'
+            'nuevo1@example.com,Nuevo 1,clave-1\n'
+            'EXISTE@example.com,Otro,clave\n'
+            'no-es-email,Malo,clave\n'
+            'nuevo2@example.com,NUEVO 1,\n'
+            'nuevo3@example.com,Nuevo 3,\n'
+        )
+
+        self.assertEqual(respuesta.status_code, 201)
+        self.assertEqual(respuesta.data['total'], 5)
+        self.assertEqual(respuesta.data['creados'], 2)
+        errores = {error['fila']: error['errores'] for error in respuesta.data['errores']}
+        self.assertEqual(set(errores), {2, 3, 4})
+        self.assertIn('email', errores[2])
+        self.assertIn('email', errores[3])
+        self.assertIn('nombre_completo', errores[4])
+
+        nuevo = Usuario.objects.get(email='nuevo1@example.com')
+        self.assertTrue(nuevo.check_password('clave-1'))
+        self.assertEqual(nuevo.rol.nombre, 'cliente')
+        self.assertFalse(Usuario.objects.get(email='nuevo3@example.com').has_usable_password())
+
+    def test_jsonl_con_lineas_invalidas(self):
+        respuesta = self.importar(
+            '{"email": "j1@example.com", "nombre_completo": "J 1"}\n{malo\n[1]\n',
+            nombre='usuarios.jsonl',
+        )
+
+        self.assertEqual(respuesta.data['creados'], 1)
+        self.assertEqual([error['fila'] for error in respuesta.data['errores']], [2, 3])
+
+    def test_requiere_permiso(self):
+        self.cliente.force_authenticate(crear_usuario('sin-permiso@example.com', crear_rol('Otro')))
+        respuesta = self.importar('email,nombre_completo\nx@example.com,X\n')
+        self.assertEqual(respuesta.status_code, 403)
+
+    def test_pool_compartido_entre_importaciones(self):
+        self.addCleanup(cerrar_pool)
+        filas = [
+            {'email': f'p{i}@example.com', 'nombre_completo': f'P {i}', 'password': f'clave-{i}'}
+            for i in range(4)
+        ]
+
+        ImportadorUsuarios(procesos=2).importar(filas[:2])
+        pool = obtener_pool(2)
+        ImportadorUsuarios(procesos=2).importar(filas[2:])
+
+        self.assertIs(obtener_pool(2), pool)
+        # Sin fork: el hijo no hereda los hilos ni las conexiones del servidor
+        self.assertEqual(pool._mp_context.get_start_method(), 'spawn')
+        self.assertTrue(Usuario.objects.get(email='p3@example.com').check_password('clave-3'))
+
+    def test_carrera_con_otro_proceso_reporta_la_restriccion(self):
+        contenido = b'email,nombre_completo\nexiste@example.com,Otro\nlibre@example.com,Libre\n'
+        filas = leer_filas(SimpleUploadedFile('u.csv', contenido), 'csv')
+        # Otro proceso creó el usuario después de la validación de unicidad
+        with mock.patch.object(ImportadorUsuarios, '_existentes', return_value=set()):
+            resultado = ImportadorUsuarios(procesos=1).importar(filas)
+
+        self.assertEqual(resultado['creados'], 1)
+        self.assertEqual(
+            resultado['errores'],
+            [{'fila': 1, 'errores': {'email': ['Este correo ya está registrado.']}}],
+        )
+
+    def test_otras_restricciones_no_se_informan_como_email_repetido(self):
+        error = IntegrityError('NOT NULL constraint failed: usuarios_usuario.nombre_completo')
+        self.assertEqual(list(detalle_integridad(error)), ['fila'])
+
+        error = IntegrityError(
+            'duplicate key value violates unique constraint "usuarios_usuario_email_key"'
+        )
+        self.assertEqual(list(detalle_integridad(error)), ['email'])
@@ -1,14 +1,24 @@
 from rest_framework import viewsets
 from django.contrib.auth import get_user_model
 from .serializers import UsuarioSerializer, RolSerializer, PermisoSerializer
-from rest_framework.permissions import  AllowAny
+from rest_framework.permissions import  AllowAny, IsAuthenticated
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.authtoken.models import Token
 from rest_framework.response import Response
-from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.exceptions import AuthenticationFailed, ValidationError
+from rest_framework.parsers import MultiPartParser
 from .models import Rol, Permiso
 from rest_framework.decorators import action
 from rest_framework import status
+from rest_framework.views import APIView
+from .permissions import TienePermisoPersonalizado
+from .authentication import generar_token_acceso, token_expirado
+from .authentication import TokenCacheadoAuthentication
+from backend.throttling import TokenBucketThrottle
+from django.db.models import Q
+from django.db.models.functions import Lower
+from .paginacion import UsuarioCursorPagination
+from .importacion import FORMATOS, ImportadorUsuarios, detectar_formato, leer_filas
 
 ##es como el service , se crea la logica del crud
 Usuario = get_user_model()
@@ -17,12 +27,21 @@ class UsuarioViewSet(viewsets.ModelViewSet):
     queryset = Usuario.objects.all()
     serializer_class = UsuarioSerializer
     swagger_tags = ['Usuarios']
+    permission_classes = [TienePermisoPersonalizado]
     permiso_por_accion = {
         'list': 'ver_usuarios',
+        'retrieve': 'ver_usuarios',
         'create': 'crear_usuarios',
         'update': 'editar_usuario',
         'partial_update': 'editar_usuario',
         'destroy': 'eliminar_usuario',
+        'crear_cliente': None,  # registro público de clientes
+        'importar': 'crear_usuarios',
+    }
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope_por_accion = {
+        'list': 'usuarios_publico',
+        'crear_cliente': 'registro',
     }
 
     def get_permissions(self):
@@ -31,8 +50,18 @@ class UsuarioViewSet(viewsets.ModelViewSet):
             return [AllowAny()]
         return super().get_permissions()
 
+    pagination_class = UsuarioCursorPagination
+
     def get_queryset(self):
-        return Usuario.objects.filter(is_active=True)
+        queryset = Usuario.objects.filter(is_active=True)
+
+        # ?buscar=texto filtra por prefijo de email o nombre (índices Lower)
+        buscar = self.request.query_params.get('buscar', '').strip().lower()
+        if self.action == 'list' and buscar:
+            queryset = queryset.alias(
+                email_lower=Lower('email'), nombre_lower=Lower('nombre_completo')
+            ).filter(Q(email_lower__startswith=buscar) | Q(nombre_lower__startswith=buscar))
+        return queryset
 
     #crear un cliente
     @action(detail=False, methods=['post'], url_path='crear-cliente', permission_classes=[AllowAny])
@@ -53,6 +82,30 @@ class UsuarioViewSet(viewsets.ModelViewSet):
 
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+    #importar usuarios en bloque desde un archivo CSV o JSONL
+    @action(detail=False, methods=['post'], url_path='importar', parser_classes=[MultiPartParser])
+    def importar(self, request):
+        archivo = request.FILES.get('archivo')
+        if archivo is None:
+            raise ValidationError({'archivo': ['Debe enviar un archivo CSV o JSONL.']})
+
+        formato = request.data.get('formato') or detectar_formato(archivo.name)
+        if formato not in FORMATOS:
+            raise ValidationError({'formato': [f'Formato no soportado, use: {", ".join(FORMATOS)}.']})
+
+        # Sin rol explícito se importan como clientes, igual que crear-cliente
+        rol_id = request.data.get('rol')
+        if rol_id:
+            rol = Rol.objects.filter(id=rol_id, is_active=True).first()
+            if rol is None:
+                raise ValidationError({'rol': ['El rol no existe.']})
+        else:
+            rol, _ = Rol.objects.get_or_create(nombre='cliente')
+
+        resultado = ImportadorUsuarios(rol=rol).importar(leer_filas(archivo, formato))
+        estado = status.HTTP_201_CREATED if resultado['creados'] else status.HTTP_400_BAD_REQUEST
+        return Response(resultado, status=estado)
+
     #logica para eliminar
     def destroy(self, request, *args, **kwargs):
         usuario = self.get_object()
@@ -65,8 +118,10 @@ class RolViewSet(viewsets.ModelViewSet):
     queryset = Rol.objects.all()
     serializer_class = RolSerializer
     swagger_tags = ['Roles']
+    permission_classes = [TienePermisoPersonalizado]
     permiso_por_accion = {
         'list': 'ver_roles',
+        'retrieve': 'ver_roles',
         'create': 'crear_roles',
         'update': 'editar_rol',
         'partial_update': 'editar_rol',
@@ -86,12 +141,15 @@ class PermisoViewSet(viewsets.ModelViewSet):
     queryset = Permiso.objects.all()
     serializer_class = PermisoSerializer
     swagger_tags = ['Permisos']
+    permission_classes = [TienePermisoPersonalizado]
     permiso_por_accion = {
         'list': 'ver_permisos',
+        'retrieve': 'ver_permisos',
         'create': 'crear_permisos',
         'update': 'editar_permiso',
         'partial_update': 'editar_permiso',
         'destroy': 'eliminar_permiso',
+        'crear_multiples': 'crear_permisos',
     }
 
     def get_queryset(self):
@@ -119,6 +177,8 @@ class PermisoViewSet(viewsets.ModelViewSet):
 
 class LoginView(ObtainAuthToken):
     swagger_tags = ['Login']
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = 'login'
 
     def post(self, request, *args, **kwargs):
         email = request.data.get('username')
@@ -136,16 +196,68 @@ class LoginView(ObtainAuthToken):
         if not user.check_password(password):
             raise AuthenticationFailed('La contraseña es incorrecta.')
 
-        Token.objects.filter(user=user).delete()
-        token = Token.objects.create(user=user)
+        if not user.is_active:
+            raise AuthenticationFailed('Usuario inactivo o eliminado.')
+
+        # Reutilizar el token vigente; solo se rota cuando ya expiró
+        token, creado = Token.objects.get_or_create(user=user)
+        if not creado and token_expirado(token):
+            token.delete()
+            token = Token.objects.create(user=user)
 
         # Usar el serializer para obtener datos completos del usuario
         from .serializers import UsuarioSerializer
         user_serializer = UsuarioSerializer(user)
 
+        # Token de acceso firmado (opcional para el cliente); el token normal
+        # sirve también como token de refresco
+        acceso, expira_en = generar_token_acceso(user)
+
         # Devolver token, user_id y datos completos del usuario
         return Response({
             'token': token.key, 
             'user_id': user.id,
-            'usuario': user_serializer.data
+            'usuario': user_serializer.data,
+            'access': acceso,
+            'refresh': token.key,
+            'expires_in': expira_en,
         })
+
+
+class RefrescarTokenView(APIView):
+    authentication_classes = []
+    permission_classes = [AllowAny]
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = 'login'
+    swagger_tags = ['Login']
+
+    def post(self, request, *args, **kwargs):
+        refresh = request.data.get('refresh')
+        if not refresh:
+            raise AuthenticationFailed('El token de refresco es requerido.')
+
+        # Valida existencia, usuario activo y expiración del token de refresco
+        user, _ = TokenCacheadoAuthentication().authenticate_credentials(refresh)
+
+        # La cache de tokens de otro proceso puede no haber visto todavía una
+        # desactivación o un cambio de rol
+        user = Usuario.objects.filter(pk=user.pk, is_active=True).first()
+        if user is None:
+            raise AuthenticationFailed('Usuario inactivo o eliminado.')
+
+        acceso, expira_en = generar_token_acceso(user)
+        return Response({'access': acceso, 'expires_in': expira_en})
+
+    def get_authenticate_header(self, request):
+        # Sin clases de autenticación DRF respondería 403 en lugar de 401
+        return TokenCacheadoAuthentication().authenticate_header(request)
+
+
+class LogoutView(APIView):
+    permission_classes = [IsAuthenticated]
+    swagger_tags = ['Login']
+
+    def post(self, request, *args, **kwargs):
+        # Borrar el token descarta también su entrada en la cache de tokens
+        Token.objects.filter(user=request.user).delete()
+        return Response({'detalle': 'Sesión cerrada correctamente.'})